@@ -9,6 +9,8 @@ import numpy as np
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
+import patient_rollups
+
 load_dotenv()
 
 class AIEngine:
@@ -47,118 +49,170 @@ class AIEngine:
             return 1
 
     @staticmethod
-    def get_detailed_analytics(sessions):
-        """Processes session history for analytics"""
-        history = []
-        exercise_counts = {}
-        total_acc_sum = 0
-        count_acc = 0
+    def analytics_pipeline(email):
+        """
+        Aggregation pipeline for one patient's sessions. Grouping by date and exercise
+        happens in MongoDB; only the per-day rows, the per-exercise reps (per block for
+        circuits), the 5 latest sessions and the totals come back (one document),
+        however long the history is.
+        Used to build the rollup of patients whose history predates rollups.
+        """
+        reps = {"$ifNull": ["$total_reps", 0]}
+        errors = {"$ifNull": ["$total_errors", 0]}
+        # Same per-session accuracy as before: reps == 0 counts as 100% in analytics,
+        # as a single rep in prediction (so any error there drops it to 0)
+        accuracy = {"$cond": [
+            {"$gt": ["$reps", 0]},
+            {"$max": [0, {"$trunc": {"$multiply": [{"$divide": [{"$subtract": ["$reps", "$errors"]}, "$reps"]}, 100]}}]},
+            100
+        ]}
+        form_accuracy = {"$cond": [
+            {"$gt": ["$reps", 0]}, "$accuracy",
+            {"$max": [0, {"$trunc": {"$multiply": [{"$subtract": [1, "$errors"]}, 100]}}]}
+        ]}
+        counted = {"$gt": ["$reps", 0]}
 
-        for s in sessions:
-            reps = s.get('total_reps', 0)
-            errors = s.get('total_errors', 0)
-            exercise = s.get('exercise', 'Freestyle') 
-            
-            acc = 100
-            if reps > 0:
-                acc = max(0, int((reps - errors) / reps * 100)) 
-            
-            date_str = s.get('date', 'Unknown')
+        return [
+            {"$match": {"email": email}},
+            {"$sort": {"timestamp": 1}},
+            {"$project": {
+                "timestamp": 1,
+                "date": {"$ifNull": ["$date", "Unknown"]},
+                "exercise": {"$ifNull": ["$exercise", "Freestyle"]},
+                "reps": reps,
+                "errors": errors,
+                "duration": {"$ifNull": ["$duration", 0]},
+                "right_reps": {"$ifNull": ["$right_reps", 0]},
+                "left_reps": {"$ifNull": ["$left_reps", 0]},
+                "blocks": {"$ifNull": ["$blocks", []]},
+            }},
+            {"$addFields": {"accuracy": accuracy}},
+            {"$addFields": {"form_accuracy": form_accuracy}},
+            {"$facet": {
+                "daily": [
+                    {"$group": {
+                        "_id": "$date",
+                        "first_ts": {"$min": "$timestamp"},
+                        "sessions": {"$sum": 1},
+                        "reps": {"$sum": "$reps"},
+                        "errors": {"$sum": "$errors"},
+                        "duration": {"$sum": "$duration"},
+                        "accuracy": {"$avg": "$accuracy"},
+                        "form_accuracy": {"$avg": "$form_accuracy"},
+                        "acc_sum": {"$sum": {"$cond": [counted, "$accuracy", 0]}},
+                        "acc_count": {"$sum": {"$cond": [counted, 1, 0]}},
+                        "last_session_id": {"$last": "$_id"},
+                    }},
+                    {"$sort": {"first_ts": 1}},
+                ],
+                "exercises": [
+                    # A circuit counts each block under its own exercise
+                    {"$addFields": {"circuit": {"$gt": [{"$size": "$blocks"}, 1]}}},
+                    {"$unwind": {"path": "$blocks", "preserveNullAndEmptyArrays": True}},
+                    {"$group": {
+                        "_id": {"$cond": ["$circuit", "$blocks.exercise", "$exercise"]},
+                        "reps": {"$sum": {"$cond": [
+                            "$circuit", {"$add": ["$blocks.right_reps", "$blocks.left_reps"]}, "$reps"]}},
+                    }},
+                ],
+                "recent": [
+                    {"$sort": {"timestamp": -1}},
+                    {"$limit": 5},
+                    {"$project": {"_id": 0, "date": 1, "form_accuracy": 1}},
+                ],
+                "totals": [
+                    {"$group": {
+                        "_id": None,
+                        "sessions": {"$sum": 1},
+                        "right_reps": {"$sum": "$right_reps"},
+                        "left_reps": {"$sum": "$left_reps"},
+                        "session_ids": {"$push": "$_id"},
+                    }},
+                ],
+            }},
+        ]
+
+    @staticmethod
+    def _rom_estimate(acc):
+        return min(145, max(60, int(85 + (acc * 0.5))))
+
+    @staticmethod
+    def get_detailed_analytics(rollup):
+        """Analytics for graphs from the patient's rollup (one row per training day)"""
+        rollup = rollup or {}
+        history = []
+        for date_str, day in sorted(rollup.get('days', {}).items()):
             history.append({
+                'session_id': day.get('last_session_id'),
                 'date': date_str,
                 'date_short': date_str[5:] if len(date_str) >= 10 else date_str,
-                'reps': reps,
-                'accuracy': acc,
-                'duration': s.get('duration', 0)
+                'sessions': day['sessions'],
+                'reps': day['reps'],
+                'total_reps': day['reps'],
+                'total_errors': day['errors'],
+                'accuracy': int(round(day['accuracy_sum'] / day['sessions'])),
+                'duration': day['duration']
             })
-            
-            if exercise in exercise_counts:
-                exercise_counts[exercise] += reps
-            else:
-                exercise_counts[exercise] = reps
-                
-            if reps > 0:
-                total_acc_sum += acc
-                count_acc += 1
 
-        exercise_stats = [{'name': k, 'total_reps': v} for k, v in exercise_counts.items()]
-        avg_accuracy = round(total_acc_sum / count_acc) if count_acc > 0 else 100
+        exercise_stats = [{'name': ex['name'], 'total_reps': ex['reps']} for ex in rollup.get('exercises', {}).values()]
+        counted = rollup.get('counted_sessions', 0)
+        avg_accuracy = round(rollup.get('counted_accuracy_sum', 0) / counted) if counted > 0 else 100
 
         return {
+            'total_sessions': rollup.get('sessions', 0),
             'history': history,
             'exercise_stats': exercise_stats,
             'average_accuracy': avg_accuracy
         }
 
     @staticmethod
-    def get_recovery_prediction(sessions):
-        """Generates AI predictions for recovery metrics"""
-        if not sessions:
+    def get_recovery_prediction(rollup):
+        """Generates AI predictions for recovery metrics from the patient's rollup"""
+        if not rollup or not rollup.get('sessions'):
             return None
+        days = rollup.get('days', {})
 
-        # 1. COMPLIANCE & STREAK
-        dates = [s['date'] for s in sessions]
+        # 1. COMPLIANCE & STREAK (streak is maintained on every session insert)
         today = datetime.now().date()
-        date_set = set(dates)
-        
-        loop_date = today
-        current_streak = 0
-        if loop_date.strftime("%Y-%m-%d") not in date_set:
-             yesterday = loop_date - timedelta(days=1)
-             if yesterday.strftime("%Y-%m-%d") in date_set:
-                 loop_date = yesterday
-
-        while loop_date.strftime("%Y-%m-%d") in date_set:
-            current_streak += 1
-            loop_date -= timedelta(days=1)
+        current_streak = patient_rollups.current_streak(rollup, today.strftime("%Y-%m-%d"))
         
         last_7_days = [(today - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(7)]
-        days_trained = sum(1 for d in last_7_days if d in date_set)
+        days_trained = sum(1 for d in last_7_days if d in days)
         adherence = int((days_trained / 7) * 100)
 
         # 2. BALANCED ASYMMETRY CALCULATION
-        total_right = sum(s.get('right_reps', 0) for s in sessions)
-        total_left = sum(s.get('left_reps', 0) for s in sessions)
+        total_right = rollup.get('right_reps', 0)
+        total_left = rollup.get('left_reps', 0)
         total_limb = total_right + total_left
         asymmetry = 0
         if total_limb > 0:
             asymmetry = abs(total_right - total_left) / total_limb * 100
 
         # 3. AI METRICS
-        recent_sessions = sessions[-5:]
+        recent_sessions = rollup.get('recent', [])
         rom_progress = []
         stability_score = 0
         session_history = []
 
-        for s in sessions:
-            reps = s.get('total_reps', 1) or 1
-            errors = s.get('total_errors', 0)
-            acc = max(0, int((reps - errors) / reps * 100)) 
-            base_rom = 85 + (acc * 0.5) 
-            rom_val = min(145, max(60, int(base_rom))) 
-            date_label = s.get('date', 'Unknown')
-            
+        for date_label, day in sorted(days.items()):
+            acc = int(round(day['form_accuracy_sum'] / day['sessions']))
             session_history.append({
                 'date': date_label,
+                'sessions': day['sessions'],
                 'accuracy': acc,
-                'reps': reps,
-                'rom': rom_val,
-                'errors': errors
+                'reps': day['reps'],
+                'rom': AIEngine._rom_estimate(acc),
+                'errors': day['errors']
             })
 
         for s in recent_sessions:
-            reps = s.get('total_reps', 1) or 1
-            errors = s.get('total_errors', 0)
-            acc = max(0, int((reps - errors) / reps * 100)) 
-            base_rom = 85 + (acc * 0.5)
-            rom_val = min(145, max(60, int(base_rom)))
-            
+            acc = int(s['form_accuracy'])
             date_str = s.get('date', 'Unknown')
             short_date = date_str[5:] if len(date_str) >= 10 else date_str
 
             rom_progress.append({
                 'date': short_date, 
-                'rom': rom_val
+                'rom': AIEngine._rom_estimate(acc)
             })
             stability_score += acc
             
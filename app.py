@@ -15,18 +15,33 @@ import requests
 import certifi
 import threading
 import logging
+import atexit
 from collections import deque
 from datetime import datetime
 from flask_cors import CORS
 from dotenv import load_dotenv
-from flask_bcrypt import Bcrypt
-from pymongo import MongoClient
+from pymongo.errors import ConnectionFailure
 from flask_mail import Mail, Message
 from flask_socketio import SocketIO, emit
 from bson.objectid import ObjectId
 
 # --- IMPORT CUSTOM AI MODULES ---
 from workout_session import WorkoutSession
+from resource_pool import ResourcePool
+import series_store
+import patient_rollups
+from db_indexes import ensure_indexes
+from risk_board import RiskBoard
+from write_behind import WriteBehindQueue
+from db_manager import DatabaseManager
+from storage import MongoStorage, StorageSync, open_storage
+from password_hasher import PasswordHasher, HasherBusy
+from mail_dispatcher import MailDispatcher
+from response_cache import ResponseCache, MemoryStore, RedisStore
+import chart_downsampling
+import session_export
+import cohort_analytics
+import rep_events
 from ai_engine import AIEngine
 from constants import EXERCISE_PRESETS
 
@@ -39,7 +54,10 @@ app = Flask(__name__)
 
 # UPDATED CORS: Explicitly allow all origins and headers
 CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
-bcrypt = Bcrypt(app)
+# bcrypt runs in worker processes, forked here before any background thread exists
+password_hasher = PasswordHasher()
+password_hasher.start()
+atexit.register(password_hasher.shutdown)
 
 # SWITCHED TO THREADING MODE (Removes Eventlet dependency)
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode="threading")
@@ -51,74 +69,288 @@ logger = logging.getLogger(__name__)
 # ----------------------------------------------------
 # 1. MAIL CONFIGURATION
 # ----------------------------------------------------
-app.config["MAIL_SERVER"] = "smtp.gmail.com"
-app.config["MAIL_PORT"] = 587
-app.config["MAIL_USE_TLS"] = True
+# Server overridable so a local sink (aiosmtpd) can stand in offline
+app.config["MAIL_SERVER"] = os.getenv("MAIL_SERVER", "smtp.gmail.com")
+app.config["MAIL_PORT"] = int(os.getenv("MAIL_PORT", "587"))
+app.config["MAIL_USE_TLS"] = os.getenv("MAIL_USE_TLS", "true").lower() == "true"
 app.config["MAIL_USERNAME"] = os.getenv("MAIL_USERNAME")
 app.config["MAIL_PASSWORD"] = os.getenv("MAIL_PASSWORD")
+app.config["MAIL_MAX_EMAILS"] = 100  # reconnect after this many messages on one connection
 mail = Mail(app)
 
+# Mail is sent by a background thread over one kept-alive SMTP connection
+mail_dispatcher = MailDispatcher(app, mail)
+mail_dispatcher.start()
+atexit.register(mail_dispatcher.stop)
+
 # ----------------------------------------------------
 # 2. DATABASE SETUP
 # ----------------------------------------------------
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = "physiocheck_db"
 
-# Initialize as None to handle connection failures gracefully
+# Users / OTPs / protocols / notifications go through a repository (storage.py).
+# STORAGE_BACKEND=sqlite: embedded store answering locally, synced with MongoDB in the background
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo")
+local_store = open_storage(STORAGE_BACKEND, os.getenv("SQLITE_PATH", "physiocheck_local.db"))
+store = local_store
+
+# None until the first successful health check (and again while the DB is down)
 client = None
 db = None
-users_collection = None
-otp_collection = None
 sessions_collection = None
 exercises_collection = None
-protocols_collection = None
-notifications_collection = None
-
-try:
-    print("⏳ Attempting to connect to MongoDB...")
-    client = MongoClient(
-        MONGO_URI,
-        serverSelectionTimeoutMS=5000, # 5 second timeout
-        tls=True,
-        tlsCAFile=certifi.where(),
-        tlsAllowInvalidCertificates=True,
-    )
-    # Trigger a connection verify
-    client.admin.command("ping")
-    db = client[DB_NAME]
-
-    users_collection = db["users"]
-    otp_collection = db["otps"]
-    sessions_collection = db["sessions"]
-    exercises_collection = db["exercises"]
-    protocols_collection = db["protocols"]
-    notifications_collection = db["notifications"]
-
-    print(f"✅ Connected to MongoDB Cloud: {DB_NAME}")
-except Exception as e:
-    print(f"⚠️ DB Error: {e}")
-    print("⚠️ WARNING: Application running without Database. Login/Signup will fail.")
+calibration_profiles_collection = None
+series_collection = None
+rollups_collection = None
+rollup_applied_collection = None
+risk_board = None
+
+def bind_database(database):
+    """Health check passed: expose the collections to the routes (first time: indexes + board)."""
+    global client, db, store, sessions_collection, exercises_collection, calibration_profiles_collection
+    global series_collection, rollups_collection, rollup_applied_collection, risk_board, _risk_board
+    if _risk_board is None:
+        # Every index the routes rely on (incl. TTL expiry of OTPs); see db_indexes.py
+        ensure_indexes(database)
+
+        # Materialized therapist dashboard, refreshed on session insert + on a schedule
+        _risk_board = RiskBoard(database["users"], database["sessions"], database["risk_board"],
+                                refresh_interval=float(os.getenv("RISK_BOARD_REFRESH_SECONDS", "300")))
+        _risk_board.start()
+
+    client = db_manager.client
+    if local_store is None:
+        store = MongoStorage(database)
+    sessions_collection = database["sessions"]
+    exercises_collection = database["exercises"]
+    calibration_profiles_collection = database["calibration_profiles"]
+    series_collection = database["session_series"]
+    rollups_collection = database["patient_rollups"]
+    rollup_applied_collection = database["rollup_applied"]
+    risk_board = _risk_board
+    db = database
+
+def unbind_database():
+    """Health check failed: routes see None and answer 503 / their fallback without blocking."""
+    global db, store, sessions_collection, exercises_collection, calibration_profiles_collection
+    global series_collection, rollups_collection, rollup_applied_collection, risk_board
+    db = None
+    if local_store is None:
+        store = None  # the embedded store keeps answering
+    sessions_collection = exercises_collection = calibration_profiles_collection = None
+    series_collection = rollups_collection = rollup_applied_collection = risk_board = None
+
+_risk_board = None
+
+# Pooled client, created lazily; connect + reconnect happen on the health-check thread
+print("⏳ Connecting to MongoDB in the background...")
+db_manager = DatabaseManager(
+    MONGO_URI, DB_NAME, on_up=bind_database, on_down=unbind_database,
+    tls=True,
+    tlsCAFile=certifi.where(),
+    tlsAllowInvalidCertificates=True,
+)
+db_manager.start()
+
+# Sessions + series are written off the socket thread; spilled to disk while the DB is down
+write_queue = WriteBehindQueue(lambda: db_manager.db, os.getenv("WRITE_SPILL_PATH", "write_spill.ndjson"),
+                               available=lambda: db_manager.available)
+atexit.register(write_queue.stop)
+
+@app.errorhandler(ConnectionFailure)
+def database_unavailable(e):
+    """A route hit a connection error between health checks: re-check now, answer 503."""
+    logger.error(f"Database connection error: {e}")
+    db_manager.check_now()
+    return jsonify({"error": "Database unavailable"}), 503
+
+@app.route("/api/health/db", methods=["GET"])
+def database_health():
+    status = db_manager.status()
+    status["pending_writes"] = write_queue.pending
+    status["storage"] = STORAGE_BACKEND
+    if local_store is not None:
+        status["pending_sync"] = local_store.pending_sync()
+    return jsonify(status), 200 if status["available"] else 503
 
 # ----------------------------------------------------
 # 3. WORKOUT SESSION MANAGEMENT
 # ----------------------------------------------------
 workout_session = None
 last_session_report = None
+current_session_id = None  # assigned at start so rep events can reference the session
 session_lock = threading.Lock()
 
-def get_camera_index():
-    """Detects available camera index."""
-    for i in range(2):
-        cap = cv2.VideoCapture(i)
-        if cap.isOpened():
-            cap.release()
-            return i
-    return 0 
+# Warm pose graphs + camera handles shared by consecutive sessions
+resource_pool = ResourcePool()
+if os.getenv("PREWARM_RESOURCES", "1") == "1":
+    threading.Thread(target=resource_pool.warm_up, daemon=True).start()
 
-def init_session(exercise_name="Bicep Curl"):
-    """Initialize a new workout session with clean visuals and accuracy logic."""
+def load_calibration_profile(email, exercise_name):
+    """Returns the saved calibration thresholds for this user + exercise, if any."""
+    if not email or calibration_profiles_collection is None:
+        return None
+    try:
+        return calibration_profiles_collection.find_one(
+            {"email": email, "exercise": exercise_name}, {"_id": 0}
+        )
+    except Exception as e:
+        logger.error(f"Calibration profile load error: {e}")
+        return None
+
+def save_calibration_profiles(session):
+    """Queues every calibration completed during the session for fast starts later (never blocks on MongoDB)."""
+    if not session or not session.user_email:
+        return
+    for exercise_name, profile in session.get_calibration_profiles().items():
+        try:
+            write_queue.submit_upsert("calibration_profiles",
+                                      {"email": session.user_email, "exercise": exercise_name},
+                                      {**profile, "updated_at": time.time()})
+        except Exception as e:
+            logger.error(f"Calibration profile save error: {e}")
+
+def queue_session_series(session_id, series_blocks):
+    """Queues the session's angle + rep-event series as compressed chunks (replay/charts)."""
+    try:
+        write_queue.submit_many("session_series", series_store.encode_series(session_id, series_blocks))
+    except Exception as e:
+        logger.error(f"Session series save error: {e}")
+
+def load_patient_rollup(email):
+    """The patient's rollup; built once from the session history if it predates rollups."""
+    if rollups_collection is None:
+        return None
+    rollup = rollups_collection.find_one({"email": email}, {"_id": 0})
+    if rollup is None and sessions_collection is not None:
+        summary = next(sessions_collection.aggregate(AIEngine.analytics_pipeline(email)), None)
+        if summary and summary.get("totals"):
+            rollup = patient_rollups.build_rollup(email, summary)
+            # Claim the summed sessions before the rollup exists, so the insert hook skips them
+            patient_rollups.mark_applied(rollup_applied_collection, summary["totals"][0].get("session_ids", []))
+            rollups_collection.update_one(
+                {"email": email},
+                {"$setOnInsert": {k: v for k, v in rollup.items() if k != "email"}},
+                upsert=True,
+            )
+    return rollup
+
+def update_patient_rollup(session_doc, session_id):
+    """Folds a newly saved session into the patient's running rollup."""
+    if rollups_collection is None:
+        return
+    try:
+        if rollups_collection.count_documents({"email": session_doc["email"]}, limit=1) == 0:
+            # First rollup for this patient; a concurrent backfill may win the insert without this session
+            load_patient_rollup(session_doc["email"])
+        # No-op when the backfill already counted this session
+        patient_rollups.apply_session(rollups_collection, session_doc, session_id, rollup_applied_collection)
+    except Exception as e:
+        logger.error(f"Patient rollup update error: {e}")
+
+def refresh_risk_board(email):
+    """Brings one patient's risk board row up to date (new session / new patient)."""
+    if risk_board is None:
+        return
+    try:
+        risk_board.refresh_patient(email)
+    except Exception as e:
+        logger.error(f"Risk board refresh error: {e}")
+
+def queue_rep_events(email, session_id):
+    """Rep event sink for a WorkoutSession: tags each batch with the patient + session and queues it."""
+    def sink(events):
+        if not email:
+            return
+        write_queue.submit_many("rep_events", [{"email": email, "session_id": session_id, **e} for e in events])
+    return sink
+
+def on_sessions_stored(docs):
+    """Write-behind hook: derived data follows once the sessions are actually in the DB."""
+    for doc in docs:
+        update_patient_rollup(doc, doc["_id"])
+        refresh_risk_board(doc["email"])
+        # Last: only now does a recompute see the new session
+        response_cache.bump(doc["email"])
+
+write_queue.add_hook("sessions", on_sessions_stored)
+write_queue.start()
+
+def on_central_insert(collection, docs):
+    """Storage sync hook: sessions saved on the kiosk reach the central DB like queued ones."""
+    if collection == "sessions":
+        on_sessions_stored(docs)
+
+if local_store is not None:
+    storage_sync = StorageSync(local_store, lambda: db_manager.db, available=lambda: db_manager.available,
+                               on_pushed=on_central_insert)
+    storage_sync.start()
+
+def stop_and_persist_session(email=None, exercise=None):
+    """
+    Stops the active session and queues its session doc + series, so the rollup,
+    risk board and cache hooks run however the session was stopped.
+    Returns the final report (None when no session was active).
+    """
     global workout_session, last_session_report
-    
+
+    with session_lock:
+        if not workout_session:
+            return None
+        # SAVE REPORT BEFORE STOPPING
+        report = workout_session.get_final_report()
+        series_blocks = workout_session.get_series_blocks()
+        # The id the rep events were tagged with (a new session may replace it once unlocked)
+        session_id = current_session_id or ObjectId()
+        email = email or workout_session.user_email
+        save_calibration_profiles(workout_session)
+        workout_session.stop()
+        workout_session = None
+        last_session_report = report
+
+    if not email:
+        return report
+
+    r = report["summary"]["RIGHT"]
+    l = report["summary"]["LEFT"]
+    # Circuits: one entry per exercise block, so per-exercise stats stay per exercise
+    blocks = [{
+        "exercise": b["exercise_name"],
+        "right_reps": b["summary"]["RIGHT"]["total_reps"],
+        "left_reps": b["summary"]["LEFT"]["total_reps"],
+        "errors": b["summary"]["RIGHT"]["error_count"] + b["summary"]["LEFT"]["error_count"],
+    } for b in report["blocks"]]
+
+    session_doc = {
+        "_id": session_id,
+        "email": email,
+        "exercise": (exercise or report["exercise_name"]) if len(blocks) == 1 else report["exercise_name"],
+        "blocks": blocks,
+        "timestamp": time.time(),
+        "date": datetime.now().strftime("%Y-%m-%d"),
+        "total_reps": r["total_reps"] + l["total_reps"],
+        "total_errors": r.get("error_count", 0) + l.get("error_count", 0),
+        "right_reps": r["total_reps"],
+        "left_reps": l["total_reps"],
+    }
+    if local_store is not None:
+        # Kiosk: stored locally, pushed to the central DB by StorageSync
+        local_store.insert_session(session_doc)
+    else:
+        # Queued, not written: the reply no longer waits on MongoDB (see write_behind.py)
+        session_id = write_queue.submit("sessions", session_doc)
+    queue_session_series(session_id, series_blocks)
+    return report
+
+def init_session(exercise_name="Bicep Curl", email=None, fast_start=True):
+    """Initialize a new workout session with clean visuals and accuracy logic."""
+    global workout_session, last_session_report, current_session_id
+
+    # Fast start: returning patients skip calibration with their saved profile
+    # (looked up before taking the lock, which must not wait on MongoDB)
+    profile = load_calibration_profile(email, exercise_name) if fast_start else None
+
     with session_lock:
         # 1. Force close existing session
         if workout_session:
@@ -135,18 +367,17 @@ def init_session(exercise_name="Bicep Curl"):
         
         # 2. Start new session
         print(f"🎥 Initializing Camera for {exercise_name}...")
-        workout_session = WorkoutSession(exercise_name)
-        
-        # Camera Initialization
-        cam_idx = get_camera_index()
-        workout_session.cap = cv2.VideoCapture(cam_idx)
-        
-        if not workout_session.cap.isOpened():
+        current_session_id = ObjectId()
+        workout_session = WorkoutSession(exercise_name, resource_pool=resource_pool, user_email=email,
+                                         rep_event_sink=queue_rep_events(email, current_session_id))
+        workout_session.start(calibration_profile=profile)
+
+        # Camera comes from the warm pool (opened once, reused across sessions)
+        if workout_session.cap is None or not workout_session.cap.isOpened():
             print("❌ Camera not accessible")
+            workout_session.stop()
             workout_session = None
             raise Exception("Camera not accessible")
-            
-        workout_session.start()
 
 def generate_video_frames():
     """Generator function to stream video frames and accuracy data."""
@@ -154,19 +385,21 @@ def generate_video_frames():
     global workout_session
     
     while True:
-        if workout_session is None or workout_session.phase == WorkoutPhase.INACTIVE:
+        # One session per frame: a stop may clear the global mid-frame
+        session = workout_session
+        if session is None or session.phase == WorkoutPhase.INACTIVE:
             time.sleep(0.1)
             continue
 
         try:
             # frame is now processed without technical black boxes ("Optimal Flow", etc.)
-            frame, valid = workout_session.process_frame()
+            frame, valid = session.process_frame()
             
             if not valid or frame is None:
                 continue
 
             # Emit real-time state data (including Accuracy) to frontend via WebSocket
-            socketio.emit("workout_update", workout_session.get_state_dict())
+            socketio.emit("workout_update", session.get_state_dict())
             
             # Encode frame for HTTP Stream
             ret, buffer = cv2.imencode(".jpg", frame)
@@ -271,40 +504,44 @@ def handle_disconnect():
 
 @socketio.on("stop_session")
 def handle_stop_session(data):
-    global workout_session, last_session_report
+    global workout_session
     if not workout_session:
         return
 
     data = data or {}
     email = data.get("email")
-    exercise = data.get("exercise", "Freestyle")
+    exercise = data.get("exercise")
 
     try:
         print("🛑 Stop session command received")
-        with session_lock:
-            # SAVE REPORT BEFORE STOPPING
-            last_session_report = workout_session.get_final_report()
-            workout_session.stop()
-            workout_session = None 
-
-        if email and sessions_collection is not None:
-            r = last_session_report["summary"]["RIGHT"]
-            l = last_session_report["summary"]["LEFT"]
-            
-            sessions_collection.insert_one({
-                "email": email,
-                "exercise": exercise,
-                "timestamp": time.time(),
-                "date": datetime.now().strftime("%Y-%m-%d"),
-                "total_reps": r["total_reps"] + l["total_reps"],
-                "total_errors": r.get("error_count", 0) + l.get("error_count", 0),
-            })
-
+        stop_and_persist_session(email, exercise)
         emit("session_stopped", {"status": "success"})
     except Exception as e:
         logger.error(f"Stop session error: {e}")
         emit("session_stopped", {"status": "error", "message": str(e)})
 
+@socketio.on("switch_exercise")
+def handle_switch_exercise(data):
+    global workout_session
+    data = data or {}
+    exercise = data.get("exercise")
+    session = workout_session
+    if not session or not exercise:
+        emit("exercise_switched", {"status": "error", "message": "No active session"})
+        return
+
+    # Profile lookup outside the lock; the switch itself must not race a stop
+    profile = load_calibration_profile(session.user_email, exercise)
+    with session_lock:
+        if workout_session is not session:
+            emit("exercise_switched", {"status": "error", "message": "No active session"})
+            return
+        switched = session.switch_exercise(exercise, calibration_profile=profile)
+    if switched:
+        emit("exercise_switched", {"status": "success", "exercise": exercise})
+    else:
+        emit("exercise_switched", {"status": "error", "message": f"Unknown exercise: {exercise}"})
+
 @socketio.on("toggle_listening")
 def handle_toggle_listening(data):
     global workout_session
@@ -316,39 +553,141 @@ def handle_toggle_listening(data):
 # ----------------------------------------------------
 # 6. ANALYTICS & AI ROUTES
 # ----------------------------------------------------
-@app.route("/api/user/analytics_detailed", methods=["POST"])
+# Per-user payload cache; a stored session bumps the user's version (see on_sessions_stored)
+response_cache = ResponseCache(
+    RedisStore(os.getenv("CACHE_REDIS_URL")) if os.getenv("CACHE_REDIS_URL") else MemoryStore(),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "300")),
+)
+
+def cached_json(namespace, email, params, compute):
+    """
+    Serves compute() through the versioned cache with an ETag.
+    A matching If-None-Match gets an empty 304 instead of the body.
+    """
+    key = response_cache.key(namespace, email, params)
+    entry = response_cache.get(key)
+    if entry is None:
+        entry = response_cache.put(key, json.dumps(compute()).encode("utf-8"))
+
+    if request.if_none_match.contains(entry.etag):
+        response = Response(status=304)
+    else:
+        response = Response(entry.body, mimetype="application/json")
+    response.set_etag(entry.etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+def chart_params(data):
+    """from/to (YYYY-MM-DD), points and mode (bucket | lttb) for chart history"""
+    points = data.get("points", chart_downsampling.DEFAULT_POINTS)
+    try:
+        points = int(points)
+    except (TypeError, ValueError):
+        points = chart_downsampling.DEFAULT_POINTS
+    mode = "lttb" if data.get("mode") == "lttb" else "bucket"
+    return data.get("from"), data.get("to"), points, mode
+
+def shape_history(rows, params):
+    """Windowed + downsampled chronological history rows"""
+    date_from, date_to, points, mode = params
+    return chart_downsampling.downsample_rows(
+        chart_downsampling.window_rows(rows, date_from, date_to), points, mode
+    )
+
+@app.route("/api/user/analytics_detailed", methods=["GET", "POST"])
 def analytics_detailed():
     """Returns detailed workout history for graphs."""
-    data = request.get_json(silent=True) or {}
+    data = request.get_json(silent=True) or request.args
     email = data.get("email")
     if not email: return jsonify({"error": "Email required"}), 400
 
-    if sessions_collection is None:
+    if rollups_collection is None:
         return jsonify({"total_sessions": 0, "history": []})
 
-    sessions = list(sessions_collection.find({"email": email}).sort("timestamp", 1))
-    
-    analytics = AIEngine.get_detailed_analytics(sessions)
-    return jsonify(analytics)
+    params = chart_params(data)
+
+    def compute():
+        analytics = AIEngine.get_detailed_analytics(load_patient_rollup(email))
+        analytics["history"] = shape_history(analytics["history"], params)
+        return analytics
 
-@app.route("/api/user/ai_prediction", methods=["POST"])
+    return cached_json("analytics", email, params, compute)
+
+@app.route("/api/user/ai_prediction", methods=["GET", "POST"])
 def ai_prediction():
     """Returns AI-based recovery prediction and risk analysis."""
-    data = request.get_json(silent=True) or {}
+    data = request.get_json(silent=True) or request.args
     email = data.get("email")
     if not email: return jsonify({"error": "Email required"}), 400
 
-    if sessions_collection is None:
+    if rollups_collection is None:
         return jsonify({"error": "Database unavailable"}), 500
 
-    sessions = list(sessions_collection.find({"email": email}).sort("timestamp", 1))
-    
-    prediction = AIEngine.get_recovery_prediction(sessions)
-    
-    if not prediction:
-        return jsonify({"error": "Not enough data for prediction"}), 200 
+    params = chart_params(data)
+
+    def compute():
+        prediction = AIEngine.get_recovery_prediction(load_patient_rollup(email))
+        if not prediction:
+            return {"error": "Not enough data for prediction"}
+        # session_history is newest-first
+        prediction["session_history"] = shape_history(prediction["session_history"][::-1], params)[::-1]
+        return prediction
+
+    # Streak / adherence are relative to today, so the date is part of the key
+    return cached_json("prediction", email, (datetime.now().strftime("%Y-%m-%d"),) + params, compute)
+
+@app.route("/api/sessions/<session_id>/series", methods=["GET"])
+def session_series(session_id):
+    """Angle + rep-event series of a stored session, optionally limited to ?from=&to= seconds."""
+    if series_collection is None:
+        return jsonify({"error": "Database unavailable"}), 503
+    try:
+        oid = ObjectId(session_id)
+        t_from = request.args.get("from", type=float)
+        t_to = request.args.get("to", type=float)
+        block = request.args.get("block", type=int)
+    except Exception:
+        return jsonify({"error": "Invalid session id"}), 400
+
+    blocks = series_store.read_series(series_collection, oid, t_from, t_to, block)
+    if not blocks:
+        return jsonify({"error": "No series stored for this session"}), 404
+    return jsonify({"session_id": session_id, "blocks": blocks})
+
+@app.route("/api/reps", methods=["GET"])
+def rep_event_log():
+    """
+    Rep-level events, newest first. ?email= and/or ?session_id=, optionally
+    exercise, side, min_accuracy, max_accuracy (exclusive), warning, from/to (YYYY-MM-DD),
+    limit and before (cursor from the previous page).
+    """
+    if db is None:
+        return jsonify({"error": "Database unavailable"}), 503
+    args = request.args
+    session_id = args.get("session_id")
+    if not args.get("email") and not session_id:
+        return jsonify({"error": "Email or session_id required"}), 400
+    try:
+        query = rep_events.build_query(
+            email=args.get("email"),
+            session_id=ObjectId(session_id) if session_id else None,
+            exercise=args.get("exercise"),
+            side=args.get("side"),
+            min_accuracy=args.get("min_accuracy", type=int),
+            max_accuracy=args.get("max_accuracy", type=int),
+            warning=args.get("warning"),
+            date_from=args.get("from"),
+            date_to=args.get("to"),
+        )
+    except Exception:
+        return jsonify({"error": "Invalid filter"}), 400
 
-    return jsonify(prediction)
+    events, next_cursor = rep_events.find_page(
+        db["rep_events"], query,
+        before=args.get("before", type=float),
+        limit=args.get("limit", rep_events.PAGE_SIZE, type=int),
+    )
+    return jsonify({"events": events, "summary": rep_events.summarize(events), "next_cursor": next_cursor})
 
 @app.route("/api/ai_coach", methods=["POST", "OPTIONS"])
 def ai_coach_commentary():
@@ -395,42 +734,47 @@ def toggle_ghost():
 # ----------------------------------------------------
 # 8. AUTH & OTHER ROUTES
 # ----------------------------------------------------
+def auth_busy():
+    """Password hashing pool saturated: reject fast instead of queueing behind the rush."""
+    response = jsonify({"error": "Too many sign-in attempts right now. Please retry in a moment."})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
 @app.route("/api/auth/send-otp", methods=["POST"])
 def send_otp():
-    if users_collection is None:
+    if store is None:
         return jsonify({"error": "Database unavailable. Check server logs."}), 503
 
     data = request.get_json(silent=True) or {}
     email = data.get("email")
 
-    if users_collection.find_one({"email": email}):
+    if store.get_user(email):
         return jsonify({"error": "Email already registered"}), 400
 
     otp = "".join(random.choices(string.digits, k=6))
-    otp_collection.update_one(
-        {"email": email},
-        {"$set": {"otp": otp, "created_at": time.time()}},
-        upsert=True,
-    )
+    store.save_otp(email, otp)
 
-    try:
-        msg = Message("PhysioCheck OTP", sender=app.config["MAIL_USERNAME"], recipients=[email])
-        msg.body = f"Your verification code is: {otp}"
-        mail.send(msg)
-        return jsonify({"message": "OTP sent"}), 200
-    except Exception as e:
-        logger.error(f"Mail Error: {e}")
-        return jsonify({"error": "Failed to send email. Check server logs."}), 500
+    msg = Message("PhysioCheck OTP", sender=app.config["MAIL_USERNAME"], recipients=[email])
+    msg.body = f"Your verification code is: {otp}"
+    # Queued: delivery (and retries) happen on the dispatcher thread
+    if not mail_dispatcher.send(msg):
+        logger.error("Mail Error: outbound queue full")
+        return jsonify({"error": "Failed to send email. Check server logs."}), 503
+    return jsonify({"message": "OTP sent"}), 200
 
 @app.route("/api/auth/login", methods=["POST"])
 def login():
-    if users_collection is None:
+    if store is None:
         return jsonify({"error": "Database unavailable. Check server logs."}), 503
 
     data = request.get_json(silent=True) or {}
-    user = users_collection.find_one({"email": data.get("email")})
+    user = store.get_user(data.get("email"))
+    try:
+        valid = user is not None and password_hasher.check_password_hash(user.get("password"), data.get("password"))
+    except HasherBusy:
+        return auth_busy()
 
-    if user and bcrypt.check_password_hash(user["password"], data.get("password")):
+    if valid:
         return jsonify({
             "email": user["email"],
             "role": user.get("role", "patient"),
@@ -443,7 +787,7 @@ def login():
 
 @app.route("/api/auth/signup-verify", methods=["POST"])
 def signup_verify():
-    if users_collection is None:
+    if store is None:
         return jsonify({"error": "Database unavailable. Check server logs."}), 503
 
     data = request.get_json(silent=True) or {}
@@ -456,14 +800,16 @@ def signup_verify():
     if not all([email, otp_input, password, name]):
         return jsonify({"error": "Missing required fields"}), 400
 
-    otp_record = otp_collection.find_one({"email": email})
-    if not otp_record or otp_record.get("otp") != otp_input:
+    if store.get_otp(email) != otp_input:
         return jsonify({"error": "Invalid OTP"}), 400
 
-    if users_collection.find_one({"email": email}):
+    if store.get_user(email):
         return jsonify({"error": "User already exists"}), 400
 
-    hashed_pw = bcrypt.generate_password_hash(password).decode('utf-8')
+    try:
+        hashed_pw = password_hasher.generate_password_hash(password)
+    except HasherBusy:
+        return auth_busy()
     new_user = {
         "email": email, 
         "password": hashed_pw, 
@@ -471,15 +817,16 @@ def signup_verify():
         "role": role, 
         "created_at": time.time()
     }
-    users_collection.insert_one(new_user)
-    otp_collection.delete_one({"email": email})
+    store.insert_user(new_user)
+    store.delete_otp(email)
+    refresh_risk_board(email)
 
     return jsonify({"user": {"email": email, "name": name, "role": role}}), 201
 
 # --- GOOGLE AUTH ROUTE ---
 @app.route("/api/auth/google", methods=["POST"])
 def google_auth():
-    if users_collection is None:
+    if store is None:
         return jsonify({"error": "Database unavailable. Check server logs."}), 503
 
     data = request.get_json(silent=True) or {}
@@ -505,7 +852,7 @@ def google_auth():
         if not email:
             return jsonify({"error": "Email not found in Google profile"}), 400
 
-        user = users_collection.find_one({"email": email})
+        user = store.get_user(email)
         
         if user:
             return jsonify({
@@ -522,7 +869,8 @@ def google_auth():
                 "auth_provider": "google",
                 "created_at": time.time()
             }
-            users_collection.insert_one(new_user)
+            store.insert_user(new_user)
+            refresh_risk_board(email)
             
             return jsonify({
                 "email": email,
@@ -540,7 +888,7 @@ def google_auth():
 @app.route("/api/assign", methods=["POST"])
 def assign_exercise():
     """Allows a therapist to assign a protocol to a patient."""
-    if protocols_collection is None or users_collection is None:
+    if store is None:
         return jsonify({"error": "Database unavailable"}), 503
 
     data = request.get_json(silent=True) or {}
@@ -552,12 +900,12 @@ def assign_exercise():
         return jsonify({"error": "Patient email and exercise name required"}), 400
 
     # 1. Find Patient
-    patient = users_collection.find_one({"email": patient_email})
+    patient = store.get_user(patient_email)
     if not patient:
         return jsonify({"error": "Patient not found"}), 404
 
     # 2. Create Protocol Document
-    therapist = users_collection.find_one({"role": "therapist"})
+    therapist = store.find_therapist()
     therapist_id = therapist["_id"] if therapist else patient["_id"] 
 
     protocol_doc = {
@@ -572,27 +920,26 @@ def assign_exercise():
         "updatedAt": datetime.now()
     }
     
-    protocols_collection.update_one(
-        {"patient": patient["_id"], "exerciseName": exercise_name},
-        {"$set": protocol_doc},
-        upsert=True
-    )
+    store.upsert_protocol(protocol_doc)
 
     return jsonify({"status": "assigned", "exercise": exercise_name}), 200
 
 # ----------------------------------------------------
 # 10. GET EXERCISES & THERAPIST ROUTES (UPDATED)
 # ----------------------------------------------------
+PATIENTS_PAGE_SIZE = 500  # default page: whole roster for typical clinics
+PATIENTS_PAGE_MAX = 500   # hard cap per response; larger rosters come back truncated (see next_cursor)
+
 @app.route("/api/exercises", methods=["GET"])
 def get_exercises():
     base_list = _get_frontend_exercise_list()
     email = request.args.get('email')
     assigned_titles = []
     
-    if email and users_collection is not None and protocols_collection is not None:
-        user = users_collection.find_one({"email": email})
+    if email and store is not None:
+        user = store.get_user(email)
         if user:
-            protocols = protocols_collection.find({"patient": user["_id"], "isActive": True})
+            protocols = store.active_protocols(user["_id"])
             for p in protocols:
                 ex_name = p.get("exerciseName", "")
                 if "bicep" in ex_name.lower(): assigned_titles.append("Bicep Curl")
@@ -612,62 +959,34 @@ def get_exercises():
 @app.route("/api/therapist/patients", methods=["GET"])
 def therapist_patients():
     """
-    Returns enriched patient data including:
-    - Current Risk Status (High Risk / Alert / Normal)
+    Returns enriched patient data from the materialized risk board:
+    - Current Risk Status (High Risk / Alert / Normal) + accuracy trend
     - Last Session Timestamp
     - Recent Activity Flag (within 24h)
+    Query: ?status=High Risk&limit=100&cursor=<next_cursor of the previous page>
+    At most PATIENTS_PAGE_MAX rows per response: "truncated" is true when more patients
+    remain, and next_cursor fetches them.
     """
-    if users_collection is None: return jsonify({"patients": []}), 200
-
-    # 1. Fetch all patients
-    patients = list(users_collection.find({"role": "patient"}, {"_id": 0, "name": 1, "email": 1, "created_at": 1}))
-    enriched = []
-    
-    # 2. Time threshold for 'Recent Activity' (24 hours ago)
-    one_day_ago = time.time() - 86400 
-
-    for p in patients:
-        # Get the LAST session for this patient to determine current status
-        last = sessions_collection.find_one({"email": p["email"]}, sort=[("timestamp", -1)])
-        
-        status = "Normal"
-        last_session_ts = None
-        recent_activity_type = None
-
-        if last:
-            last_session_ts = last.get("timestamp")
-            
-            # Risk Logic based on last performance
-            reps = last.get("total_reps", 0)
-            errors = last.get("total_errors", 0)
-            
-            # Simple Accuracy Calculation
-            accuracy = max(0, 100 - int((errors / max(reps, 1)) * 20)) if reps > 0 else 0
-            
-            if accuracy < 60: status = "High Risk"
-            elif accuracy < 80: status = "Alert"
-            
-            # Check if this session happened in the last 24 hours
-            if last_session_ts and last_session_ts > one_day_ago:
-                recent_activity_type = "Session Completed"
-
-        enriched.append({
-            "id": str(p["email"]), 
-            "name": p.get("name", "Unknown"),
-            "email": p["email"],
-            "date_joined": datetime.fromtimestamp(p.get("created_at", time.time())).strftime("%Y-%m-%d"),
-            "status": status,
-            "last_session_ts": last_session_ts,
-            "recent_activity": recent_activity_type, 
-            "hasActiveProtocol": False # Placeholder
-        })
-        
-    return jsonify({"patients": enriched}), 200
+    if risk_board is None:
+        return jsonify({"patients": [], "next_cursor": None, "limit": 0, "truncated": False}), 200
+
+    limit = max(1, min(request.args.get("limit", PATIENTS_PAGE_SIZE, type=int), PATIENTS_PAGE_MAX))
+    patients, next_cursor = risk_board.page(
+        status=request.args.get("status"),
+        cursor=request.args.get("cursor"),
+        limit=limit,
+    )
+    return jsonify({
+        "patients": patients,
+        "next_cursor": next_cursor,
+        "limit": limit,
+        "truncated": next_cursor is not None,
+    }), 200
 
 @app.route("/api/therapist/notifications", methods=["GET"])
 def therapist_notifications():
-    if notifications_collection is None: return jsonify([]), 200
-    notifs = list(notifications_collection.find({}).sort("timestamp", -1).limit(10))
+    if store is None: return jsonify([]), 200
+    notifs = store.latest_notifications(10)
     response = []
     for n in notifs:
         response.append({
@@ -679,6 +998,74 @@ def therapist_notifications():
         })
     return jsonify(response), 200
 
+def therapist_patient_emails(therapist_email):
+    """Emails of the patients a therapist has assigned protocols to (their cohort)."""
+    therapist = store.find_therapist(therapist_email)
+    if not therapist:
+        return None
+    return store.user_emails(store.therapist_patient_ids(therapist["_id"]))
+
+@app.route("/api/therapist/cohort", methods=["GET"])
+def therapist_cohort():
+    """Cross-patient analytics for a therapist's cohort (?therapist=<email>&weeks=8)."""
+    if sessions_collection is None or store is None:
+        return jsonify({"error": "Database unavailable"}), 503
+    therapist_email = request.args.get("therapist")
+    if not therapist_email:
+        return jsonify({"error": "Therapist email required"}), 400
+
+    emails = therapist_patient_emails(therapist_email)
+    if emails is None:
+        return jsonify({"error": "Therapist not found"}), 404
+
+    weeks = max(1, min(request.args.get("weeks", 8, type=int), 52))
+    groups = list(sessions_collection.aggregate(cohort_analytics.cohort_pipeline(emails))) if emails else []
+    return jsonify(cohort_analytics.compute_cohort(groups, emails, weeks=weeks)), 200
+
+@app.route("/api/export/sessions", methods=["GET"])
+def export_sessions():
+    """
+    Streams session rows as NDJSON (default) or CSV.
+    Scope: ?email=<patient> | ?therapist=<therapist email> (cohort) | neither (all),
+    optionally limited with ?from=YYYY-MM-DD&to=YYYY-MM-DD.
+    """
+    if sessions_collection is None:
+        return jsonify({"error": "Database unavailable"}), 503
+
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in ("ndjson", "csv"):
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+
+    emails = None
+    if request.args.get("email"):
+        emails = [request.args["email"]]
+    elif request.args.get("therapist"):
+        emails = therapist_patient_emails(request.args["therapist"])
+        if emails is None:
+            return jsonify({"error": "Therapist not found"}), 404
+
+    try:
+        query, sort = session_export.build_query(emails, request.args.get("from"), request.args.get("to"))
+    except ValueError:
+        return jsonify({"error": "from/to must be YYYY-MM-DD"}), 400
+
+    def generate():
+        cursor = session_export.open_cursor(sessions_collection, query, sort)
+        try:
+            if fmt == "csv":
+                yield from session_export.iter_csv(cursor)
+            else:
+                yield from session_export.iter_ndjson(cursor)
+        finally:
+            cursor.close()
+
+    filename = f"sessions_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    return Response(
+        generate(),
+        mimetype="text/csv" if fmt == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
 # ----------------------------------------------------
 # 11. STREAMING ROUTES
 # ----------------------------------------------------
@@ -689,9 +1076,11 @@ def start_tracking():
 
     data = request.get_json(silent=True) or {}
     exercise = data.get("exercise", "Bicep Curl")
+    email = data.get("email")
+    fast_start = data.get("fast_start", True)
 
     try:
-        init_session(exercise)
+        init_session(exercise, email=email, fast_start=fast_start)
         if workout_session:
             return jsonify({"status": "started", "exercise": exercise})
         else:
@@ -700,15 +1089,36 @@ def start_tracking():
         logger.error(f"❌ Error in start_tracking: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/switch_exercise", methods=["POST", "OPTIONS"])
+def switch_exercise():
+    """Moves the live session to the next exercise without releasing camera/model."""
+    if request.method == 'OPTIONS':
+        return jsonify({}), 200
+
+    data = request.get_json(silent=True) or {}
+    exercise = data.get("exercise")
+    if not exercise:
+        return jsonify({"error": "Exercise required"}), 400
+    session = workout_session
+    if not session:
+        return jsonify({"status": "error", "message": "No active session"}), 400
+
+    # Profile lookup outside the lock; the switch itself must not race a stop
+    profile = load_calibration_profile(session.user_email, exercise)
+    with session_lock:
+        if workout_session is not session:
+            return jsonify({"status": "error", "message": "No active session"}), 400
+        switched = session.switch_exercise(exercise, calibration_profile=profile)
+    if not switched:
+        return jsonify({"error": f"Unknown exercise: {exercise}"}), 400
+    return jsonify({"status": "switched", "exercise": exercise})
+
 @app.route("/stop_tracking", methods=["POST"])
 def stop_tracking():
-    global workout_session, last_session_report
-    with session_lock:
-        if workout_session:
-            last_session_report = workout_session.get_final_report()
-            workout_session.stop()
-            workout_session = None
-            return jsonify({"status": "stopped", "report": last_session_report})
+    data = request.get_json(silent=True) or {}
+    report = stop_and_persist_session(data.get("email"), data.get("exercise"))
+    if report is not None:
+        return jsonify({"status": "stopped", "report": report})
     return jsonify({"status": "no_active_session"})
 
 @app.route("/video_feed")
@@ -23,6 +23,11 @@ const userSchema = new mongoose.Schema({
     type: Date,
     default: Date.now,
   },
+  // Kiosks pull users changed since their last sync by this field; bump it on every edit
+  updatedAt: {
+    type: Date,
+    default: Date.now,
+  },
 });
 
 // NO pre-save hook, passwords are stored as plain text
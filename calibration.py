@@ -2,8 +2,9 @@
 Calibration logic: Dynamically determines ROM thresholds with minimal voice spam
 """
 import time
-from typing import TYPE_CHECKING
-from constants import CalibrationPhase, ExerciseConfig
+from typing import TYPE_CHECKING, Dict, Optional
+from constants import (CalibrationPhase, ExerciseConfig, PROFILE_VALIDATION_TIME,
+                       PROFILE_VALIDATION_REPS, PROFILE_DRIFT_TOLERANCE)
 
 if TYPE_CHECKING:
     from pose_processor import PoseProcessor
@@ -16,14 +17,24 @@ class CalibrationManager:
         self.hold_time = hold_time
         self.safety_margin = safety_margin
         
-        self.exercise_config: ExerciseConfig = pose_processor.config
-        self.joint_name = self.exercise_config.joint_to_track.value.title()
-        self.exercise_name = self.exercise_config.name
+        self.set_exercise(pose_processor.config)
 
         self.start_time = 0.0
         self.min_angle = 360  
         self.max_angle = 0    
 
+        # Background validation of a loaded profile
+        self.validating = False
+        self.validation_start = 0.0
+        self.validation_min = 360
+        self.validation_max = 0
+
+    def set_exercise(self, exercise_config: ExerciseConfig):
+        """Points calibration at a different exercise (used for in-session switches)."""
+        self.exercise_config = exercise_config
+        self.joint_name = exercise_config.joint_to_track.value.title()
+        self.exercise_name = exercise_config.name
+
     def start(self):
         """Initializes the calibration sequence with a stable instruction."""
         self.data.active = True
@@ -36,12 +47,61 @@ class CalibrationManager:
         self.max_angle = 0
         print(f"Starting calibration for: {self.exercise_name}")
 
-    def process_frame(self, results, current_time: float) -> bool:
-        """Processes pose data to determine range of motion limits."""
+    def load_profile(self, profile: dict):
+        """Skips the hold phases by applying thresholds saved from an earlier session."""
+        self.data.apply_profile(profile)
+        self.data.active = False
+        self.data.phase = CalibrationPhase.COMPLETE
+        self.data.message = "Welcome back! Using your saved calibration."
+        self.data.progress = 100
+        self.validating = False
+        print(f"Calibration Profile Loaded: {self.data.contracted_threshold} to {self.data.extended_threshold}")
+
+    def start_validation(self, current_time: float):
+        """Begins watching the first active reps for range-of-motion drift."""
+        self.validating = True
+        self.validation_start = current_time
+        self.validation_min = 360
+        self.validation_max = 0
+
+    def validate_frame(self, angles: Dict[str, Optional[int]], rep_counts: Dict[str, int],
+                       current_time: float) -> bool:
+        """
+        Tracks the ROM actually used while a loaded profile is on probation.
+        Returns True if the profile has drifted and calibration must be redone.
+        """
+        if not self.validating:
+            return False
+
+        valid_angles = [a for a in angles.values() if a is not None]
+        if valid_angles:
+            self.validation_min = min(self.validation_min, min(valid_angles))
+            self.validation_max = max(self.validation_max, max(valid_angles))
+
+        reps_done = min(rep_counts.values()) >= PROFILE_VALIDATION_REPS
+        if not reps_done and (current_time - self.validation_start) < PROFILE_VALIDATION_TIME:
+            return False
+
+        self.validating = False
+        if self.validation_max == 0:
+            # Joint never seen: nothing to judge the profile against
+            return False
+
+        drifted = (
+            abs(self.validation_min - self.data.contracted_threshold) > PROFILE_DRIFT_TOLERANCE or
+            abs(self.validation_max - self.data.extended_threshold) > PROFILE_DRIFT_TOLERANCE
+        )
+        if drifted:
+            print(f"Calibration Drift: used {int(self.validation_min)} to {int(self.validation_max)}, "
+                  f"profile {self.data.contracted_threshold} to {self.data.extended_threshold}")
+        return drifted
+
+    def process_frame(self, landmarks, current_time: float) -> bool:
+        """Processes smoothed pose landmarks to determine range of motion limits."""
         if not self.data.active:
             return False
 
-        angles = self.pose_processor.get_both_arm_angles(results)
+        angles = self.pose_processor.get_both_arm_angles(landmarks)
         valid_angles = [a for a in angles.values() if a is not None]
 
         if not valid_angles:
@@ -0,0 +1,97 @@
+"""
+Chart downsampling - time windows and bounded point counts for long-term history
+bucket: consecutive rows merged (sums kept exact, accuracy weighted by sessions)
+lttb:   Largest-Triangle-Three-Buckets picks the visually significant rows as-is
+"""
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+
+DEFAULT_POINTS = 180   # default chart resolution
+MAX_POINTS = 1000      # hard cap whatever the client asks for
+
+SUM_KEYS = ('sessions', 'reps', 'total_reps', 'total_errors', 'errors', 'duration')
+WEIGHTED_KEYS = ('accuracy', 'rom')
+
+
+def window_rows(rows: List[dict], date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[dict]:
+    """Rows whose 'date' (YYYY-MM-DD) lies in [date_from, date_to]"""
+    return [r for r in rows
+            if (not date_from or r['date'] >= date_from) and (not date_to or r['date'] <= date_to)]
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the n points kept by LTTB (first and last always kept)"""
+    length = len(x)
+    if n >= length or n < 3:
+        return np.arange(length) if n >= length else np.linspace(0, length - 1, max(n, 1)).astype(int)
+
+    edges = np.linspace(1, length - 1, n - 1).astype(int)
+    keep = np.empty(n, dtype=int)
+    keep[0], keep[-1] = 0, length - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the NEXT bucket (or the last point) is the third triangle vertex
+        nlo, nhi = hi, (edges[i + 2] if i + 2 < len(edges) else length)
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        bx, by = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - cx) * (by - y[a]) - (x[a] - bx) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def _day_axis(rows: List[dict]) -> np.ndarray:
+    """
+    Day ordinal of every row as the LTTB x. Rows without a real date ('Unknown') take the
+    previous dated row's day (the next one's when they lead), so the whole axis is one scale;
+    no dated row at all -> row positions.
+    """
+    x = np.array([datetime.strptime(r['date'], "%Y-%m-%d").toordinal() if len(r['date']) == 10 else np.nan
+                  for r in rows], dtype=np.float64)
+    dated = ~np.isnan(x)
+    if not dated.any():
+        return np.arange(len(rows), dtype=np.float64)
+    pos = np.arange(len(x))
+    previous = np.maximum.accumulate(np.where(dated, pos, -1))
+    return np.where(previous >= 0, x[np.maximum(previous, 0)], x[np.argmax(dated)])
+
+
+def _bucket_rows(rows: List[dict], n: int) -> List[dict]:
+    edges = np.linspace(0, len(rows), n + 1).astype(int)
+    starts = edges[:-1][np.diff(edges) > 0]
+    weights = np.array([r.get('sessions', 1) for r in rows], dtype=np.float64)
+    weight_sums = np.add.reduceat(weights, starts)
+
+    columns = {}
+    for key in SUM_KEYS:
+        if key in rows[0]:
+            columns[key] = np.add.reduceat(np.array([r[key] for r in rows], dtype=np.float64), starts)
+    for key in WEIGHTED_KEYS:
+        if key in rows[0]:
+            values = np.array([r[key] for r in rows], dtype=np.float64) * weights
+            columns[key] = np.add.reduceat(values, starts) / weight_sums
+
+    ends = np.append(starts[1:], len(rows)) - 1
+    merged = []
+    for b, (s, e) in enumerate(zip(starts, ends)):
+        row = dict(rows[e])  # labels (date, session_id, ...) from the newest row of the bucket
+        row['date_start'] = rows[s]['date']
+        for key, values in columns.items():
+            row[key] = int(round(values[b])) if key != 'duration' else round(float(values[b]), 2)
+        merged.append(row)
+    return merged
+
+
+def downsample_rows(rows: List[dict], points: int = DEFAULT_POINTS, mode: str = 'bucket',
+                    y_key: str = 'accuracy') -> List[dict]:
+    """Chronological rows reduced to at most `points` (capped at MAX_POINTS)"""
+    points = max(1, min(points, MAX_POINTS))
+    if len(rows) <= points:
+        return rows
+    if mode == 'lttb':
+        y = np.array([r.get(y_key, 0) for r in rows], dtype=np.float64)
+        return [rows[i] for i in lttb_indices(_day_axis(rows), y, points)]
+    return _bucket_rows(rows, points)
@@ -0,0 +1,151 @@
+"""
+Cohort analytics - cross-patient metrics for a therapist with vectorized NumPy group-bys
+MongoDB returns one columnar document per patient (arrays of session fields); every
+metric is then a bincount / unique over the flattened columns, never a per-session loop.
+"""
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+DAY = 86400
+WEEK = 7 * DAY
+ACCURACY_BINS = np.arange(0, 101, 10)
+ASYMMETRY_ALERT = 15   # % imbalance flagged (same threshold as the prediction page)
+
+
+def cohort_pipeline(emails: List[str]) -> List[dict]:
+    """One document per patient: {_id: email, ts: [...], reps: [...], errors: [...], right: [...], left: [...]}"""
+    return [
+        {"$match": {"email": {"$in": emails}}},
+        {"$project": {
+            "_id": 0, "email": 1,
+            "timestamp": {"$ifNull": ["$timestamp", 0]},
+            "total_reps": {"$ifNull": ["$total_reps", 0]},
+            "total_errors": {"$ifNull": ["$total_errors", 0]},
+            "right_reps": {"$ifNull": ["$right_reps", 0]},
+            "left_reps": {"$ifNull": ["$left_reps", 0]},
+        }},
+        {"$group": {
+            "_id": "$email",
+            "ts": {"$push": "$timestamp"},
+            "reps": {"$push": "$total_reps"},
+            "errors": {"$push": "$total_errors"},
+            "right": {"$push": "$right_reps"},
+            "left": {"$push": "$left_reps"},
+        }},
+    ]
+
+
+def _columns(groups: List[dict]) -> Dict[str, np.ndarray]:
+    lengths = np.array([len(g["ts"]) for g in groups], dtype=np.int64)
+    return {
+        "patient": np.repeat(np.arange(len(groups)), lengths),
+        "ts": np.fromiter((t for g in groups for t in g["ts"]), dtype=np.float64, count=lengths.sum()),
+        "reps": np.fromiter((r for g in groups for r in g["reps"]), dtype=np.float64, count=lengths.sum()),
+        "errors": np.fromiter((e for g in groups for e in g["errors"]), dtype=np.float64, count=lengths.sum()),
+        "right": np.fromiter((r for g in groups for r in g["right"]), dtype=np.float64, count=lengths.sum()),
+        "left": np.fromiter((v for g in groups for v in g["left"]), dtype=np.float64, count=lengths.sum()),
+    }
+
+
+def _safe_div(a: np.ndarray, b: np.ndarray, fill: float = 0.0) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(b > 0, a / np.where(b > 0, b, 1), fill)
+
+
+def compute_cohort(groups: List[dict], emails: List[str], now: Optional[float] = None, weeks: int = 8) -> dict:
+    """Adherence, accuracy distribution, asymmetry and week-over-week trends for the cohort"""
+    now = time.time() if now is None else now
+    n_patients = len(emails)
+    index = {email: i for i, email in enumerate(emails)}
+    # Patients without sessions still count towards the cohort
+    groups = [g for g in groups if g["_id"] in index]
+    order = np.array([index[g["_id"]] for g in groups], dtype=np.int64)
+
+    if not groups:
+        cols = {k: np.empty(0) for k in ("ts", "reps", "errors", "right", "left")}
+        cols["patient"] = np.empty(0, dtype=np.int64)
+    else:
+        cols = _columns(groups)
+        cols["patient"] = order[cols["patient"]]
+    patient, ts, reps, errors = cols["patient"], cols["ts"], cols["reps"], cols["errors"]
+
+    # Session accuracy (same rule as analytics: no reps counts as 100%)
+    accuracy = np.where(reps > 0, np.maximum(0, np.trunc(_safe_div(reps - errors, reps) * 100)), 100.0)
+
+    sessions = np.bincount(patient, minlength=n_patients)
+    mean_accuracy = _safe_div(np.bincount(patient, weights=accuracy, minlength=n_patients), sessions)
+
+    # --- ADHERENCE: distinct local training days in the last 7 days ---
+    utc_offset = datetime.now().astimezone().utcoffset().total_seconds()
+    day = np.floor((ts + utc_offset) / DAY).astype(np.int64)
+    today = int(np.floor((now + utc_offset) / DAY))
+    recent = (day > today - 7) & (day <= today)
+    trained = np.unique(patient[recent] * 8 + (today - day[recent]))
+    days_trained = np.bincount(trained // 8, minlength=n_patients)
+    adherence = days_trained / 7 * 100
+
+    # --- ASYMMETRY (lifetime left vs right reps) ---
+    right = np.bincount(patient, weights=cols["right"], minlength=n_patients)
+    left = np.bincount(patient, weights=cols["left"], minlength=n_patients)
+    asymmetry = _safe_div(np.abs(right - left), right + left) * 100
+
+    # --- WEEK-OVER-WEEK (week 0 = last 7 days) ---
+    week = np.floor((now - ts) / WEEK).astype(np.int64)
+    in_range = (week >= 0) & (week < weeks)
+    w, p = week[in_range], patient[in_range]
+    week_sessions = np.bincount(w, minlength=weeks)
+    week_accuracy = _safe_div(np.bincount(w, weights=accuracy[in_range], minlength=weeks), week_sessions)
+    week_reps = np.bincount(w, weights=reps[in_range], minlength=weeks)
+    week_active = np.bincount(np.unique(w * n_patients + p) // max(n_patients, 1), minlength=weeks)
+
+    # Per-patient change between the last two weeks (only patients active in both)
+    pw_sessions = np.zeros((n_patients, 2))
+    pw_accuracy = np.zeros((n_patients, 2))
+    last_two = in_range & (week < 2)
+    np.add.at(pw_sessions, (patient[last_two], week[last_two]), 1)
+    np.add.at(pw_accuracy, (patient[last_two], week[last_two]), accuracy[last_two])
+    both = (pw_sessions > 0).all(axis=1)
+    delta = _safe_div(pw_accuracy[:, 0], pw_sessions[:, 0]) - _safe_div(pw_accuracy[:, 1], pw_sessions[:, 1])
+
+    active = sessions > 0
+    hist, _ = np.histogram(mean_accuracy[active], bins=ACCURACY_BINS)
+    percentiles = np.percentile(accuracy, [10, 25, 50, 75, 90]) if len(accuracy) else np.zeros(5)
+
+    return {
+        'patients': n_patients,
+        'active_patients': int(active.sum()),
+        'sessions': int(len(ts)),
+        'adherence': {
+            'mean': round(float(adherence.mean()), 1) if n_patients else 0.0,
+            'below_50': int((adherence < 50).sum()),
+            'distribution': np.bincount(days_trained, minlength=8)[:8].tolist(),  # patients by days trained (0-7)
+        },
+        'accuracy': {
+            'mean': round(float(accuracy.mean()), 1) if len(accuracy) else 0.0,
+            'percentiles': dict(zip(['p10', 'p25', 'p50', 'p75', 'p90'], np.round(percentiles, 1).tolist())),
+            'patient_histogram': [{'range': f"{lo}-{lo + 10}", 'patients': int(c)}
+                                  for lo, c in zip(ACCURACY_BINS[:-1], hist)],
+        },
+        'asymmetry': {
+            'mean': round(float(asymmetry[active].mean()), 1) if active.any() else 0.0,
+            'flagged': int((asymmetry > ASYMMETRY_ALERT).sum()),
+        },
+        'weekly': [
+            {'weeks_ago': i, 'sessions': int(week_sessions[i]), 'active_patients': int(week_active[i]),
+             'accuracy': round(float(week_accuracy[i]), 1), 'reps': int(week_reps[i])}
+            for i in range(weeks)
+        ],
+        'week_over_week': {
+            'improving': int((both & (delta > 5)).sum()),
+            'declining': int((both & (delta < -5)).sum()),
+            'stable': int((both & (np.abs(delta) <= 5)).sum()),
+        },
+        'by_patient': [
+            {'email': emails[i], 'sessions': int(sessions[i]), 'accuracy': round(float(mean_accuracy[i]), 1),
+             'adherence': int(adherence[i]), 'asymmetry': round(float(asymmetry[i]), 1)}
+            for i in range(n_patients)
+        ],
+    }
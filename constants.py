@@ -124,8 +124,70 @@ EXERCISE_PRESETS = {
 CALIBRATION_HOLD_TIME = 5     # seconds
 WORKOUT_COUNTDOWN_TIME = 5    # seconds
 
-# Angle processing
-SMOOTHING_WINDOW = 7
+# Saved calibration profiles (fast start for returning patients)
+PROFILE_VALIDATION_TIME = 8   # seconds of active movement used to re-check a loaded profile
+PROFILE_VALIDATION_REPS = 2   # reps per side that end validation early
+PROFILE_DRIFT_TOLERANCE = 15  # degrees: ROM change that triggers recalibration
+
+# Landmark smoothing: One Euro filter over all 33 landmarks (replaces per-angle median + EMA)
+LANDMARK_FILTER_MIN_CUTOFF = 1.0  # Hz: cutoff when still (lower = less jitter)
+LANDMARK_FILTER_BETA = 10.0       # cutoff increase per unit/s of landmark speed (higher = less lag)
+LANDMARK_FILTER_D_CUTOFF = 1.0    # Hz: cutoff for the speed estimate
+LANDMARK_FILTER_RESET_GAP = 0.5   # seconds without a pose before the filter restarts
+
+# Angle processing (all windows in SECONDS, driven by frame timestamps)
+REP_HISTORY_WINDOW = 0.27        # angle history kept by RepCounter (~8 frames at 30 fps)
+WRONG_EXERCISE_TRIGGER_TIME = 0.33  # sustained mismatch before warning (~10 frames at 30 fps)
+ACTIVE_STABILIZATION_TIME = 0.17    # ignore the first moments of ACTIVE (~5 frames at 30 fps)
+MAX_FRAME_GAP = 0.25             # caps dt so a stalled frame can't trip a debounce on its own
+
+# Predictive (velocity-aware) state transitions - optional, skips the state hold time
+PREDICTIVE_TRANSITIONS = False   # enable in RepCounter/RepEngine
+VELOCITY_WINDOW = 0.2            # seconds of angle history used for the velocity fit
+VELOCITY_MIN_SAMPLES = 4         # samples needed before a fit is trusted
+VELOCITY_CONFIDENCE = 3.0        # |slope / std. error| needed to commit a transition early
+
+# Session history store (float32 time + int16 angles = 8 bytes per sample)
+HISTORY_CHUNK_SIZE = 4096        # samples allocated per growth step
+HISTORY_MAX_SAMPLES = 1 << 20    # bound (~8 MB, ~9.7 h at 30 fps); halves resolution when reached
+HISTORY_MIN_INTERVAL = 0.0       # seconds between stored samples (0 = every active frame)
+SERIES_CHUNK_SECONDS = 60        # seconds of series per persisted (compressed) chunk document
+REP_EVENT_BATCH_SIZE = 20        # completed reps buffered per session before they are handed off
+
+# MongoDB client pool + health checks (see db_manager.py)
+DB_MAX_POOL_SIZE = 50                  # connections per server (Flask threads + writer + board)
+DB_MIN_POOL_SIZE = 2                   # kept warm so the first request after idle skips the TLS handshake
+DB_MAX_IDLE_MS = 60000                 # idle connections above the minimum are closed after this
+DB_WAIT_QUEUE_TIMEOUT_MS = 2000        # max wait for a free pooled connection
+DB_SERVER_SELECTION_TIMEOUT_MS = 2000  # max wait for a reachable server per operation
+DB_CONNECT_TIMEOUT_MS = 3000
+DB_SOCKET_TIMEOUT_MS = 30000           # long enough for exports / cohort aggregations
+DB_HEALTH_INTERVAL = 10.0              # seconds between pings while healthy
+DB_RECONNECT_MAX_DELAY = 30.0          # backoff cap between pings while down
+
+# Embedded storage backend (STORAGE_BACKEND=sqlite) <-> central DB sync
+STORAGE_SYNC_INTERVAL = 30.0     # seconds between push/pull rounds while the central DB is up
+STORAGE_SYNC_BATCH = 500         # outbox entries / pulled documents per round trip
+
+# Password hashing pool (bcrypt off the request threads)
+BCRYPT_ROUNDS = 12               # cost factor (flask_bcrypt default; existing hashes carry their own)
+HASH_WORKERS = 2                 # worker processes: bounded so logins cannot take every core
+HASH_MAX_PENDING = 32            # queued + running hashes before requests are rejected (503)
+HASH_TIMEOUT = 5.0               # seconds a request waits for its hash before giving up
+
+# Outbound mail dispatcher (one kept-alive SMTP connection, see mail_dispatcher.py)
+MAIL_BATCH_SIZE = 50             # messages sent per pass over the open connection
+MAIL_IDLE_TIMEOUT = 60.0         # seconds without mail before the connection is closed
+MAIL_MAX_RETRIES = 5             # attempts after the first before a message is dropped
+MAIL_RETRY_BACKOFF = 2.0         # seconds before the first retry (doubles each attempt)
+MAIL_QUEUE_MAX = 1000            # queued messages before send() refuses new ones
+MAIL_SOCKET_TIMEOUT = 30.0       # seconds an SMTP connect/read may block before the send is retried
+
+# Write-behind persistence (sessions + series leave the request path)
+WRITE_BATCH_SIZE = 500           # documents per insert_many
+WRITE_FLUSH_INTERVAL = 0.25      # seconds the writer waits to fill a batch
+WRITE_RETRY_INTERVAL = 10.0      # seconds between replay attempts while the DB is down
+WRITE_QUEUE_MAX = 10000          # queued documents before new writes go straight to disk
 SAFETY_MARGIN = 10    # degrees
 
 # MediaPipe settings
@@ -0,0 +1,209 @@
+"""
+Index manager - declares every index the routes rely on and provisions them at startup
+
+Diagnostics (explain() every route query, exit 1 on a collection scan or in-memory sort):
+    python db_indexes.py --explain
+"""
+import argparse
+import os
+import sys
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from bson.objectid import ObjectId
+
+DB_NAME = "physiocheck_db"
+OTP_TTL_SECONDS = 10 * 60  # unverified OTPs are removed by MongoDB after this
+
+
+@dataclass
+class IndexSpec:
+    keys: List[Tuple[str, int]]
+    unique: bool = False
+    ttl_seconds: Optional[int] = None
+
+    @property
+    def name(self) -> str:
+        return "_".join(f"{field}_{direction}" for field, direction in self.keys)
+
+
+# Collection name -> indexes (keep in sync with the queries in route_queries())
+INDEX_SPECS: Dict[str, List[IndexSpec]] = {
+    "users": [
+        IndexSpec([("email", 1)]),
+        IndexSpec([("role", 1)]),
+        IndexSpec([("updatedAt", 1)]),
+    ],
+    "otps": [
+        IndexSpec([("email", 1)], unique=True),
+        IndexSpec([("created_at", 1)], ttl_seconds=OTP_TTL_SECONDS),
+    ],
+    "sessions": [
+        IndexSpec([("email", 1), ("timestamp", -1)]),
+        IndexSpec([("timestamp", 1)]),
+    ],
+    "protocols": [
+        IndexSpec([("patient", 1), ("isActive", 1)]),
+        IndexSpec([("patient", 1), ("exerciseName", 1)]),
+        IndexSpec([("therapist", 1), ("patient", 1)]),
+        IndexSpec([("updatedAt", 1)]),
+    ],
+    "notifications": [
+        IndexSpec([("timestamp", -1)]),
+    ],
+    "calibration_profiles": [
+        IndexSpec([("email", 1), ("exercise", 1)], unique=True),
+    ],
+    "session_series": [
+        IndexSpec([("session_id", 1), ("block", 1), ("seq", 1)], unique=True),
+    ],
+    "rep_events": [
+        # equality (email, exercise), sort (timestamp), range (accuracy)
+        IndexSpec([("email", 1), ("exercise", 1), ("timestamp", -1), ("accuracy", 1)]),
+        IndexSpec([("email", 1), ("timestamp", -1)]),
+        IndexSpec([("session_id", 1), ("timestamp", -1)]),
+    ],
+    "patient_rollups": [
+        IndexSpec([("email", 1)], unique=True),
+    ],
+    "rollup_applied": [
+        IndexSpec([("session_id", 1)], unique=True),
+    ],
+    "risk_board": [
+        IndexSpec([("email", 1)], unique=True),
+        IndexSpec([("status", 1), ("email", 1)]),
+        IndexSpec([("refreshed_at", 1)]),
+    ],
+}
+
+
+def ensure_indexes(db) -> List[str]:
+    """Creates any missing index (no-op for existing ones). Returns failures, never raises."""
+    failures = []
+    for collection_name, specs in INDEX_SPECS.items():
+        for spec in specs:
+            options = {"name": spec.name}
+            if spec.unique:
+                options["unique"] = True
+            if spec.ttl_seconds is not None:
+                options["expireAfterSeconds"] = spec.ttl_seconds
+            try:
+                db[collection_name].create_index(spec.keys, **options)
+            except Exception as e:
+                failures.append(f"{collection_name}.{spec.name}: {e}")
+    for failure in failures:
+        print(f"⚠️ Index error: {failure}")
+    return failures
+
+
+def route_queries() -> List[Tuple[str, str, dict]]:
+    """(route, collection, explain command body) for every indexed query the app issues"""
+    from ai_engine import AIEngine
+
+    email = "diagnostics@example.com"
+    return [
+        ("auth: user by email", "users", {"find": "users", "filter": {"email": email}, "limit": 1}),
+        ("therapist: patients", "users", {"find": "users", "filter": {"role": "patient"}}),
+        ("assign: therapist", "users", {"find": "users", "filter": {"role": "therapist"}, "limit": 1}),
+        ("sync: users pull", "users",
+         {"find": "users", "filter": {"updatedAt": {"$gt": 0}}, "sort": {"updatedAt": 1}}),
+        ("auth: otp by email", "otps", {"find": "otps", "filter": {"email": email}, "limit": 1}),
+        ("therapist: last session", "sessions",
+         {"find": "sessions", "filter": {"email": email}, "sort": {"timestamp": -1}, "limit": 1}),
+        ("analytics: rollup backfill", "sessions",
+         {"aggregate": "sessions", "pipeline": AIEngine.analytics_pipeline(email), "cursor": {}}),
+        ("export: sessions by date range", "sessions",
+         {"find": "sessions", "filter": {"timestamp": {"$gte": 0}}, "sort": {"timestamp": 1}}),
+        ("export: patient sessions", "sessions",
+         {"find": "sessions", "filter": {"email": email}, "sort": {"email": 1, "timestamp": -1}}),
+        ("export: cohort sessions", "sessions",
+         {"find": "sessions", "filter": {"email": {"$in": [email, "other@example.com"]}},
+          "sort": {"email": 1, "timestamp": -1}}),
+        ("export: therapist cohort", "protocols",
+         {"distinct": "protocols", "key": "patient", "query": {"therapist": ObjectId()}}),
+        ("exercises: active protocols", "protocols",
+         {"find": "protocols", "filter": {"patient": ObjectId(), "isActive": True}}),
+        ("assign: protocol upsert", "protocols",
+         {"find": "protocols", "filter": {"patient": ObjectId(), "exerciseName": "Squat"}, "limit": 1}),
+        ("sync: protocols pull", "protocols",
+         {"find": "protocols", "filter": {"updatedAt": {"$gt": 0}}, "sort": {"updatedAt": 1}}),
+        ("therapist: notifications", "notifications",
+         {"find": "notifications", "filter": {}, "sort": {"timestamp": -1}, "limit": 10}),
+        ("session: calibration profile", "calibration_profiles",
+         {"find": "calibration_profiles", "filter": {"email": email, "exercise": "Squat"}, "limit": 1}),
+        ("sessions: series range", "session_series",
+         {"find": "session_series", "filter": {"session_id": ObjectId(), "t_end": {"$gt": 0}},
+          "sort": {"block": 1, "seq": 1}}),
+        ("reps: patient exercise below accuracy", "rep_events",
+         {"find": "rep_events", "filter": {"email": email, "exercise": "Squat", "accuracy": {"$lt": 70}},
+          "sort": {"timestamp": -1}, "limit": 201}),
+        ("reps: patient", "rep_events",
+         {"find": "rep_events", "filter": {"email": email}, "sort": {"timestamp": -1}, "limit": 201}),
+        ("reps: session", "rep_events",
+         {"find": "rep_events", "filter": {"session_id": ObjectId()}, "sort": {"timestamp": -1}, "limit": 201}),
+        ("analytics: rollup", "patient_rollups",
+         {"find": "patient_rollups", "filter": {"email": email}, "limit": 1}),
+        ("analytics: rollup claim", "rollup_applied",
+         {"delete": "rollup_applied", "deletes": [{"q": {"session_id": ObjectId()}, "limit": 1}]}),
+        ("therapist: risk board page", "risk_board",
+         {"find": "risk_board", "filter": {"email": {"$gt": ""}}, "sort": {"email": 1}, "limit": 101}),
+        ("therapist: risk board by status", "risk_board",
+         {"find": "risk_board", "filter": {"status": "High Risk", "email": {"$gt": ""}},
+          "sort": {"email": 1}, "limit": 101}),
+        ("risk board: prune", "risk_board",
+         {"find": "risk_board", "filter": {"refreshed_at": {"$lt": 0}}}),
+    ]
+
+
+# Plan stages a route query must never need: a full scan, or a blocking sort in memory (100 MB cap)
+BAD_STAGES = ("COLLSCAN", "SORT")
+
+
+def find_stages(explain, names=BAD_STAGES) -> List[str]:
+    """Every stage named in `names` anywhere in an explain() document"""
+    if isinstance(explain, dict):
+        found = [explain["stage"]] if explain.get("stage") in names else []
+        return found + [s for v in explain.values() for s in find_stages(v, names)]
+    if isinstance(explain, list):
+        return [s for v in explain for s in find_stages(v, names)]
+    return []
+
+
+def verify_query_plans(db) -> List[str]:
+    """Runs explain() for every route query; returns the routes that scan a collection or sort in memory"""
+    problems = []
+    for route, collection_name, command in route_queries():
+        explain = db.command("explain", command, verbosity="queryPlanner")
+        for stage in sorted(set(find_stages(explain))):
+            problems.append(f"{stage}: {route} ({collection_name})")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Provision MongoDB indexes and check query plans")
+    parser.add_argument("--explain", action="store_true", help="fail if any route query is a collection scan")
+    args = parser.parse_args()
+
+    import certifi
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+    client = MongoClient(os.getenv("MONGO_URI"), serverSelectionTimeoutMS=5000,
+                         tls=True, tlsCAFile=certifi.where(), tlsAllowInvalidCertificates=True)
+    db = client[DB_NAME]
+
+    failures = ensure_indexes(db)
+    print(f"✅ Indexes provisioned ({sum(len(s) for s in INDEX_SPECS.values()) - len(failures)} ok, {len(failures)} failed)")
+
+    if args.explain:
+        problems = verify_query_plans(db)
+        for problem in problems:
+            print(f"❌ {problem}")
+        if problems or failures:
+            sys.exit(1)
+        print("✅ No collection scans or in-memory sorts in route queries")
+
+
+if __name__ == "__main__":
+    main()
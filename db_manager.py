@@ -0,0 +1,124 @@
+"""
+Database manager - lazily created, pooled MongoDB client with background health checks
+Nothing blocks at import: the client connects in the background (pymongo monitors the
+servers itself) and a health thread pings it. Transitions call on_up(db) / on_down()
+so the app can expose its collections only while the database answers; routes then
+fail fast with a 503 instead of waiting out a server-selection timeout.
+"""
+import threading
+import time
+from typing import Callable, Optional
+
+from constants import (DB_MAX_POOL_SIZE, DB_MIN_POOL_SIZE, DB_MAX_IDLE_MS, DB_WAIT_QUEUE_TIMEOUT_MS,
+                       DB_SERVER_SELECTION_TIMEOUT_MS, DB_CONNECT_TIMEOUT_MS, DB_SOCKET_TIMEOUT_MS,
+                       DB_HEALTH_INTERVAL, DB_RECONNECT_MAX_DELAY)
+
+
+class DatabaseManager:
+    """Usage: manager = DatabaseManager(uri, name, on_up=bind, on_down=unbind); manager.start()"""
+
+    def __init__(self, uri: Optional[str], db_name: str, on_up: Optional[Callable] = None,
+                 on_down: Optional[Callable] = None, health_interval: float = DB_HEALTH_INTERVAL,
+                 **client_options):
+        self.uri = uri
+        self.db_name = db_name
+        self.on_up = on_up
+        self.on_down = on_down
+        self.health_interval = health_interval
+        self.client_options = {
+            "maxPoolSize": DB_MAX_POOL_SIZE,
+            "minPoolSize": DB_MIN_POOL_SIZE,
+            "maxIdleTimeMS": DB_MAX_IDLE_MS,
+            "waitQueueTimeoutMS": DB_WAIT_QUEUE_TIMEOUT_MS,   # pool exhausted: fail, don't queue forever
+            "serverSelectionTimeoutMS": DB_SERVER_SELECTION_TIMEOUT_MS,
+            "connectTimeoutMS": DB_CONNECT_TIMEOUT_MS,
+            "socketTimeoutMS": DB_SOCKET_TIMEOUT_MS,
+            **client_options,
+        }
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.available = False
+        self.last_error: Optional[str] = None
+        self.last_check = 0.0
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def client(self):
+        """The shared MongoClient, created on first use (construction does not wait for the server)"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from pymongo import MongoClient
+                    self._client = MongoClient(self.uri, **self.client_options)
+        return self._client
+
+    @property
+    def db(self):
+        return self.client[self.db_name]
+
+    def ping(self) -> bool:
+        try:
+            self.client.admin.command("ping")
+            self.last_error = None
+            return True
+        except Exception as e:
+            self.last_error = str(e)
+            return False
+        finally:
+            self.last_check = time.time()
+
+    def status(self) -> dict:
+        return {"available": self.available, "last_check": self.last_check, "last_error": self.last_error}
+
+    # --- BACKGROUND HEALTH CHECK ---
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def check_now(self):
+        """Wakes the health thread (a route just hit a connection error)"""
+        self._wake.set()
+
+    def _run(self):
+        delay = 1.0
+        while not self._stop.is_set():
+            healthy = self.ping()
+            if healthy and not self.available:
+                self._transition(True)
+            elif not healthy and self.available:
+                self._transition(False)
+
+            if self.available:
+                delay = 1.0
+                self._wake.wait(self.health_interval)
+            else:
+                # Reconnect with backoff while the database is unreachable
+                self._wake.wait(delay)
+                delay = min(delay * 2, DB_RECONNECT_MAX_DELAY)
+            self._wake.clear()
+
+    def _transition(self, up: bool):
+        # Down: flag first so nothing new starts; up: flag last so callers see a bound app
+        if not up:
+            self.available = False
+            print(f"⚠️ MongoDB unavailable ({self.last_error}); routes answer 503 until it is back")
+        callback = self.on_up if up else self.on_down
+        try:
+            if callback is not None:
+                callback(self.db) if up else callback()
+        except Exception as e:
+            print(f"⚠️ DB {'connect' if up else 'disconnect'} hook error: {e}")
+            if up:
+                # Nothing is bound: stay unavailable so _run retries the hook with backoff
+                self.last_error = f"connect hook failed: {e}"
+                return
+        if up:
+            self.available = True
+            print(f"✅ Connected to MongoDB: {self.db_name}")
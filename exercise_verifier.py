@@ -10,14 +10,14 @@ class ExerciseVerifier:
 
     def check_mismatch(self, landmarks, expected_exercise_name: str):
         """
-        Checks if the current pose landmarks indicate an exercise that conflicts 
-        with the expected exercise.
+        Checks if the current (smoothed) pose landmarks indicate an exercise that
+        conflicts with the expected exercise.
         
         Returns:
             is_wrong (bool): True if a conflicting exercise is detected.
             reason (str): The specific movement that caused the conflict.
         """
-        if not landmarks:
+        if landmarks is None:
             return False, ""
 
         # 1. Extract Key Coordinates & Angles
@@ -65,10 +65,10 @@ class ExerciseVerifier:
     def _extract_features(self, landmarks):
         """Analyzes geometric features of the pose"""
         pl = self.mp_pose
+        points = landmarks.xy
         
         def get_pos(idx):
-            lm = landmarks[idx]
-            return np.array([lm.x, lm.y])
+            return points[idx]
 
         # Get Landmarks
         nose = get_pos(pl.NOSE.value)
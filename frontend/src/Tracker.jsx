@@ -330,7 +330,11 @@ const Tracker = () => {
         headers: {
           "Content-Type": "application/json",
         },
-        body: JSON.stringify({ exercise: selectedExercise.title }),
+        body: JSON.stringify({
+          exercise: selectedExercise.title,
+          email: user?.email,
+          fast_start: true,
+        }),
       });
 
       if (!res.ok) throw new Error("Server error");
@@ -77,7 +77,7 @@ const Analytics = () => {
           <Card
             icon={<TrendingUp color="#fff" />}
             title="Total Sessions"
-            value={history.length}
+            value={data?.total_sessions ?? history.length}
             color="#EF6C00"
           />
           <Card
@@ -0,0 +1,116 @@
+"""
+Landmark smoothing - vectorized One Euro filter over the full pose (33 landmarks)
+"""
+import math
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+
+class FilteredLandmark(NamedTuple):
+    """Attribute-compatible stand-in for a MediaPipe landmark"""
+    x: float
+    y: float
+    z: float
+    visibility: float
+
+
+class FilteredLandmarks:
+    """
+    Smoothed pose for one frame. Rows are MediaPipe indices, columns are
+    (x, y, z, visibility). Indexing returns landmark-like objects so existing
+    `landmarks[idx].x` consumers keep working; vectorized code uses `.array`.
+    """
+
+    def __init__(self, array: np.ndarray):
+        self.array = array
+
+    @property
+    def xy(self) -> np.ndarray:
+        return self.array[:, :2]
+
+    @property
+    def visibility(self) -> np.ndarray:
+        return self.array[:, 3]
+
+    def __getitem__(self, idx: int) -> FilteredLandmark:
+        return FilteredLandmark(*self.array[idx].tolist())
+
+    def __len__(self) -> int:
+        return len(self.array)
+
+
+class OneEuroFilter:
+    """
+    One Euro filter (Casiez et al.) applied element-wise to an array.
+    Low cutoff when still (kills jitter), higher cutoff when moving fast (low lag).
+    """
+
+    def __init__(self, min_cutoff: float = 1.0, beta: float = 10.0, d_cutoff: float = 1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self._x_prev = None
+        self._dx_prev = None
+        self._t_prev = None
+
+    @staticmethod
+    def _alpha(dt: float, cutoff):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def __call__(self, x: np.ndarray, timestamp: float) -> np.ndarray:
+        if self._x_prev is None:
+            self._x_prev = x.copy()
+            self._dx_prev = np.zeros_like(x)
+            self._t_prev = timestamp
+            return self._x_prev
+
+        dt = timestamp - self._t_prev
+        if dt <= 0:
+            return self._x_prev
+
+        # Smoothed speed drives the adaptive cutoff for every coordinate at once
+        dx = (x - self._x_prev) / dt
+        dx_hat = self._dx_prev + self._alpha(dt, self.d_cutoff) * (dx - self._dx_prev)
+
+        cutoff = self.min_cutoff + self.beta * np.abs(dx_hat)
+        x_hat = self._x_prev + self._alpha(dt, cutoff) * (x - self._x_prev)
+
+        self._x_prev, self._dx_prev, self._t_prev = x_hat, dx_hat, timestamp
+        return x_hat
+
+
+class LandmarkSmoother:
+    """Filters the whole pose once per frame; all consumers share the result"""
+
+    def __init__(self, min_cutoff: float = 1.0, beta: float = 10.0, d_cutoff: float = 1.0,
+                 reset_gap: float = 0.5):
+        self.filter = OneEuroFilter(min_cutoff, beta, d_cutoff)
+        # Lost tracking for longer than this => restart instead of gliding from a stale pose
+        self.reset_gap = reset_gap
+        self._last_seen = None
+
+    def apply(self, pose_landmarks, timestamp: float) -> Optional[FilteredLandmarks]:
+        """Returns smoothed landmarks for the frame, or None if no pose was detected"""
+        if not pose_landmarks:
+            return None
+
+        if self._last_seen is not None and (timestamp - self._last_seen) > self.reset_gap:
+            self.filter.reset()
+        self._last_seen = timestamp
+
+        raw = np.array(
+            [(lm.x, lm.y, lm.z, lm.visibility) for lm in pose_landmarks.landmark],
+            dtype=np.float64
+        )
+        # Visibility is a confidence, not a position: pass it through unfiltered
+        raw[:, :3] = self.filter(raw[:, :3], timestamp)
+        return FilteredLandmarks(raw)
+
+    def reset(self):
+        self.filter.reset()
+        self._last_seen = None
@@ -0,0 +1,248 @@
+"""
+Outbound mail dispatcher - OTPs and notifications leave the request path
+Routes enqueue a flask_mail Message and return at once. One background thread keeps a
+single SMTP connection open, sends whatever is queued over it in batches, closes it when
+idle and retries failed messages with exponential backoff. Every socket operation has a
+timeout, so a stalled server costs one retry instead of the dispatch thread.
+
+Offline throughput benchmark against a local aiosmtpd sink (needs `pip install aiosmtpd`):
+    python mail_dispatcher.py --bench 500
+"""
+import argparse
+import heapq
+import itertools
+import queue
+import smtplib
+import threading
+import time
+from typing import Optional
+
+from flask_mail import Connection
+
+from constants import (MAIL_BATCH_SIZE, MAIL_IDLE_TIMEOUT, MAIL_MAX_RETRIES,
+                       MAIL_RETRY_BACKOFF, MAIL_QUEUE_MAX, MAIL_SOCKET_TIMEOUT)
+
+
+class _TimedConnection(Connection):
+    """flask_mail's Connection, but the SMTP socket gets a timeout (flask_mail opens it without one)"""
+
+    def __init__(self, mail_state, timeout: float):
+        super().__init__(mail_state)
+        self.timeout = timeout
+
+    def configure_host(self):
+        smtp = smtplib.SMTP_SSL if self.mail.use_ssl else smtplib.SMTP
+        host = smtp(self.mail.server, self.mail.port, timeout=self.timeout)
+        host.set_debuglevel(int(self.mail.debug))
+        if self.mail.use_tls:
+            host.starttls()
+        if self.mail.username and self.mail.password:
+            host.login(self.mail.username, self.mail.password)
+        return host
+
+
+class MailDispatcher:
+    """Usage: dispatcher = MailDispatcher(app, mail); dispatcher.start(); dispatcher.send(msg) -> bool"""
+
+    def __init__(self, app, mail, batch_size: int = MAIL_BATCH_SIZE, idle_timeout: float = MAIL_IDLE_TIMEOUT,
+                 max_retries: int = MAIL_MAX_RETRIES, backoff: float = MAIL_RETRY_BACKOFF,
+                 max_queued: int = MAIL_QUEUE_MAX, socket_timeout: float = MAIL_SOCKET_TIMEOUT):
+        self.app = app
+        self.mail = mail
+        self.batch_size = batch_size
+        self.idle_timeout = idle_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.socket_timeout = socket_timeout
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queued)
+        self._retries = []  # heap of (due, seq, attempt, message)
+        self._seq = itertools.count()
+        self._connection = None
+        self._last_send = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"sent": 0, "retried": 0, "failed": 0, "connections": 0}
+
+    # --- PRODUCER SIDE ---
+    def send(self, message) -> bool:
+        """Queues a message; False when the queue is full (caller decides how to answer)"""
+        try:
+            self._queue.put_nowait((0, message))
+            return True
+        except queue.Full:
+            return False
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() + len(self._retries)
+
+    # --- DISPATCH THREAD ---
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Sends what is already queued (no new retries), then closes the connection"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        # flask_mail needs an app context to render and dispatch messages
+        with self.app.app_context():
+            while not (self._stop.is_set() and self._queue.empty()):
+                batch = self._next_batch()
+                if batch:
+                    self._send_batch(batch)
+                elif self._connection is not None and time.monotonic() - self._last_send > self.idle_timeout:
+                    self._close()
+            self._close()
+
+    def _next_batch(self):
+        """Due retries first, then queued messages (waits at most 1 s so idle/stop are noticed)"""
+        batch = []
+        now = time.monotonic()
+        while self._retries and self._retries[0][0] <= now and len(batch) < self.batch_size:
+            _, _, attempt, message = heapq.heappop(self._retries)
+            batch.append((attempt, message))
+
+        wait = 1.0 if not self._retries else min(1.0, self._retries[0][0] - now)
+        try:
+            batch.append(self._queue.get_nowait() if batch else self._queue.get(timeout=max(wait, 0.01)))
+        except queue.Empty:
+            return batch
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _open(self):
+        if self._connection is None:
+            connection = _TimedConnection(self.app.extensions["mail"], self.socket_timeout)
+            connection.__enter__()
+            self._connection = connection
+            self.stats["connections"] += 1
+        return self._connection
+
+    def _close(self):
+        if self._connection is not None:
+            try:
+                self._connection.__exit__(None, None, None)
+            except Exception:
+                pass  # server already dropped us
+            self._connection = None
+
+    def _send_batch(self, batch):
+        for attempt, message in batch:
+            try:
+                try:
+                    self._open().send(message)
+                except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError):
+                    # Stale kept-alive connection: reconnect once before counting a failure
+                    self._close()
+                    self._open().send(message)
+                self.stats["sent"] += 1
+                self._last_send = time.monotonic()
+            except smtplib.SMTPRecipientsRefused as e:
+                self._refused(attempt, message, e)
+            except smtplib.SMTPResponseException as e:
+                # 5xx is permanent (bad address / content); 4xx asks us to try again later
+                if e.smtp_code >= 500:
+                    self._reject(message, e)
+                else:
+                    self._close()
+                    self._retry(attempt, message, e)
+            except Exception as e:
+                self._close()
+                self._retry(attempt, message, e)
+
+    def _refused(self, attempt: int, message, error: smtplib.SMTPRecipientsRefused):
+        """Every recipient was refused: drop the 5xx ones, retry the message for the 4xx ones"""
+        permanent = {addr for addr, (code, _) in error.recipients.items() if code >= 500}
+        if len(permanent) == len(error.recipients):
+            self._reject(message, error)
+            return
+        if permanent:
+            print(f"⚠️ Mail to {sorted(permanent)} rejected: {error}")
+            for field in ("recipients", "cc", "bcc"):
+                setattr(message, field, [r for r in getattr(message, field) or [] if r not in permanent])
+        self._retry(attempt, message, error)
+
+    def _reject(self, message, error: Exception):
+        self.stats["failed"] += 1
+        print(f"⚠️ Mail to {message.recipients} rejected: {error}")
+
+    def _retry(self, attempt: int, message, error: Exception):
+        if attempt >= self.max_retries or self._stop.is_set():
+            self.stats["failed"] += 1
+            print(f"⚠️ Mail to {message.recipients} failed after {attempt + 1} attempt(s): {error}")
+            return
+        self.stats["retried"] += 1
+        due = time.monotonic() + self.backoff * (2 ** attempt)
+        heapq.heappush(self._retries, (due, next(self._seq), attempt + 1, message))
+
+
+# --- OFFLINE BENCHMARK ---
+def bench(count: int, port: int = 8025):
+    """Per-request connections (old send path) vs the dispatcher, both against a local sink"""
+    from aiosmtpd.controller import Controller
+    from flask import Flask
+    from flask_mail import Mail, Message
+
+    class Sink:
+        received = 0
+
+        async def handle_DATA(self, server, session, envelope):
+            Sink.received += 1
+            return "250 OK"
+
+    controller = Controller(Sink(), hostname="127.0.0.1", port=port)
+    controller.start()
+    app = Flask(__name__)
+    app.config.update(MAIL_SERVER="127.0.0.1", MAIL_PORT=port, MAIL_USE_TLS=False, MAIL_DEFAULT_SENDER="bench@localhost")
+    mail = Mail(app)
+
+    def message(i):
+        return Message("PhysioCheck OTP", recipients=[f"user{i}@example.com"], body=f"Your verification code is: {i:06d}")
+
+    try:
+        with app.app_context():
+            started = time.perf_counter()
+            for i in range(count):
+                mail.send(message(i))
+            direct = time.perf_counter() - started
+
+        dispatcher = MailDispatcher(app, mail)
+        dispatcher.start()
+        with app.app_context():
+            messages = [message(i) for i in range(count)]
+        started = time.perf_counter()
+        for m in messages:
+            dispatcher.send(m)
+        enqueue = time.perf_counter() - started
+        dispatcher.stop(timeout=120)
+        dispatched = time.perf_counter() - started
+    finally:
+        controller.stop()
+
+    print(f"Direct mail.send (connection per message): {count / direct:8.0f} msg/s  "
+          f"({direct / count * 1000:.2f} ms per request)")
+    print(f"Dispatcher (one connection, {dispatcher.stats['connections']} opened): {count / dispatched:8.0f} msg/s  "
+          f"({enqueue / count * 1e6:.1f} us per request to enqueue)")
+    print(f"Sink received {Sink.received} of {2 * count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark outbound mail against a local SMTP sink")
+    parser.add_argument("--bench", type=int, default=500, help="messages per run")
+    parser.add_argument("--port", type=int, default=8025, help="port for the aiosmtpd sink")
+    args = parser.parse_args()
+    bench(args.bench, args.port)
+
+
+if __name__ == "__main__":
+    main()
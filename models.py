@@ -2,9 +2,13 @@
 Data classes for state management - UPDATED FOR USER-CENTERED DESIGN & ACCURACY
 """
 from dataclasses import dataclass, field
-from typing import Dict, List
+from typing import Dict, List, Optional
 import time
 
+import numpy as np
+
+from constants import HISTORY_CHUNK_SIZE, HISTORY_MAX_SAMPLES, HISTORY_MIN_INTERVAL
+
 # --- NEW MODELS FOR GHOST POSE ---
 @dataclass
 class Landmark2D:
@@ -76,18 +80,113 @@ class CalibrationData:
         self.contracted_angles = {'RIGHT': [], 'LEFT': []}
         self.progress = 0
 
-@dataclass
+    def to_profile(self) -> dict:
+        """Calibrated thresholds in the form persisted per user and exercise"""
+        return {
+            'contracted_threshold': self.contracted_threshold,
+            'extended_threshold': self.extended_threshold,
+            'safe_angle_min': self.safe_angle_min,
+            'safe_angle_max': self.safe_angle_max
+        }
+
+    def apply_profile(self, profile: dict):
+        """Loads thresholds from a saved profile (missing keys keep current values)"""
+        self.contracted_threshold = int(profile.get('contracted_threshold', self.contracted_threshold))
+        self.extended_threshold = int(profile.get('extended_threshold', self.extended_threshold))
+        self.safe_angle_min = int(profile.get('safe_angle_min', self.safe_angle_min))
+        self.safe_angle_max = int(profile.get('safe_angle_max', self.safe_angle_max))
+
 class SessionHistory:
-    """Tracks session data for analysis"""
-    time: List[float] = field(default_factory=list)
-    right_angle: List[int] = field(default_factory=list)
-    left_angle: List[int] = field(default_factory=list)
-    right_feedback_count: int = 0
-    left_feedback_count: int = 0
-    
+    """
+    Tracks session data for analysis in preallocated NumPy chunks
+    (float32 seconds since start, int16 angles, 0 = joint not visible).
+
+    `time`, `right_angle` and `left_angle` are zero-copy views of the stored
+    samples. Storage grows chunk by chunk up to max_samples; after that every
+    other sample is dropped and the minimum interval doubles, so memory stays
+    bounded while the whole session remains covered at uniform resolution.
+    """
+
+    def __init__(self, chunk_size: int = HISTORY_CHUNK_SIZE, max_samples: int = HISTORY_MAX_SAMPLES,
+                 min_interval: float = HISTORY_MIN_INTERVAL):
+        self.chunk_size = chunk_size
+        self.max_samples = max(2, max_samples)
+        self.base_interval = min_interval
+        self.reset()
+
     def reset(self):
-        self.time.clear()
-        self.right_angle.clear()
-        self.left_angle.clear()
+        self.min_interval = self.base_interval
+        self._time = np.empty(0, dtype=np.float32)
+        self._angles = np.empty((0, 2), dtype=np.int16)
+        self._size = 0
+        # Counted reps: (seconds since start, side 0=RIGHT/1=LEFT, accuracy)
+        self.rep_events: List[tuple] = []
         self.right_feedback_count = 0
-        self.left_feedback_count = 0
\ No newline at end of file
+        self.left_feedback_count = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def time(self) -> np.ndarray:
+        return self._time[:self._size]
+
+    @property
+    def right_angle(self) -> np.ndarray:
+        return self._angles[:self._size, 0]
+
+    @property
+    def left_angle(self) -> np.ndarray:
+        return self._angles[:self._size, 1]
+
+    @property
+    def duration(self) -> float:
+        return float(self._time[self._size - 1]) if self._size else 0.0
+
+    def append(self, t: float, right_angle: Optional[int], left_angle: Optional[int]):
+        """
+        Stores one frame (None angles are stored as 0); may be skipped by downsampling.
+        Time must not go backwards: a restarted clock needs a new (or reset) history.
+        """
+        if self._size:
+            dt = t - float(self._time[self._size - 1])
+            if dt < 0:
+                raise ValueError(f"SessionHistory time went backwards ({t:.3f}s after {t - dt:.3f}s)")
+            if dt < self.min_interval:
+                return
+        if self._size == len(self._time):
+            self._grow()
+        self._time[self._size] = t
+        self._angles[self._size] = (right_angle or 0, left_angle or 0)
+        self._size += 1
+
+    def record_rep(self, t: float, side: int, accuracy: int):
+        self.rep_events.append((t, side, accuracy))
+
+    def _grow(self):
+        if self._size >= self.max_samples:
+            self._compact()
+            return
+        # Geometric growth in whole chunks keeps appends amortized O(1)
+        capacity = max(self.chunk_size, 2 * len(self._time))
+        capacity = min(self.max_samples, -(-capacity // self.chunk_size) * self.chunk_size)
+        self._time = self._resized(self._time, capacity)
+        self._angles = self._resized(self._angles, capacity)
+
+    def _resized(self, array: np.ndarray, capacity: int) -> np.ndarray:
+        new = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+        new[:self._size] = array[:self._size]
+        return new
+
+    def _compact(self):
+        """Full: keep every other sample and halve the rate from now on"""
+        # New buffers so views handed out earlier are never rewritten underneath
+        keep = slice(0, self._size, 2)
+        time_kept, angles_kept = self._time[keep], self._angles[keep]
+        self._size = len(time_kept)
+        self._time = np.empty_like(self._time)
+        self._angles = np.empty_like(self._angles)
+        self._time[:self._size] = time_kept
+        self._angles[:self._size] = angles_kept
+        kept_spacing = float(np.median(np.diff(time_kept))) if self._size > 1 else 0.0
+        self.min_interval = max(2 * self.min_interval, kept_spacing)
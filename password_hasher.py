@@ -0,0 +1,131 @@
+"""
+Password hashing pool - bcrypt in a small, bounded set of worker processes
+bcrypt is deliberately slow (~100-250 ms of CPU per call). On request threads it competes
+with everything else in the threading-mode server (video feed included); here it runs in
+separate processes and the request thread only waits for the result.
+At most max_pending hashes are queued or running; beyond that callers get HasherBusy at once.
+Hashes are the same $2b$ strings flask_bcrypt produces, so existing accounts keep working.
+"""
+import hmac
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+import bcrypt
+
+from constants import BCRYPT_ROUNDS, HASH_WORKERS, HASH_MAX_PENDING, HASH_TIMEOUT
+
+
+class HasherBusy(Exception):
+    """Too many hashes pending (or the pool is too slow); answer 503 and let the client retry"""
+
+
+# --- WORKER FUNCTIONS (run in the pool processes) ---
+def _hash(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+
+
+def _check(pw_hash: bytes, password: bytes) -> bool:
+    return hmac.compare_digest(bcrypt.hashpw(password, pw_hash), pw_hash)
+
+
+def _ready() -> bool:
+    return True
+
+
+class PasswordHasher:
+    """Drop-in for flask_bcrypt's generate_password_hash / check_password_hash"""
+
+    def __init__(self, workers: int = HASH_WORKERS, max_pending: int = HASH_MAX_PENDING,
+                 rounds: int = BCRYPT_ROUNDS, timeout: float = HASH_TIMEOUT):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self.timeout = timeout
+        self.rejected = 0
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def start(self):
+        """Starts the workers now: call at import, before the app starts any thread (fork safety)"""
+        self._executor().submit(_ready).result()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # fork: workers start with bcrypt loaded and never re-import the app (spawn would)
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("fork") if "fork" in methods else None
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=context)
+            return self._pool
+
+    def _discard(self, pool: ProcessPoolExecutor):
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, fn, *args):
+        """(pool, future) - the pool is returned so a later failure replaces the right one"""
+        pool = self._executor()
+        try:
+            return pool, pool.submit(fn, *args)
+        except BrokenProcessPool:
+            # A worker died (OOM kill etc.): replace the pool once
+            self._discard(pool)
+            pool = self._executor()
+            return pool, pool.submit(fn, *args)
+
+    def _reserve(self) -> bool:
+        with self._pending_lock:
+            if self._pending >= self.max_pending:
+                return False
+            self._pending += 1
+            return True
+
+    def _release(self, _future=None):
+        with self._pending_lock:
+            self._pending -= 1
+
+    def _run(self, fn, *args):
+        if not self._reserve():
+            self.rejected += 1
+            raise HasherBusy(f"{self.max_pending} password hashes already pending")
+        try:
+            pool, future = self._submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+        # The slot frees when the work does, even if this caller stops waiting
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError as e:
+            self.rejected += 1
+            raise HasherBusy("password hashing timed out") from e
+        except BrokenProcessPool as e:
+            # The worker died while hashing: replace the pool for the next caller, 503 this one
+            self._discard(pool)
+            self.rejected += 1
+            raise HasherBusy("password hashing worker died") from e
+
+    def generate_password_hash(self, password: str) -> str:
+        return self._run(_hash, password.encode("utf-8"), self.rounds).decode("utf-8")
+
+    def check_password_hash(self, pw_hash: str, password: str) -> bool:
+        if not pw_hash or not password:
+            return False  # e.g. Google accounts have no password
+        return self._run(_check, pw_hash.encode("utf-8"), password.encode("utf-8"))
+
+    @property
+    def pending(self) -> int:
+        with self._pending_lock:
+            return self._pending
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,220 @@
+"""
+Per-patient rollups - running totals kept up to date on every session insert
+Analytics and prediction read one small document instead of the session history.
+
+Rollup document (collection `patient_rollups`, one per email):
+    sessions, total_reps, total_errors, right_reps, left_reps, duration,
+    counted_sessions, counted_accuracy_sum      -> average accuracy (sessions with reps)
+    days.<YYYY-MM-DD>.{sessions, reps, errors, duration, accuracy_sum,
+                       form_accuracy_sum, last_session_id}   -> last ROLLUP_DAYS days only
+    exercises.<key>.{name, reps}
+    recent: last 5 sessions [{date, form_accuracy}]
+    streak, last_date                           -> consecutive training days
+Days older than the window drop out of `days`; the totals above still include them, so
+the document stays the same size however long the history gets.
+
+Sessions already folded in are listed in `rollup_applied` (unique session_id), so a
+session is never counted twice (backfill racing the insert hook, a replayed write).
+"""
+import time
+from datetime import datetime, timedelta
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+RECENT_SESSIONS = 5
+ROLLUP_DAYS = 366  # per-day rows kept for charts / adherence (a year, leap day included)
+
+
+def session_accuracy(reps, errors) -> int:
+    """Analytics accuracy of one session (no reps counts as 100%)"""
+    if reps > 0:
+        return max(0, int((reps - errors) / reps * 100))
+    return 100
+
+
+def form_accuracy(reps, errors) -> int:
+    """Prediction accuracy of one session (no reps counts as a single rep)"""
+    reps = reps or 1
+    return max(0, int((reps - errors) / reps * 100))
+
+
+def _field_key(name: str) -> str:
+    """Exercise names become field names: no dots or leading '$'"""
+    return name.replace(".", "_").lstrip("$") or "_"
+
+
+def _previous_day(date_str: str) -> str:
+    return (datetime.strptime(date_str, "%Y-%m-%d") - timedelta(days=1)).strftime("%Y-%m-%d")
+
+
+def exercise_reps(session: dict) -> dict:
+    """Exercise name -> reps of one session: per block for a circuit, else the session's exercise"""
+    blocks = session.get("blocks") or []
+    if len(blocks) <= 1:
+        return {session.get("exercise", "Freestyle"): session.get("total_reps", 0)}
+    reps = {}
+    for block in blocks:
+        reps[block["exercise"]] = reps.get(block["exercise"], 0) + block["right_reps"] + block["left_reps"]
+    return reps
+
+
+def _window_start(date_str: str) -> str:
+    """First day still kept in `days` when date_str is the newest"""
+    return (datetime.strptime(date_str, "%Y-%m-%d") - timedelta(days=ROLLUP_DAYS - 1)).strftime("%Y-%m-%d")
+
+
+def mark_applied(applied, session_ids) -> None:
+    """Records sessions as counted (a backfill's sessions); ids already listed are skipped"""
+    if not session_ids:
+        return
+    try:
+        applied.insert_many([{"session_id": sid} for sid in session_ids], ordered=False)
+    except BulkWriteError as e:
+        if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+            raise
+
+
+def apply_session(collection, session: dict, session_id=None, applied=None):
+    """
+    Folds one saved session into its patient's rollup.
+    Counters move with a single atomic $inc/$push-$slice upsert; the streak (and the
+    `days` window) is a second (idempotent) update that only depends on the session's date.
+    With `applied` the session is claimed there first: a session already listed is a no-op.
+    """
+    email = session["email"]
+    date = session.get("date", "Unknown")
+    reps = session.get("total_reps", 0)
+    errors = session.get("total_errors", 0)
+    duration = session.get("duration", 0)
+    acc = session_accuracy(reps, errors)
+    form_acc = form_accuracy(reps, errors)
+    per_exercise = {_field_key(name): (name, ex_reps) for name, ex_reps in exercise_reps(session).items()}
+
+    claimed = applied is not None and session_id is not None
+    if claimed:
+        try:
+            applied.insert_one({"session_id": session_id})
+        except DuplicateKeyError:
+            return  # already in the rollup
+
+    try:
+        collection.update_one(
+            {"email": email},
+            {
+                "$inc": {
+                    "sessions": 1,
+                    "total_reps": reps,
+                    "total_errors": errors,
+                    "right_reps": session.get("right_reps", 0),
+                    "left_reps": session.get("left_reps", 0),
+                    "duration": duration,
+                    "counted_sessions": 1 if reps > 0 else 0,
+                    "counted_accuracy_sum": acc if reps > 0 else 0,
+                    f"days.{date}.sessions": 1,
+                    f"days.{date}.reps": reps,
+                    f"days.{date}.errors": errors,
+                    f"days.{date}.duration": duration,
+                    f"days.{date}.accuracy_sum": acc,
+                    f"days.{date}.form_accuracy_sum": form_acc,
+                    **{f"exercises.{key}.reps": ex_reps for key, (_, ex_reps) in per_exercise.items()},
+                },
+                "$set": {
+                    f"days.{date}.last_session_id": str(session_id) if session_id is not None else None,
+                    **{f"exercises.{key}.name": name for key, (name, _) in per_exercise.items()},
+                    "updated_at": time.time(),
+                },
+                "$push": {
+                    "recent": {"$each": [{"date": date, "form_accuracy": form_acc}], "$slice": -RECENT_SESSIONS}
+                },
+            },
+            upsert=True,
+        )
+    except Exception:
+        if claimed:
+            applied.delete_one({"session_id": session_id})  # not counted: let a retry claim it again
+        raise
+
+    if date == "Unknown":
+        return
+    yesterday = _previous_day(date)
+    collection.update_one(
+        {"email": email},
+        [{"$set": {
+            "streak": {"$switch": {
+                "branches": [
+                    # Same day again, or an older session arriving late: unchanged
+                    {"case": {"$lte": [date, {"$ifNull": ["$last_date", ""]}]}, "then": {"$ifNull": ["$streak", 1]}},
+                    {"case": {"$eq": ["$last_date", yesterday]}, "then": {"$add": [{"$ifNull": ["$streak", 0]}, 1]}},
+                ],
+                "default": 1,
+            }},
+            "last_date": {"$max": [date, {"$ifNull": ["$last_date", ""]}]},
+            # Bounded per-day history: drop days that fell out of the window
+            "days": {"$arrayToObject": {"$filter": {
+                "input": {"$objectToArray": {"$ifNull": ["$days", {}]}},
+                "cond": {"$gte": ["$$this.k", _window_start(date)]},
+            }}},
+        }}],
+    )
+
+
+def build_rollup(email: str, summary: dict) -> dict:
+    """Rollup for a patient whose history predates rollups (from the aggregation summary)"""
+    daily = (summary or {}).get("daily", [])
+    totals = ((summary or {}).get("totals") or [{}])[0]
+
+    rollup = {
+        "email": email,
+        "sessions": totals.get("sessions", 0),
+        "total_reps": sum(row["reps"] for row in daily),
+        "total_errors": sum(row["errors"] for row in daily),
+        "right_reps": totals.get("right_reps", 0),
+        "left_reps": totals.get("left_reps", 0),
+        "duration": sum(row["duration"] for row in daily),
+        "counted_sessions": sum(row["acc_count"] for row in daily),
+        "counted_accuracy_sum": sum(row["acc_sum"] for row in daily),
+        "days": {},
+        "exercises": {},
+        "recent": list(reversed((summary or {}).get("recent", []))),
+        "updated_at": time.time(),
+    }
+    for row in daily:
+        date = row["_id"]
+        day = rollup["days"].setdefault(date, {
+            "sessions": 0, "reps": 0, "errors": 0, "duration": 0,
+            "accuracy_sum": 0, "form_accuracy_sum": 0, "last_session_id": None,
+        })
+        day["sessions"] += row["sessions"]
+        day["reps"] += row["reps"]
+        day["errors"] += row["errors"]
+        day["duration"] += row["duration"]
+        day["accuracy_sum"] += row["accuracy"] * row["sessions"]
+        day["form_accuracy_sum"] += row["form_accuracy"] * row["sessions"]
+        day["last_session_id"] = str(row["last_session_id"])
+    for row in (summary or {}).get("exercises", []):
+        rollup["exercises"][_field_key(row["_id"])] = {"name": row["_id"], "reps": row["reps"]}
+
+    # One-off streak walk; from here on apply_session maintains it
+    dates = sorted(d for d in rollup["days"] if d != "Unknown")
+    streak = 0
+    if dates:
+        streak = 1
+        day = dates[-1]
+        while _previous_day(day) in rollup["days"]:
+            streak += 1
+            day = _previous_day(day)
+    rollup["streak"] = streak
+    rollup["last_date"] = dates[-1] if dates else None
+    if dates:
+        start = _window_start(dates[-1])
+        rollup["days"] = {d: day for d, day in rollup["days"].items() if d >= start}
+    return rollup
+
+
+def current_streak(rollup: dict, today: str = None) -> int:
+    """Stored streak, if it is still alive (trained today or yesterday)"""
+    today = today or datetime.now().strftime("%Y-%m-%d")
+    last = rollup.get("last_date")
+    if last in (today, _previous_day(today)):
+        return rollup.get("streak", 0)
+    return 0
@@ -3,6 +3,7 @@ MediaPipe pose detection and landmark extraction - AGNOSTIC
 """
 import mediapipe as mp
 import math
+import numpy as np
 from typing import Dict, Optional
 from constants import ExerciseConfig 
 
@@ -14,47 +15,35 @@ class PoseProcessor:
         self.angle_calculator = angle_calculator
         self.config = exercise_config 
     
-    def extract_arm_angle(self, landmarks, arm: str) -> Optional[float]:
-        """Extract angle for the specified joint using the current exercise config"""
-        try:
-            # Select the correct landmark index list based on arm/side
-            if arm == 'RIGHT':
-                indices = self.config.right_landmarks
-            elif arm == 'LEFT':
-                indices = self.config.left_landmarks
-            else:
-                return None
-            
-            # Indices are (A, B, C) where B is the vertex
-            A_idx, B_idx, C_idx = indices
-            
-            # Extract Coordinates
-            A = [landmarks[A_idx].x, landmarks[A_idx].y] 
-            B = [landmarks[B_idx].x, landmarks[B_idx].y] 
-            C = [landmarks[C_idx].x, landmarks[C_idx].y] 
-            
-            # Check landmark visibility
-            if (landmarks[A_idx].visibility < 0.6 or
-                landmarks[B_idx].visibility < 0.6 or
-                landmarks[C_idx].visibility < 0.6):
-                return None
+    def get_joint_angles(self, landmarks, joint_landmarks) -> np.ndarray:
+        """
+        Angles for any number of joints in one vectorized step.
+        joint_landmarks is an (N, 3) index array of (A, B, C) triples where B is
+        the vertex; joints with low visibility come back as NaN.
+        """
+        indices = np.asarray(joint_landmarks)
+        points = landmarks.xy[indices]
 
-            # Calculate and smooth the angle
-            raw_angle = self.angle_calculator.calculate_angle(A, B, C)
-            return self.angle_calculator.get_smoothed_angle(arm, raw_angle)
-            
-        except (KeyError, IndexError, AttributeError):
-            return None
-    
-    def get_both_arm_angles(self, results) -> Dict[str, Optional[int]]:
-        """Get angles for both sides defined in the config"""
-        if not results.pose_landmarks:
+        # Check landmark visibility
+        visible = (landmarks.visibility[indices] >= 0.6).all(axis=1)
+        angles = self.angle_calculator.calculate_angles(points[:, 0], points[:, 1], points[:, 2])
+        return np.where(visible, angles, np.nan)
+
+    def get_both_arm_angles(self, landmarks) -> Dict[str, Optional[int]]:
+        """Get angles for both sides defined in the config from the smoothed landmarks"""
+        if landmarks is None:
             return {'RIGHT': None, 'LEFT': None}
-        
-        landmarks = results.pose_landmarks.landmark
+
+        try:
+            angles = self.get_joint_angles(
+                landmarks, [self.config.right_landmarks, self.config.left_landmarks]
+            )
+        except (IndexError, ValueError):
+            return {'RIGHT': None, 'LEFT': None}
+
         return {
-            'RIGHT': self.extract_arm_angle(landmarks, 'RIGHT'),
-            'LEFT': self.extract_arm_angle(landmarks, 'LEFT')
+            side: None if np.isnan(angles[i]) else int(angles[i])
+            for i, side in enumerate(['RIGHT', 'LEFT'])
         }
 
     def detect_v_sign(self, results) -> bool:
@@ -1,174 +1,130 @@
 """
 Rep counting logic - STABILIZED AND ACCURACY-FOCUSED
+State machine runs vectorized in RepEngine; this layer adds user-facing feedback
 """
-from collections import deque
-from constants import ArmStage
+import numpy as np
+from constants import ArmStage, REP_HISTORY_WINDOW, PREDICTIVE_TRANSITIONS
+from rep_engine import RepEngine, STAGE_NAMES
 import time
 import random
 
 class RepCounter:
-    def __init__(self, calibration_data, min_rep_duration=0.5):
+    def __init__(self, calibration_data, min_rep_duration=0.5, history_window=REP_HISTORY_WINDOW,
+                 sides=('RIGHT', 'LEFT'), predictive=PREDICTIVE_TRANSITIONS):
         self.calibration = calibration_data
-        self.min_rep_duration = min_rep_duration 
+        self.min_rep_duration = min_rep_duration
+        self.sides = list(sides)
 
-        # Stability buffers for EACH arm independently
-        self.angle_history = {
-            'RIGHT': deque(maxlen=8),
-            'LEFT': deque(maxlen=8)
-        }
+        # State confirmation + rep validation for ALL sides in one vectorized step
+        # (predictive: velocity-confirmed transitions may skip the hold time)
+        self.state_hold_time = 0.1
+        self.engine = RepEngine(self.sides, min_rep_duration, self.state_hold_time, history_window,
+                                predictive=predictive)
 
         # --- NEW STABILITY LOGIC: Prevents rapid color flickering ---
-        self.color_lock_until = {'RIGHT': 0, 'LEFT': 0}
+        self.color_lock_until = {arm: 0 for arm in self.sides}
         self.color_hold_duration = 1.5 # Seconds to hold a color (e.g. Green) stable
 
-        # State confirmation variables - INDEPENDENT
-        self.state_hold_time = 0.1 
-        self.pending_state = {'RIGHT': None, 'LEFT': None}
-        self.pending_state_start = {'RIGHT': 0, 'LEFT': 0}
-        
-        self.rep_start_time = {'RIGHT': 0, 'LEFT': 0}
-        self.last_rep_time = {'RIGHT': 0, 'LEFT': 0}
-        
-        # LOGIC FIX: Ensure full Range of Motion (Must go DOWN before counting UP->DOWN)
-        self.ready_to_count = {'RIGHT': False, 'LEFT': False}
-        
-        # TRACKING PEAKS FOR ACCURACY
-        self.rep_min_angle = {'RIGHT': 180, 'LEFT': 180}
-        self.rep_max_angle = {'RIGHT': 0, 'LEFT': 0}
-        
+        self.last_rep_time = {arm: 0 for arm in self.sides}
+
         # Compliments - USER CENTERED
         self.compliments = [
-            "Perfect Form!", 
-            "Great Control!", 
-            "Nice and steady!", 
+            "Perfect Form!",
+            "Great Control!",
+            "Nice and steady!",
             "Excellent!"
         ]
-        self.current_compliment = {'RIGHT': "Maintain Form", 'LEFT': "Maintain Form"}
-        
-        # Track last feedback to avoid spam
-        self.last_feedback = {'RIGHT': "", 'LEFT': ""}
-        self.feedback_cooldown = {'RIGHT': 0, 'LEFT': 0}
-
-    def _calculate_rep_accuracy(self, arm):
-        """Calculates 0-100% accuracy based on calibrated range of motion"""
-        cal_ext = self.calibration.extended_threshold
-        cal_con = self.calibration.contracted_threshold
-        cal_range = abs(cal_ext - cal_con)
-        
-        if cal_range == 0: return 100
-        
-        user_range = abs(self.rep_max_angle[arm] - self.rep_min_angle[arm])
-        accuracy = (user_range / cal_range) * 100
-        return min(100, int(accuracy))
-
-    def process_rep(self, arm, angle, metrics, current_time, history):
-        """Process rep counting for a single arm independently"""
-        metrics.angle = angle
-        self.angle_history[arm].append(angle)
-
-        # Track peaks during the current rep for accuracy calculation
-        self.rep_min_angle[arm] = min(self.rep_min_angle[arm], angle)
-        self.rep_max_angle[arm] = max(self.rep_max_angle[arm], angle)
-
-        if len(self.angle_history[arm]) < 2:
-            return
+        self.current_compliment = {arm: "Maintain Form" for arm in self.sides}
 
-        prev_stage = metrics.stage
-        
-        # Get calibrated thresholds
-        contracted = self.calibration.contracted_threshold
-        extended = self.calibration.extended_threshold
-        
-        # --- 1. DETERMINE STATE ---
-        target_state = self._determine_target_state(angle, contracted, extended, prev_stage)
-        
-        # --- 2. STATE SWITCHING WITH CONFIRMATION ---
-        if target_state != prev_stage:
-            if self.pending_state[arm] == target_state:
-                if (current_time - self.pending_state_start[arm]) >= self.state_hold_time:
-                    self._handle_state_transition(arm, prev_stage, target_state, metrics, current_time)
-            else:
-                self.pending_state[arm] = target_state
-                self.pending_state_start[arm] = current_time
-        else:
-            self.pending_state[arm] = None
-
-        # Update rep timing
-        if metrics.stage == ArmStage.UP.value:
-            metrics.curr_rep_time = current_time - self.rep_start_time[arm]
-
-        # --- 3. STABILIZED FEEDBACK GENERATION ---
-        self._provide_user_centered_feedback(arm, angle, metrics, current_time)
-
-    def _determine_target_state(self, angle, contracted, extended, current_stage):
-        """Determines state with dynamic buffer for easier rep counting"""
-        # Dynamic buffer: 15% of ROM, clamped between 5 and 15 degrees
-        # This prevents 'stuck' states for users with limited mobility
-        rom = abs(extended - contracted)
-        buffer = max(5, min(15, int(rom * 0.15)))
-        
-        up_limit = contracted + buffer 
-        down_limit = extended - buffer
-
-        if angle <= up_limit:
-            return ArmStage.UP.value
-        elif angle >= down_limit:
-            return ArmStage.DOWN.value
-        
-        # Hysteresis Transitions (prevents flickering)
-        if current_stage == ArmStage.UP.value:
-            return ArmStage.UP.value if angle < (up_limit + 5) else ArmStage.MOVING_DOWN.value
-        elif current_stage == ArmStage.DOWN.value:
-            return ArmStage.DOWN.value if angle > (down_limit - 5) else ArmStage.MOVING_UP.value
-        elif current_stage == ArmStage.MOVING_UP.value:
-            return ArmStage.UP.value if angle <= up_limit else ArmStage.MOVING_UP.value
-        elif current_stage == ArmStage.MOVING_DOWN.value:
-            return ArmStage.DOWN.value if angle >= down_limit else ArmStage.MOVING_DOWN.value
-            
-        return current_stage
-
-    def _handle_state_transition(self, arm, prev_stage, new_stage, metrics, current_time):
-        """Handle state transitions and rep counting"""
-        metrics.stage = new_stage
-        
-        # 1. RESET / READY AT BOTTOM (DOWN)
-        # We only mark the arm "ready" to count a rep if it hits the bottom (extension).
-        # This prevents starting halfway or spamming reps at the top.
-        if new_stage == ArmStage.DOWN.value:
-            self.ready_to_count[arm] = True
-            self.rep_start_time[arm] = current_time
-            # Reset accuracy peaks for the upcoming rep
-            self.rep_min_angle[arm], self.rep_max_angle[arm] = 180, 0
-            
-        # 2. DETECT REP COMPLETION (Moving from UP -> DOWN/MOVING_DOWN)
-        elif prev_stage == ArmStage.UP.value and new_stage in [ArmStage.MOVING_DOWN.value, ArmStage.DOWN.value]:
-            
-            # CRITICAL CHECK: Did we come from a valid start position?
-            if self.ready_to_count[arm]:
-                rep_duration = current_time - self.rep_start_time[arm]
-                
-                # Validate rep duration
-                if rep_duration >= self.min_rep_duration:
-                    metrics.rep_count += 1
-                    metrics.rep_time = rep_duration
-                    
-                    # Calculate accuracy for this completed rep
-                    metrics.accuracy = self._calculate_rep_accuracy(arm)
-                    
-                    self.last_rep_time[arm] = current_time
-                    
-                    # Select random compliment
-                    self.current_compliment[arm] = random.choice(self.compliments)
-                    
-                    # Lock the success color for stability
-                    self.color_lock_until[arm] = current_time + self.color_hold_duration
-                    
-                    # CONSUME THE FLAG: User must go down to DOWN state to earn next rep
-                    self.ready_to_count[arm] = False
+        # Track last feedback to avoid spam
+        self.last_feedback = {arm: "" for arm in self.sides}
+        self.feedback_cooldown = {arm: 0 for arm in self.sides}
+
+        # Completed reps since the last drain_events() (rep-level event log)
+        self.events = []
+        self.warnings = {arm: () for arm in self.sides}
+
+    def process_frame(self, angles, metrics, current_time, warnings=None):
+        """
+        Process rep counting for every side at once (angles: side -> angle or None).
+        The engine owns the stage; metrics[side].stage is only a copy of it for the UI.
+        warnings: side -> active warning codes, recorded with any rep completed this frame.
+        """
+        if warnings is not None:
+            self.warnings = warnings
+        # Calibration can change mid-session (recalibration, exercise switch)
+        self.engine.set_thresholds(self.calibration.contracted_threshold,
+                                   self.calibration.extended_threshold)
+
+        angle_array = np.array(
+            [np.nan if angles.get(arm) is None else angles[arm] for arm in self.sides],
+            dtype=np.float64
+        )
+        result = self.engine.step(angle_array, current_time)
+
+        for i, arm in enumerate(self.sides):
+            angle = angles.get(arm)
+            if angle is None:
+                continue
+            metrics[arm].angle = angle
+            metrics[arm].stage = STAGE_NAMES[self.engine.stage[i]]
+            if not result.active[i]:
+                continue
+
+            if result.transitioned[i]:
+                self._handle_state_transition(arm, metrics[arm], current_time, bool(result.counted[i]))
+
+            # Update rep timing
+            if metrics[arm].stage == ArmStage.UP.value:
+                metrics[arm].curr_rep_time = current_time - self.engine.rep_start[i]
+
+            # --- STABILIZED FEEDBACK GENERATION ---
+            self._provide_user_centered_feedback(arm, angle, metrics[arm], current_time)
+
+    def _handle_state_transition(self, arm, metrics, current_time, counted):
+        """Apply a confirmed state transition (and a completed rep) to the arm's metrics"""
+        if counted:
+            i = self.engine.index[arm]
+            metrics.rep_count += 1
+            metrics.rep_time = float(self.engine.rep_time[i])
+
+            # Accuracy for this completed rep
+            metrics.accuracy = int(self.engine.accuracy[i])
+
+            self.last_rep_time[arm] = current_time
+            self._record_event(arm, i, metrics, current_time)
+
+            # Select random compliment
+            self.current_compliment[arm] = random.choice(self.compliments)
+
+            # Lock the success color for stability
+            self.color_lock_until[arm] = current_time + self.color_hold_duration
+
+    def _record_event(self, arm, i, metrics, current_time):
+        """One completed rep: peaks are still those of this rep (reset on the next DOWN)"""
+        min_angle = float(self.engine.rep_min[i])
+        max_angle = float(self.engine.rep_max[i])
+        warnings = list(self.warnings.get(arm, ()))
+        if min_angle < self.calibration.safe_angle_min or max_angle > self.calibration.safe_angle_max:
+            warnings.append("unsafe_range")
+        self.events.append({
+            'timestamp': current_time,
+            'side': arm,
+            'duration': round(metrics.rep_time, 3),
+            'accuracy': metrics.accuracy,
+            'min_angle': round(min_angle, 1),
+            'max_angle': round(max_angle, 1),
+            'warnings': warnings,
+        })
+
+    def drain_events(self):
+        """Rep events recorded since the previous call"""
+        events, self.events = self.events, []
+        return events
 
     def _provide_user_centered_feedback(self, arm, angle, metrics, current_time):
         """Encouraging feedback with stable UI colors"""
-        
+
         # 1. PRIORITY: Show compliment after rep (Locked to prevent flickering)
         if (current_time - self.last_rep_time[arm]) < self.color_hold_duration:
             metrics.feedback = self.current_compliment[arm]
@@ -190,13 +146,13 @@ class RepCounter:
         else:
             new_feedback = "Smooth movements"
             metrics.feedback_color = "GREEN"
-            
+
         # Error states only for tracking loss
         if metrics.stage == ArmStage.LOST.value:
             new_feedback = "Adjust your position"
             metrics.feedback_color = "RED"
             self.color_lock_until[arm] = current_time + 2.0 # Lock error color slightly longer
-        
+
         # Only update if feedback changed (reduces TTS spam)
         if new_feedback != self.last_feedback[arm]:
             metrics.feedback = new_feedback
@@ -206,9 +162,17 @@ class RepCounter:
 
     def reset_arm(self, arm):
         """Reset tracking for specific arm"""
-        self.angle_history[arm].clear()
-        self.pending_state[arm] = None
-        self.rep_start_time[arm] = 0
+        self.engine.reset([arm])
         self.last_feedback[arm] = ""
         self.color_lock_until[arm] = 0
-        self.ready_to_count[arm] = False
\ No newline at end of file
+
+    def reset(self):
+        """Reset all per-exercise tracking state (every side)"""
+        self.engine.reset()
+        for arm in self.sides:
+            self.last_feedback[arm] = ""
+            self.color_lock_until[arm] = 0
+            self.last_rep_time[arm] = 0
+            self.current_compliment[arm] = "Maintain Form"
+            self.feedback_cooldown[arm] = 0
+            self.warnings[arm] = ()
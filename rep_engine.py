@@ -0,0 +1,225 @@
+"""
+Vectorized rep state machine - steps ANY number of tracked joints per frame
+"""
+from typing import List, NamedTuple, Sequence
+
+import numpy as np
+
+from constants import (ArmStage, REP_HISTORY_WINDOW,
+                       DEFAULT_CONTRACTED_THRESHOLD, DEFAULT_EXTENDED_THRESHOLD,
+                       VELOCITY_WINDOW, VELOCITY_MIN_SAMPLES, VELOCITY_CONFIDENCE)
+
+# Integer stage codes used inside the engine (index into STAGE_NAMES)
+UP, DOWN, MOVING_UP, MOVING_DOWN = 0, 1, 2, 3
+NO_STAGE = -1
+STAGE_NAMES = [ArmStage.UP.value, ArmStage.DOWN.value,
+               ArmStage.MOVING_UP.value, ArmStage.MOVING_DOWN.value]
+
+# Samples kept per joint for the velocity fit (covers VELOCITY_WINDOW up to ~80 fps)
+VELOCITY_HISTORY_SIZE = 16
+
+
+class StepResult(NamedTuple):
+    """Per-joint boolean masks / values produced by one RepEngine.step()"""
+    active: np.ndarray        # joint had a valid angle and enough history to be evaluated
+    transitioned: np.ndarray  # confirmed stage change this frame
+    prev_stage: np.ndarray    # stage codes before the step
+    counted: np.ndarray       # a rep was completed this frame
+
+
+class RepEngine:
+    """
+    Rep counting state for N joints held in NumPy arrays.
+
+    Same rules as the original per-arm logic (dynamic ROM buffer, hysteresis,
+    state confirmation after state_hold_time, ready-at-bottom, minimum rep
+    duration), but all joints advance in a single vectorized step.
+
+    With predictive=True the rep-completing transition (UP -> MOVING_DOWN of a
+    rep that counts) is committed on its first frame when the angular velocity
+    fitted over the last VELOCITY_WINDOW seconds is rising with |slope / std.
+    error| >= VELOCITY_CONFIDENCE, instead of after state_hold_time. Every other
+    transition keeps the hold. Early commits never change the count: a rep is
+    counted once per visit to DOWN either way (a noise spike that is counted
+    early would have been counted when the arm really leaves UP), so only the
+    feedback comes sooner.
+    """
+
+    def __init__(self, joint_names: Sequence[str], min_rep_duration: float = 0.5,
+                 state_hold_time: float = 0.1, history_window: float = REP_HISTORY_WINDOW,
+                 predictive: bool = False):
+        self.joint_names: List[str] = list(joint_names)
+        self.index = {name: i for i, name in enumerate(self.joint_names)}
+        self.min_rep_duration = min_rep_duration
+        self.state_hold_time = state_hold_time
+        self.history_window = history_window
+        self.predictive = predictive
+
+        n = len(self.joint_names)
+        self.contracted = np.full(n, DEFAULT_CONTRACTED_THRESHOLD, dtype=np.float64)
+        self.extended = np.full(n, DEFAULT_EXTENDED_THRESHOLD, dtype=np.float64)
+        self.reset()
+
+    def set_thresholds(self, contracted, extended):
+        """Per-joint (or scalar, broadcast) calibrated thresholds"""
+        n = len(self.joint_names)
+        self.contracted = np.broadcast_to(np.asarray(contracted, dtype=np.float64), (n,)).copy()
+        self.extended = np.broadcast_to(np.asarray(extended, dtype=np.float64), (n,)).copy()
+
+    def reset(self, joints: Sequence[str] = None):
+        """Resets all joints, or only the named ones"""
+        n = len(self.joint_names)
+        if joints is None:
+            self.stage = np.full(n, DOWN, dtype=np.int8)
+            self.pending = np.full(n, NO_STAGE, dtype=np.int8)
+            self.pending_start = np.zeros(n)
+            self.rep_start = np.zeros(n)
+            self.ready = np.zeros(n, dtype=bool)
+            self.rep_min = np.full(n, 180.0)
+            self.rep_max = np.zeros(n)
+            self.last_seen = np.full(n, -np.inf)
+            self.rep_count = np.zeros(n, dtype=np.int32)
+            self.rep_time = np.zeros(n)
+            self.accuracy = np.full(n, 100, dtype=np.int32)
+            self.velocity = np.zeros(n)
+            # Timestamped angle ring buffer for the velocity fit
+            self.hist_t = np.full((n, VELOCITY_HISTORY_SIZE), -np.inf)
+            self.hist_a = np.zeros((n, VELOCITY_HISTORY_SIZE))
+            self.hist_pos = np.zeros(n, dtype=np.int64)
+            return
+
+        idx = [self.index[j] for j in joints]
+        self.pending[idx] = NO_STAGE
+        self.rep_start[idx] = 0
+        self.ready[idx] = False
+        self.last_seen[idx] = -np.inf
+        self.velocity[idx] = 0
+        self.hist_t[idx] = -np.inf
+
+    def target_stage(self, angles: np.ndarray) -> np.ndarray:
+        """Determines target stages with the dynamic ROM buffer and hysteresis"""
+        # Dynamic buffer: 15% of ROM, clamped between 5 and 15 degrees
+        rom = np.abs(self.extended - self.contracted)
+        buffer = np.clip((rom * 0.15).astype(np.int64), 5, 15)
+        up_limit = self.contracted + buffer
+        down_limit = self.extended - buffer
+
+        stage = self.stage
+        return np.select(
+            [angles <= up_limit,
+             angles >= down_limit,
+             stage == UP,
+             stage == DOWN],
+            [UP,
+             DOWN,
+             np.where(angles < up_limit + 5, UP, MOVING_DOWN),
+             np.where(angles > down_limit - 5, DOWN, MOVING_UP)],
+            # MOVING_* stay put until a limit is crossed
+            default=stage
+        ).astype(np.int8)
+
+    def _record_samples(self, valid: np.ndarray, angles: np.ndarray, current_time: float):
+        rows = np.flatnonzero(valid)
+        cols = self.hist_pos[rows] % VELOCITY_HISTORY_SIZE
+        self.hist_t[rows, cols] = current_time
+        self.hist_a[rows, cols] = angles[rows]
+        self.hist_pos[rows] += 1
+
+    def fit_velocity(self, current_time: float):
+        """
+        Least-squares angular velocity (deg/s) per joint over VELOCITY_WINDOW,
+        plus its t-statistic (slope / standard error). Joints without enough
+        samples get a t-statistic of 0.
+        """
+        m = self.hist_t > current_time - VELOCITY_WINDOW
+        n = m.sum(axis=1)
+        t = np.where(m, self.hist_t - current_time, 0.0)
+        a = np.where(m, self.hist_a, 0.0)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t_mean = t.sum(axis=1) / n
+            a_mean = a.sum(axis=1) / n
+            dt = np.where(m, t - t_mean[:, None], 0.0)
+            da = np.where(m, a - a_mean[:, None], 0.0)
+            s_tt = (dt * dt).sum(axis=1)
+            slope = (dt * da).sum(axis=1) / s_tt
+
+            resid = np.where(m, da - slope[:, None] * dt, 0.0)
+            s2 = (resid * resid).sum(axis=1) / (n - 2)
+            t_stat = slope / np.sqrt(s2 / s_tt)
+
+        enough = (n >= max(3, VELOCITY_MIN_SAMPLES)) & (s_tt > 0)
+        slope = np.where(enough, slope, 0.0)
+        # A perfect line (zero residual) is maximally certain
+        t_stat = np.where(enough, np.nan_to_num(t_stat, nan=0.0, posinf=np.inf, neginf=-np.inf), 0.0)
+        return slope, t_stat
+
+    def rep_accuracy(self) -> np.ndarray:
+        """0-100% accuracy of the current rep relative to the calibrated ROM"""
+        cal_range = np.abs(self.extended - self.contracted)
+        user_range = np.abs(self.rep_max - self.rep_min)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            acc = np.where(cal_range == 0, 100, (user_range / cal_range) * 100)
+        return np.minimum(100, acc.astype(np.int64))
+
+    def step(self, angles: np.ndarray, current_time: float) -> StepResult:
+        """Advances every joint by one frame. Missing angles are NaN."""
+        angles = np.asarray(angles, dtype=np.float64)
+        valid = ~np.isnan(angles)
+        a = np.where(valid, angles, 0.0)
+
+        # Track peaks during the current rep for accuracy calculation
+        self.rep_min = np.where(valid, np.minimum(self.rep_min, a), self.rep_min)
+        self.rep_max = np.where(valid, np.maximum(self.rep_max, a), self.rep_max)
+
+        # Need a previous sample inside the history window before judging state
+        active = valid & ((current_time - self.last_seen) < self.history_window)
+        self.last_seen = np.where(valid, current_time, self.last_seen)
+
+        prev_stage = self.stage.copy()
+        target = self.target_stage(a)
+
+        # --- STATE SWITCHING WITH CONFIRMATION ---
+        change = active & (target != prev_stage)
+        same_pending = change & (self.pending == target)
+        # (tolerance: a hold of exactly state_hold_time, e.g. 3 frames at 30 fps, must not lose to rounding)
+        confirmed = same_pending & ((current_time - self.pending_start) >= self.state_hold_time - 1e-9)
+        # When the joint entered the target zone: rep timing uses this, not the (mode-dependent) confirmation
+        entered = np.where(same_pending, self.pending_start, current_time)
+
+        if self.predictive:
+            self._record_samples(valid, a, current_time)
+            self.velocity, t_stat = self.fit_velocity(current_time)
+            # Only a rep that would count, leaving UP with the angle surely rising
+            completes = ((prev_stage == UP) & (target == MOVING_DOWN) & self.ready &
+                         (entered - self.rep_start >= self.min_rep_duration))
+            confirmed |= change & completes & (t_stat >= VELOCITY_CONFIDENCE)
+            same_pending |= confirmed
+
+        new_pending = change & ~same_pending
+        self.pending = np.where(new_pending, target, self.pending).astype(np.int8)
+        self.pending_start = np.where(new_pending, current_time, self.pending_start)
+        self.pending = np.where(active & ~change, NO_STAGE, self.pending).astype(np.int8)
+
+        self.stage = np.where(confirmed, target, self.stage).astype(np.int8)
+
+        # Ready at bottom: reaching DOWN arms the next rep and resets its peaks
+        to_down = confirmed & (target == DOWN)
+        self.ready |= to_down
+        self.rep_start = np.where(to_down, entered, self.rep_start)
+
+        # Rep completion: UP -> MOVING_DOWN from a valid start with a controlled duration
+        duration = entered - self.rep_start
+        counted = (confirmed & (prev_stage == UP) & (target == MOVING_DOWN) &
+                   self.ready & (duration >= self.min_rep_duration))
+        if counted.any():
+            self.rep_count += counted
+            self.rep_time = np.where(counted, duration, self.rep_time)
+            self.accuracy = np.where(counted, self.rep_accuracy(), self.accuracy)
+            # Consume the flag: must return to DOWN to earn the next rep
+            self.ready &= ~counted
+
+        self.rep_min = np.where(to_down, 180.0, self.rep_min)
+        self.rep_max = np.where(to_down, 0.0, self.rep_max)
+
+        return StepResult(active, confirmed, prev_stage, counted)
@@ -0,0 +1,79 @@
+"""
+Rep-level event log - one document per counted rep in the `rep_events` collection
+Written in batches through the write-behind queue; read with indexed, paginated queries
+such as "all reps of patient X on exercise Y with accuracy < 70".
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+PAGE_SIZE = 200   # default events per page
+PAGE_MAX = 1000   # hard cap whatever the client asks for
+
+
+def build_query(email: Optional[str] = None, session_id=None, exercise: Optional[str] = None,
+                side: Optional[str] = None, min_accuracy: Optional[int] = None,
+                max_accuracy: Optional[int] = None, warning: Optional[str] = None,
+                date_from: Optional[str] = None, date_to: Optional[str] = None) -> dict:
+    """Filter on the indexed fields; accuracy bounds are exclusive above (max) and inclusive below (min)"""
+    query = {}
+    if email:
+        query['email'] = email
+    if session_id is not None:
+        query['session_id'] = session_id
+    if exercise:
+        query['exercise'] = exercise
+    if side:
+        query['side'] = side.upper()
+    if warning:
+        query['warnings'] = warning
+
+    accuracy = {}
+    if min_accuracy is not None:
+        accuracy['$gte'] = min_accuracy
+    if max_accuracy is not None:
+        accuracy['$lt'] = max_accuracy
+    if accuracy:
+        query['accuracy'] = accuracy
+
+    if date_from or date_to:
+        ts = {}
+        if date_from:
+            ts['$gte'] = datetime.strptime(date_from, "%Y-%m-%d").timestamp()
+        if date_to:
+            ts['$lt'] = (datetime.strptime(date_to, "%Y-%m-%d") + timedelta(days=1)).timestamp()
+        query['timestamp'] = ts
+    return query
+
+
+def find_page(collection, query: dict, before: Optional[float] = None, limit: int = PAGE_SIZE):
+    """
+    Newest-first page of events. `before` is the timestamp cursor of the previous page;
+    returns (events, next_cursor or None).
+    """
+    limit = max(1, min(limit, PAGE_MAX))
+    if before is not None:
+        query = {**query, 'timestamp': {**query.get('timestamp', {}), '$lt': before}}
+    events = list(collection.find(query, {'_id': 0}).sort('timestamp', -1).limit(limit + 1))
+
+    next_cursor = None
+    if len(events) > limit:
+        # Both sides can finish a rep on the same frame: never split equal timestamps across pages
+        cut = events[limit]['timestamp']
+        events = [e for e in events[:limit] if e['timestamp'] != cut] or events[:limit]
+        next_cursor = events[-1]['timestamp']
+    return [to_response(e) for e in events], next_cursor
+
+
+def to_response(event: dict) -> dict:
+    return {**event, 'session_id': str(event['session_id']) if event.get('session_id') is not None else None}
+
+
+def summarize(events: List[dict]) -> dict:
+    """Counts / mean accuracy of one page (the client usually charts the rows themselves)"""
+    if not events:
+        return {'count': 0, 'avg_accuracy': 0, 'avg_duration': 0}
+    return {
+        'count': len(events),
+        'avg_accuracy': round(sum(e['accuracy'] for e in events) / len(events), 1),
+        'avg_duration': round(sum(e['duration'] for e in events) / len(events), 2),
+    }
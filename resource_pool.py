@@ -0,0 +1,140 @@
+"""
+Resource pool - keeps MediaPipe graphs and camera handles WARM across sessions
+"""
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import mediapipe as mp
+
+
+class ResourcePool:
+    """
+    Hands pre-initialized Holistic models and already-open cameras to new sessions.
+
+    Building a Holistic graph and opening a capture device each take seconds, so
+    instead of tearing them down in WorkoutSession.stop() they are returned here
+    and reset for the next session.
+    """
+
+    def __init__(self, max_idle_models: int = 1, frame_width: int = 640,
+                 frame_height: int = 480, fps: int = 30, max_camera_probe: int = 2):
+        self.max_idle_models = max_idle_models
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.fps = fps
+        self.max_camera_probe = max_camera_probe
+
+        self._lock = threading.Lock()
+        # Idle graphs keyed by their confidence settings (graphs are not reconfigurable)
+        self._idle_models: Dict[Tuple[float, float], List] = {}
+        # At most one idle capture per device index
+        self._idle_cameras: Dict[int, cv2.VideoCapture] = {}
+        self._camera_index: Optional[int] = None
+
+    # --- CAMERAS ---
+    def get_camera_index(self) -> int:
+        """Detects the available camera index once and caches it."""
+        if self._camera_index is None:
+            self._camera_index = 0
+            for i in range(self.max_camera_probe):
+                cap = cv2.VideoCapture(i)
+                if cap.isOpened():
+                    self._camera_index = i
+                    # Keep the probed device open instead of reopening it later
+                    self._configure_camera(cap)
+                    self._idle_cameras[i] = cap
+                    break
+                cap.release()
+        return self._camera_index
+
+    def acquire_camera(self) -> cv2.VideoCapture:
+        """Returns an open capture device, reusing the warm one if available."""
+        with self._lock:
+            idx = self.get_camera_index()
+            cap = self._idle_cameras.pop(idx, None)
+
+        if cap is not None and cap.isOpened():
+            # Drop frames buffered while the camera sat idle
+            for _ in range(2):
+                cap.grab()
+            return cap
+
+        cap = cv2.VideoCapture(idx)
+        self._configure_camera(cap)
+        return cap
+
+    def release_camera(self, cap: Optional[cv2.VideoCapture]):
+        """Keeps a healthy capture device warm for the next session."""
+        if cap is None:
+            return
+        if not cap.isOpened():
+            cap.release()
+            return
+
+        with self._lock:
+            idx = self.get_camera_index()
+            if idx not in self._idle_cameras:
+                self._idle_cameras[idx] = cap
+                return
+        cap.release()
+
+    def _configure_camera(self, cap: cv2.VideoCapture):
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.frame_width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.frame_height)
+        cap.set(cv2.CAP_PROP_FPS, self.fps)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+    # --- POSE MODELS ---
+    def acquire_model(self, min_detection_conf: float = 0.5, min_tracking_conf: float = 0.5):
+        """Returns a Holistic graph with its tracking state reset."""
+        key = (min_detection_conf, min_tracking_conf)
+        with self._lock:
+            idle = self._idle_models.get(key)
+            model = idle.pop() if idle else None
+
+        if model is not None:
+            # Forget landmarks tracked during the previous session
+            model.reset()
+            return model
+
+        return mp.solutions.holistic.Holistic(
+            min_detection_confidence=min_detection_conf,
+            min_tracking_confidence=min_tracking_conf,
+            model_complexity=0,
+            smooth_landmarks=True
+        )
+
+    def release_model(self, model, min_detection_conf: float = 0.5, min_tracking_conf: float = 0.5):
+        """Returns a graph to the pool, closing it if the pool is already full."""
+        if model is None:
+            return
+        key = (min_detection_conf, min_tracking_conf)
+        with self._lock:
+            idle = self._idle_models.setdefault(key, [])
+            if len(idle) < self.max_idle_models:
+                idle.append(model)
+                return
+        model.close()
+
+    # --- LIFECYCLE ---
+    def warm_up(self, min_detection_conf: float = 0.5, min_tracking_conf: float = 0.5):
+        """Pre-builds one graph and opens the camera so the first session starts instantly."""
+        try:
+            self.release_model(self.acquire_model(min_detection_conf, min_tracking_conf),
+                               min_detection_conf, min_tracking_conf)
+            self.release_camera(self.acquire_camera())
+            print("🔥 Resource pool warmed up (pose model + camera ready)")
+        except Exception as e:
+            print(f"⚠️ Resource pool warm-up failed: {e}")
+
+    def shutdown(self):
+        """Releases every idle resource held by the pool."""
+        with self._lock:
+            for models in self._idle_models.values():
+                for model in models:
+                    model.close()
+            self._idle_models.clear()
+            for cap in self._idle_cameras.values():
+                cap.release()
+            self._idle_cameras.clear()
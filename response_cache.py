@@ -0,0 +1,110 @@
+"""
+Versioned response cache - per-user LRU + TTL for analytics / prediction payloads
+
+Entries are keyed by (namespace, user, data version, params). Saving a session bumps
+the user's version, so a cached payload from before the session is never served again.
+The store is pluggable: MemoryStore (in-process) by default, RedisStore when several
+server processes must share versions.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+
+class CachedResponse(NamedTuple):
+    body: bytes   # serialized JSON
+    etag: str     # opaque tag for If-None-Match
+
+
+class MemoryStore:
+    """Thread-safe LRU with per-entry expiry; version counters are never evicted"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl: Optional[float] = None):
+        with self._lock:
+            self._data[key] = (value, None if ttl is None else time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def get_counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+
+class RedisStore:
+    """Shared store for multi-process deployments (needs the `redis` package)"""
+
+    def __init__(self, url: str):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, key: str):
+        value = self._redis.get(key)
+        if value is None:
+            return None
+        body, _, etag = value.rpartition(b"\n")
+        return CachedResponse(body, etag.decode())
+
+    def set(self, key: str, value: CachedResponse, ttl: Optional[float] = None):
+        self._redis.set(key, value.body + b"\n" + value.etag.encode(),
+                        ex=None if ttl is None else max(1, int(ttl)))
+
+    def get_counter(self, key: str) -> int:
+        return int(self._redis.get(key) or 0)
+
+    def incr(self, key: str) -> int:
+        return int(self._redis.incr(key))
+
+
+class ResponseCache:
+    """
+    Usage: key = cache.key(ns, user, params); entry = cache.get(key) or cache.put(key, body).
+    The key pins the version read *before* computing, so a payload computed while a
+    session was being saved lands under the old version and is never served.
+    """
+
+    def __init__(self, store=None, ttl: float = 300):
+        self.store = store or MemoryStore()
+        self.ttl = ttl
+
+    def version(self, user: str) -> int:
+        return self.store.get_counter(f"v:{user}")
+
+    def bump(self, user: str) -> int:
+        """Invalidates every cached payload of the user (call after saving a session)"""
+        return self.store.incr(f"v:{user}")
+
+    def key(self, namespace: str, user: str, params=()) -> str:
+        return f"r:{namespace}:{user}:{self.version(user)}:{params!r}"
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        return self.store.get(key)
+
+    def put(self, key: str, body: bytes) -> CachedResponse:
+        entry = CachedResponse(body, hashlib.sha1(body).hexdigest()[:20])
+        self.store.set(key, entry, self.ttl)
+        return entry
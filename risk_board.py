@@ -0,0 +1,163 @@
+"""
+Therapist risk board - materialized per-patient status, refreshed in the background
+The dashboard reads this table (one indexed, paginated query) instead of recomputing
+every patient's status from their sessions on each load.
+"""
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from pymongo import UpdateOne
+
+RECENT_ACTIVITY_WINDOW = 86400   # seconds: 'Session Completed' flag (24 h)
+TREND_SESSIONS = 5               # sessions in the accuracy trend
+STATUS_RANK = {"High Risk": 0, "Alert": 1, "Normal": 2}
+
+
+def session_accuracy(session: dict) -> int:
+    """Risk accuracy of one session: every error costs 20% of a rep"""
+    reps = session.get("total_reps", 0)
+    errors = session.get("total_errors", 0)
+    return max(0, 100 - int((errors / max(reps, 1)) * 20)) if reps > 0 else 0
+
+
+def build_entry(patient: dict, sessions: List[dict], now: float) -> dict:
+    """Board row for one patient from their latest sessions (newest first)"""
+    status = "Normal"
+    last_session_ts = None
+    recent_activity_type = None
+    trend = [session_accuracy(s) for s in reversed(sessions)]
+
+    if sessions:
+        last_session_ts = sessions[0].get("timestamp")
+        accuracy = trend[-1]
+        if accuracy < 60: status = "High Risk"
+        elif accuracy < 80: status = "Alert"
+
+        if last_session_ts and last_session_ts > now - RECENT_ACTIVITY_WINDOW:
+            recent_activity_type = "Session Completed"
+
+    direction = "stable"
+    if len(trend) >= 2:
+        baseline = sum(trend[:-1]) / (len(trend) - 1)
+        if trend[-1] > baseline + 5: direction = "improving"
+        elif trend[-1] < baseline - 5: direction = "declining"
+
+    return {
+        "email": patient["email"],
+        "name": patient.get("name", "Unknown"),
+        "date_joined": datetime.fromtimestamp(patient.get("created_at", now)).strftime("%Y-%m-%d"),
+        "status": status,
+        "status_rank": STATUS_RANK[status],
+        "last_session_ts": last_session_ts,
+        "recent_activity": recent_activity_type,
+        "accuracy_trend": trend,
+        "trend": direction,
+        "refreshed_at": now,
+    }
+
+
+def to_response(entry: dict) -> dict:
+    """Board row in the shape the dashboard expects"""
+    return {
+        "id": str(entry["email"]),
+        "name": entry["name"],
+        "email": entry["email"],
+        "date_joined": entry["date_joined"],
+        "status": entry["status"],
+        "last_session_ts": entry["last_session_ts"],
+        "recent_activity": entry["recent_activity"],
+        "accuracy_trend": entry.get("accuracy_trend", []),
+        "trend": entry.get("trend", "stable"),
+        "hasActiveProtocol": False # Placeholder
+    }
+
+
+class RiskBoard:
+    """
+    Keeps the `risk_board` collection current: one patient on session insert,
+    everyone on a schedule (so 24 h activity flags expire and new patients appear).
+    """
+
+    def __init__(self, users, sessions, board, refresh_interval: float = 300):
+        self.users = users
+        self.sessions = sessions
+        self.board = board
+        self.refresh_interval = refresh_interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _latest_sessions_stage(self):
+        return {"$lookup": {
+            "from": self.sessions.name,
+            "localField": "email",
+            "foreignField": "email",
+            "pipeline": [
+                {"$sort": {"timestamp": -1}},
+                {"$limit": TREND_SESSIONS},
+                {"$project": {"_id": 0, "timestamp": 1, "total_reps": 1, "total_errors": 1}},
+            ],
+            "as": "sessions",
+        }}
+
+    def refresh_all(self) -> int:
+        """Rebuilds every row in one aggregation + one bulk write; returns the patient count"""
+        started = time.time()
+        patients = self.users.aggregate([
+            {"$match": {"role": "patient"}},
+            {"$project": {"_id": 0, "name": 1, "email": 1, "created_at": 1}},
+            self._latest_sessions_stage(),
+        ])
+        ops = [
+            UpdateOne({"email": p["email"]}, {"$set": build_entry(p, p["sessions"], started)}, upsert=True)
+            for p in patients
+        ]
+        if ops:
+            self.board.bulk_write(ops, ordered=False)
+        # Rows not touched by this refresh belong to removed patients
+        self.board.delete_many({"refreshed_at": {"$lt": started}})
+        return len(ops)
+
+    def refresh_patient(self, email: str):
+        """Recomputes one patient's row (after a session insert or signup)"""
+        patient = self.users.find_one({"email": email, "role": "patient"},
+                                      {"_id": 0, "name": 1, "email": 1, "created_at": 1})
+        if not patient:
+            return
+        sessions = list(self.sessions.find(
+            {"email": email}, {"_id": 0, "timestamp": 1, "total_reps": 1, "total_errors": 1}
+        ).sort("timestamp", -1).limit(TREND_SESSIONS))
+        self.board.update_one({"email": email}, {"$set": build_entry(patient, sessions, time.time())}, upsert=True)
+
+    def page(self, status: Optional[str] = None, cursor: Optional[str] = None, limit: int = 100):
+        """
+        One page of the board ordered by email. `cursor` is the last email of the
+        previous page; returns (rows, next_cursor or None).
+        """
+        query = {}
+        if status:
+            query["status"] = status
+        if cursor:
+            query["email"] = {"$gt": cursor}
+        rows = list(self.board.find(query, {"_id": 0}).sort("email", 1).limit(limit + 1))
+        next_cursor = rows[limit - 1]["email"] if len(rows) > limit else None
+        return [to_response(r) for r in rows[:limit]], next_cursor
+
+    # --- BACKGROUND REFRESH ---
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                count = self.refresh_all()
+                print(f"📋 Risk board refreshed ({count} patients)")
+            except Exception as e:
+                print(f"⚠️ Risk board refresh error: {e}")
+            self._stop.wait(self.refresh_interval)
@@ -0,0 +1,124 @@
+"""
+Session time-series persistence - delta-encoded, zlib-compressed binary chunks
+One document per SERIES_CHUNK_SECONDS of a block in the `session_series` collection,
+so any time range can be read back without loading the whole session.
+"""
+import zlib
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from constants import SERIES_CHUNK_SECONDS
+
+CODEC = "delta-zlib-v1"
+SIDE_NAMES = ['RIGHT', 'LEFT']
+
+
+def _pack(values: np.ndarray, dtype) -> bytes:
+    """First value absolute, then successive differences, compressed"""
+    deltas = np.diff(values.astype(np.int64), prepend=0).astype(dtype)
+    return zlib.compress(deltas.tobytes(), 6)
+
+
+def _unpack(blob: bytes, dtype) -> np.ndarray:
+    return np.cumsum(np.frombuffer(zlib.decompress(blob), dtype=dtype), dtype=np.int64)
+
+
+def encode_block(history, block: int, exercise: str, chunk_seconds: float = SERIES_CHUNK_SECONDS) -> List[dict]:
+    """Splits one block's SessionHistory into chunk documents (session_id added by the caller)"""
+    t_ms = np.round(history.time.astype(np.float64) * 1000).astype(np.int64)
+    right = history.right_angle
+    left = history.left_angle
+
+    events = np.array(history.rep_events, dtype=np.float64).reshape(-1, 3)
+    ev_ms = np.round(events[:, 0] * 1000).astype(np.int64)
+
+    last_ms = max(t_ms[-1] if len(t_ms) else 0, ev_ms[-1] if len(ev_ms) else 0)
+    chunk_ms = int(chunk_seconds * 1000)
+    edges = np.arange(0, last_ms + chunk_ms + 1, chunk_ms)
+    sample_cuts = np.searchsorted(t_ms, edges)
+    event_cuts = np.searchsorted(ev_ms, edges)
+
+    docs = []
+    for seq in range(len(edges) - 1):
+        s0, s1 = sample_cuts[seq], sample_cuts[seq + 1]
+        e0, e1 = event_cuts[seq], event_cuts[seq + 1]
+        if s0 == s1 and e0 == e1:
+            continue
+        docs.append({
+            'block': block,
+            'exercise': exercise,
+            'seq': seq,
+            't_start': edges[seq] / 1000,
+            't_end': edges[seq + 1] / 1000,
+            'n': int(s1 - s0),
+            'codec': CODEC,
+            'time': _pack(t_ms[s0:s1], np.int32),
+            'right_angle': _pack(right[s0:s1], np.int16),
+            'left_angle': _pack(left[s0:s1], np.int16),
+            'rep_time': _pack(ev_ms[e0:e1], np.int32),
+            'rep_side': zlib.compress(events[e0:e1, 1].astype(np.uint8).tobytes()),
+            'rep_accuracy': zlib.compress(events[e0:e1, 2].astype(np.uint8).tobytes()),
+        })
+    return docs
+
+
+def encode_series(session_id, blocks: List[Tuple[str, object]]) -> List[dict]:
+    """Chunk documents for every (exercise, history) block of a session"""
+    docs = []
+    for block, (exercise, history) in enumerate(blocks):
+        docs += [{'session_id': session_id, **doc} for doc in encode_block(history, block, exercise)]
+    return docs
+
+
+def save_series(collection, session_id, blocks: List[Tuple[str, object]]) -> int:
+    """Persists every (exercise, history) block of a session; returns the number of chunks"""
+    docs = encode_series(session_id, blocks)
+    if docs:
+        collection.insert_many(docs, ordered=False)
+    return len(docs)
+
+
+def read_series(collection, session_id, t_from: Optional[float] = None, t_to: Optional[float] = None,
+                block: Optional[int] = None) -> List[dict]:
+    """Decodes the stored series in [t_from, t_to] seconds (per block, times restart at 0)"""
+    query = {'session_id': session_id}
+    if block is not None:
+        query['block'] = block
+    if t_from is not None:
+        query['t_end'] = {'$gt': t_from}
+    if t_to is not None:
+        query['t_start'] = {'$lte': t_to}
+
+    lo = -np.inf if t_from is None else t_from
+    hi = np.inf if t_to is None else t_to
+
+    blocks = {}
+    for doc in collection.find(query, {'_id': 0, 'session_id': 0}).sort([('block', 1), ('seq', 1)]):
+        entry = blocks.setdefault(doc['block'], {'exercise': doc['exercise'], 'chunks': []})
+        entry['chunks'].append(doc)
+
+    result = []
+    for block_index, entry in blocks.items():
+        chunks = entry['chunks']
+        t = np.concatenate([_unpack(c['time'], np.int32) for c in chunks]) / 1000
+        right = np.concatenate([_unpack(c['right_angle'], np.int16) for c in chunks])
+        left = np.concatenate([_unpack(c['left_angle'], np.int16) for c in chunks])
+        ev_t = np.concatenate([_unpack(c['rep_time'], np.int32) for c in chunks]) / 1000
+        ev_side = np.concatenate([np.frombuffer(zlib.decompress(c['rep_side']), dtype=np.uint8) for c in chunks])
+        ev_acc = np.concatenate([np.frombuffer(zlib.decompress(c['rep_accuracy']), dtype=np.uint8) for c in chunks])
+
+        keep = (t >= lo) & (t <= hi)
+        keep_ev = (ev_t >= lo) & (ev_t <= hi)
+        result.append({
+            'block': block_index,
+            'exercise': entry['exercise'],
+            'time': np.round(t[keep], 3).tolist(),
+            'right_angle': right[keep].tolist(),
+            'left_angle': left[keep].tolist(),
+            'rep_events': [
+                {'time': round(float(et), 3), 'side': SIDE_NAMES[int(es)], 'accuracy': int(ea)}
+                for et, es, ea in zip(ev_t[keep_ev], ev_side[keep_ev], ev_acc[keep_ev])
+            ]
+        })
+    return result
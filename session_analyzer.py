@@ -0,0 +1,162 @@
+"""
+Post-session rep analysis - vectorized segmentation of the full angle trace
+Per-rep ROM, tempo (concentric/eccentric), peak velocity and left/right symmetry
+"""
+from typing import Dict
+
+import numpy as np
+
+from constants import DEFAULT_CONTRACTED_THRESHOLD, DEFAULT_EXTENDED_THRESHOLD, MIN_REP_DURATION
+
+SIDES = ['RIGHT', 'LEFT']
+
+
+def _zone_limits(contracted: float, extended: float):
+    """Same dynamic buffer as live counting: 15% of ROM, clamped to 5-15 degrees"""
+    rom = abs(extended - contracted)
+    buffer = max(5, min(15, int(rom * 0.15)))
+    return contracted + buffer, extended - buffer
+
+
+def segment_reps(times: np.ndarray, angles: np.ndarray, contracted: float, extended: float,
+                 min_rep_duration: float = MIN_REP_DURATION) -> Dict[str, np.ndarray]:
+    """
+    Finds every extended -> contracted -> extended cycle in one pass.
+    Cycles faster than min_rep_duration are dropped, timed like the live counter
+    (entering the extended zone -> leaving the contracted zone).
+    Returns per-rep arrays (start/bottom/end times, min/max angle, peak velocity).
+    """
+    empty = {k: np.empty(0) for k in ('start', 'bottom', 'end', 'min_angle', 'max_angle', 'peak_velocity')}
+
+    # 0 = joint not visible; also drop repeated timestamps so velocities stay finite
+    valid = angles > 0
+    t, a = times[valid].astype(np.float64), angles[valid].astype(np.float64)
+    if len(t) > 1:
+        keep = np.diff(t, prepend=-np.inf) > 0
+        t, a = t[keep], a[keep]
+    n = len(a)
+    if n < 3:
+        return empty
+
+    up_limit, down_limit = _zone_limits(contracted, extended)
+
+    # +1 extended zone, -1 contracted zone, 0 in between; carry the last zone forward
+    zone = np.where(a >= down_limit, 1, np.where(a <= up_limit, -1, 0))
+    pos = np.arange(n)
+    last_zone_idx = np.maximum.accumulate(np.where(zone != 0, pos, 0))
+    state = np.where(np.maximum.accumulate(zone != 0), zone[last_zone_idx], 0)
+
+    change = np.flatnonzero(np.diff(state) != 0) + 1
+    new_state, old_state = state[change], state[change - 1]
+    starts = change[(new_state == -1) & (old_state == 1)]   # first contracted sample of a rep
+    ends = change[(new_state == 1) & (old_state == -1)]     # first extended sample after it
+
+    # Pair each descent with the next return to extension
+    ends = ends[np.searchsorted(ends, starts[0]):] if len(starts) else ends[:0]
+    k = min(len(starts), len(ends))
+    if k == 0:
+        return empty
+    starts, ends = starts[:k], ends[:k]
+
+    # Live duration rule: extended-zone entry before the descent -> first sample 5 degrees
+    # clear of the contracted zone after it (the live counter's MOVING_DOWN margin)
+    entered_extended = np.flatnonzero((state == 1) & (np.concatenate([[0], state[:-1]]) != 1))
+    entry = entered_extended[np.searchsorted(entered_extended, starts) - 1]
+    last_contracted = np.maximum.accumulate(np.where(zone == -1, pos, 0))
+    next_clear = np.minimum.accumulate(np.where(a > up_limit + 5, pos, n)[::-1])[::-1]
+    leave = next_clear[last_contracted[ends - 1] + 1]
+    keep = t[leave] - t[entry] >= min_rep_duration
+    starts, ends = starts[keep], ends[keep]
+    if not len(starts):
+        return empty
+
+    # A rep begins at the last extended sample before the descent
+    last_extended = np.maximum.accumulate(np.where(zone == 1, pos, 0))
+    rep_start = last_extended[starts - 1]
+
+    # Segment reductions over [rep_start, end) for every rep at once
+    bounds = np.column_stack([rep_start, ends]).ravel()
+    velocity = np.abs(np.gradient(a, t))
+    seg_min = np.minimum.reduceat(a, bounds)[::2]
+    seg_max = np.maximum(np.maximum.reduceat(a, bounds)[::2], a[ends])
+    peak_velocity = np.maximum.reduceat(velocity, bounds)[::2]
+
+    # Bottom of each rep: first sample that reaches the segment minimum
+    seg_id = np.full(n, -1)
+    marks = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(marks, rep_start, 1)
+    np.add.at(marks, ends, -1)
+    inside = np.cumsum(marks[:n]) > 0
+    seg_id[inside] = np.cumsum(np.isin(pos, rep_start))[inside] - 1
+    order = np.lexsort((a, seg_id))
+    order = order[seg_id[order] >= 0]
+    _, first = np.unique(seg_id[order], return_index=True)
+    bottom = order[first]
+
+    return {
+        'start': t[rep_start],
+        'bottom': t[bottom],
+        'end': t[ends],
+        'min_angle': seg_min,
+        'max_angle': seg_max,
+        'peak_velocity': peak_velocity,
+    }
+
+
+def _symmetry(right: float, left: float) -> int:
+    """100 = identical sides, lower = more asymmetric"""
+    mean = (right + left) / 2
+    if mean == 0:
+        return 100
+    return max(0, int(round(100 - abs(right - left) / mean * 100)))
+
+
+def analyze_session(times, right_angles, left_angles,
+                    contracted: float = DEFAULT_CONTRACTED_THRESHOLD,
+                    extended: float = DEFAULT_EXTENDED_THRESHOLD,
+                    min_rep_duration: float = MIN_REP_DURATION) -> dict:
+    """Per-rep metrics for both sides plus left/right symmetry for the session report"""
+    times = np.asarray(times, dtype=np.float64)
+    series = {'RIGHT': np.asarray(right_angles), 'LEFT': np.asarray(left_angles)}
+
+    analysis = {}
+    means = {}
+    for side in SIDES:
+        seg = segment_reps(times, series[side], contracted, extended, min_rep_duration)
+        rom = seg['max_angle'] - seg['min_angle']
+        concentric = seg['bottom'] - seg['start']
+        eccentric = seg['end'] - seg['bottom']
+
+        means[side] = {
+            'rom': float(rom.mean()) if len(rom) else 0.0,
+            'tempo': float((concentric + eccentric).mean()) if len(rom) else 0.0,
+            'peak_velocity': float(seg['peak_velocity'].mean()) if len(rom) else 0.0,
+        }
+        analysis[side] = {
+            'rep_count': int(len(rom)),
+            'avg_rom': round(means[side]['rom'], 1),
+            'avg_concentric_time': round(float(concentric.mean()), 2) if len(rom) else 0.0,
+            'avg_eccentric_time': round(float(eccentric.mean()), 2) if len(rom) else 0.0,
+            'avg_peak_velocity': round(means[side]['peak_velocity'], 1),
+            'reps': [
+                {
+                    'start': round(float(s), 2),
+                    'rom': int(r),
+                    'min_angle': int(lo),
+                    'max_angle': int(hi),
+                    'concentric_time': round(float(c), 2),
+                    'eccentric_time': round(float(e), 2),
+                    'peak_velocity': round(float(v), 1),
+                }
+                for s, r, lo, hi, c, e, v in zip(seg['start'], rom, seg['min_angle'], seg['max_angle'],
+                                                 concentric, eccentric, seg['peak_velocity'])
+            ]
+        }
+
+    analysis['symmetry'] = {
+        'rom': _symmetry(means['RIGHT']['rom'], means['LEFT']['rom']),
+        'tempo': _symmetry(means['RIGHT']['tempo'], means['LEFT']['tempo']),
+        'peak_velocity': _symmetry(means['RIGHT']['peak_velocity'], means['LEFT']['peak_velocity']),
+        'rep_count': _symmetry(analysis['RIGHT']['rep_count'], analysis['LEFT']['rep_count']),
+    }
+    return analysis
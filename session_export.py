@@ -0,0 +1,72 @@
+"""
+Streaming session export - NDJSON / CSV straight from a MongoDB cursor
+Rows are serialized as the cursor yields them, so memory stays flat for any export size.
+"""
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional
+
+EXPORT_FIELDS = ['session_id', 'email', 'exercise', 'date', 'timestamp',
+                 'total_reps', 'total_errors', 'right_reps', 'left_reps']
+PROJECTION = {field: 1 for field in EXPORT_FIELDS if field != 'session_id'}
+CURSOR_BATCH_SIZE = 1000   # documents per round trip
+ROWS_PER_CHUNK = 500       # rows serialized per yielded chunk
+
+
+def build_query(emails: Optional[List[str]] = None, date_from: Optional[str] = None,
+                date_to: Optional[str] = None):
+    """
+    Filter + index-friendly sort for one patient / a cohort and an optional date range (YYYY-MM-DD).
+    Per-patient rows are newest first: that is the order of the (email, timestamp -1) index, so a
+    multi-email $in is still read in index order instead of sorted in memory.
+    """
+    query = {}
+    if emails is not None:
+        query['email'] = emails[0] if len(emails) == 1 else {'$in': emails}
+    if date_from or date_to:
+        ts = {}
+        if date_from:
+            ts['$gte'] = datetime.strptime(date_from, "%Y-%m-%d").timestamp()
+        if date_to:
+            ts['$lt'] = (datetime.strptime(date_to, "%Y-%m-%d") + timedelta(days=1)).timestamp()
+        query['timestamp'] = ts
+    sort = [('email', 1), ('timestamp', -1)] if emails is not None else [('timestamp', 1)]
+    return query, sort
+
+
+def open_cursor(collection, query, sort):
+    return collection.find(query, PROJECTION).sort(sort).batch_size(CURSOR_BATCH_SIZE)
+
+
+def _row(doc: dict) -> dict:
+    row = {field: doc.get(field) for field in EXPORT_FIELDS}
+    row['session_id'] = str(doc['_id'])
+    return row
+
+
+def iter_ndjson(cursor) -> Iterator[str]:
+    lines = []
+    for doc in cursor:
+        lines.append(json.dumps(_row(doc), default=str))
+        if len(lines) >= ROWS_PER_CHUNK:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def iter_csv(cursor) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    rows = 0
+    for doc in cursor:
+        writer.writerow(_row(doc))
+        rows += 1
+        if rows % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
@@ -0,0 +1,396 @@
+"""
+Storage backends - one repository interface for users, OTPs, sessions, protocols and notifications
+MongoStorage:  the central database (the default)
+SQLiteStorage: embedded store for kiosks; answers every call locally with its own indexes and
+               keeps an outbox of local writes that StorageSync pushes to the central DB
+               (and pulls central users / protocols / notifications back) whenever it is reachable.
+"""
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+from bson import ObjectId, json_util
+
+from db_indexes import OTP_TTL_SECONDS
+from constants import STORAGE_SYNC_INTERVAL, STORAGE_SYNC_BATCH
+
+
+class MongoStorage:
+    """Repository over the pymongo collections (sessions are written by the write-behind queue)"""
+
+    def __init__(self, db):
+        self.users = db["users"]
+        self.otps = db["otps"]
+        self.protocols = db["protocols"]
+        self.notifications = db["notifications"]
+
+    # --- USERS ---
+    def get_user(self, email: str) -> Optional[dict]:
+        return self.users.find_one({"email": email})
+
+    def find_therapist(self, email: Optional[str] = None) -> Optional[dict]:
+        query = {"role": "therapist"}
+        if email:
+            query["email"] = email
+        return self.users.find_one(query)
+
+    def insert_user(self, user: dict):
+        user.setdefault("_id", ObjectId())
+        # Kiosks pull users changed since their watermark; anything that edits a user bumps this
+        user.setdefault("updatedAt", datetime.now(timezone.utc))
+        self.users.insert_one(user)
+
+    def user_emails(self, user_ids: List[ObjectId]) -> List[str]:
+        return [u["email"] for u in self.users.find({"_id": {"$in": user_ids}}, {"_id": 0, "email": 1})]
+
+    # --- OTPS ---
+    def save_otp(self, email: str, otp: str):
+        # BSON date (not epoch float) so the TTL index can expire it
+        self.otps.update_one({"email": email},
+                             {"$set": {"otp": otp, "created_at": datetime.now(timezone.utc)}}, upsert=True)
+
+    def get_otp(self, email: str) -> Optional[str]:
+        record = self.otps.find_one({"email": email})
+        return record.get("otp") if record else None
+
+    def delete_otp(self, email: str):
+        self.otps.delete_one({"email": email})
+
+    # --- PROTOCOLS ---
+    def upsert_protocol(self, protocol: dict):
+        self.protocols.update_one(
+            {"patient": protocol["patient"], "exerciseName": protocol["exerciseName"]},
+            {"$set": protocol},
+            upsert=True,
+        )
+
+    def active_protocols(self, patient_id: ObjectId) -> List[dict]:
+        return list(self.protocols.find({"patient": patient_id, "isActive": True}))
+
+    def therapist_patient_ids(self, therapist_id: ObjectId) -> List[ObjectId]:
+        return self.protocols.distinct("patient", {"therapist": therapist_id})
+
+    # --- NOTIFICATIONS ---
+    def latest_notifications(self, limit: int = 10) -> List[dict]:
+        return list(self.notifications.find({}).sort("timestamp", -1).limit(limit))
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (email TEXT PRIMARY KEY, id TEXT UNIQUE, role TEXT, doc TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS users_role ON users (role);
+CREATE TABLE IF NOT EXISTS otps (email TEXT PRIMARY KEY, otp TEXT, created_at REAL);
+CREATE INDEX IF NOT EXISTS otps_created_at ON otps (created_at);
+CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, email TEXT, timestamp REAL, doc TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS sessions_email_timestamp ON sessions (email, timestamp DESC);
+CREATE TABLE IF NOT EXISTS protocols (patient TEXT, exercise TEXT, therapist TEXT, is_active INTEGER,
+                                      doc TEXT NOT NULL, PRIMARY KEY (patient, exercise));
+CREATE INDEX IF NOT EXISTS protocols_patient_active ON protocols (patient, is_active);
+CREATE INDEX IF NOT EXISTS protocols_therapist ON protocols (therapist);
+CREATE TABLE IF NOT EXISTS notifications (id TEXT PRIMARY KEY, timestamp REAL, doc TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS notifications_timestamp ON notifications (timestamp DESC);
+CREATE TABLE IF NOT EXISTS outbox (seq INTEGER PRIMARY KEY AUTOINCREMENT, collection TEXT, doc TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS sync_state (collection TEXT PRIMARY KEY, watermark TEXT);
+"""
+
+
+def _sort_value(value) -> float:
+    """Numeric sort key for epoch floats and BSON dates alike"""
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=value.tzinfo or timezone.utc).timestamp()
+    return float(value) if isinstance(value, (int, float)) else 0.0
+
+
+class SQLiteStorage:
+    """Embedded repository (one connection per thread, WAL so readers never wait on the writer)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        with self._write_lock:
+            self._conn.executescript(SCHEMA)
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _one(self, sql: str, params=()) -> Optional[dict]:
+        row = self._conn.execute(sql, params).fetchone()
+        return json_util.loads(row[0]) if row else None
+
+    def _all(self, sql: str, params=()) -> List[dict]:
+        return [json_util.loads(row[0]) for row in self._conn.execute(sql, params)]
+
+    def _write(self, statements, outbox: Optional[tuple] = None):
+        """Runs (sql, params) statements in one transaction, optionally queuing (collection, doc) for sync"""
+        with self._write_lock, self._conn as conn:
+            for sql, params in statements:
+                conn.execute(sql, params)
+            if outbox is not None:
+                conn.execute("INSERT INTO outbox (collection, doc) VALUES (?, ?)",
+                             (outbox[0], json_util.dumps(outbox[1])))
+
+    # --- USERS ---
+    def get_user(self, email: str) -> Optional[dict]:
+        return self._one("SELECT doc FROM users WHERE email = ?", (email,))
+
+    def find_therapist(self, email: Optional[str] = None) -> Optional[dict]:
+        if email:
+            return self._one("SELECT doc FROM users WHERE email = ? AND role = 'therapist'", (email,))
+        return self._one("SELECT doc FROM users WHERE role = 'therapist' LIMIT 1")
+
+    def insert_user(self, user: dict, sync: bool = True):
+        user.setdefault("_id", ObjectId())
+        self._write([("INSERT OR REPLACE INTO users (email, id, role, doc) VALUES (?, ?, ?, ?)",
+                      (user["email"], str(user["_id"]), user.get("role", "patient"), json_util.dumps(user)))],
+                    ("users", user) if sync else None)
+
+    def adopt_user(self, user: dict) -> Optional[ObjectId]:
+        """
+        Stores the central copy of a user. If the kiosk knew that email under another _id
+        (signed up offline before the central account was pulled), local protocols and queued
+        outbox entries are rewritten to the central _id. Returns the replaced local _id, if any.
+        """
+        with self._write_lock, self._conn as conn:
+            row = conn.execute("SELECT id FROM users WHERE email = ?", (user["email"],)).fetchone()
+            conn.execute("INSERT OR REPLACE INTO users (email, id, role, doc) VALUES (?, ?, ?, ?)",
+                         (user["email"], str(user["_id"]), user.get("role", "patient"), json_util.dumps(user)))
+            if row is None or row[0] == str(user["_id"]):
+                return None
+            old_id, remap = ObjectId(row[0]), {ObjectId(row[0]): user["_id"]}
+
+            for patient, exercise, doc in conn.execute(
+                    "SELECT patient, exercise, doc FROM protocols WHERE patient = ? OR therapist = ?",
+                    (row[0], row[0])).fetchall():
+                protocol = _replace_ids(json_util.loads(doc), remap)
+                conn.execute("DELETE FROM protocols WHERE patient = ? AND exercise = ?", (patient, exercise))
+                conn.execute("INSERT OR REPLACE INTO protocols (patient, exercise, therapist, is_active, doc) "
+                             "VALUES (?, ?, ?, ?, ?)",
+                             (str(protocol["patient"]), protocol["exerciseName"], str(protocol.get("therapist")),
+                              int(bool(protocol.get("isActive"))), json_util.dumps(protocol)))
+            for seq, doc in conn.execute("SELECT seq, doc FROM outbox WHERE collection != 'users'").fetchall():
+                rewritten = json_util.dumps(_replace_ids(json_util.loads(doc), remap))
+                if rewritten != doc:
+                    conn.execute("UPDATE outbox SET doc = ? WHERE seq = ?", (rewritten, seq))
+        return old_id
+
+    def user_emails(self, user_ids: List[ObjectId]) -> List[str]:
+        ids = [str(i) for i in user_ids]
+        if not ids:
+            return []
+        rows = self._conn.execute(f"SELECT email FROM users WHERE id IN ({','.join('?' * len(ids))})", ids)
+        return [row[0] for row in rows]
+
+    # --- OTPS (local only, expire like the MongoDB TTL index) ---
+    def save_otp(self, email: str, otp: str):
+        now = time.time()
+        self._write([("DELETE FROM otps WHERE created_at < ?", (now - OTP_TTL_SECONDS,)),
+                     ("INSERT OR REPLACE INTO otps (email, otp, created_at) VALUES (?, ?, ?)", (email, otp, now))])
+
+    def get_otp(self, email: str) -> Optional[str]:
+        row = self._conn.execute("SELECT otp FROM otps WHERE email = ? AND created_at >= ?",
+                                 (email, time.time() - OTP_TTL_SECONDS)).fetchone()
+        return row[0] if row else None
+
+    def delete_otp(self, email: str):
+        self._write([("DELETE FROM otps WHERE email = ?", (email,))])
+
+    # --- SESSIONS ---
+    def insert_session(self, session: dict, sync: bool = True):
+        session.setdefault("_id", ObjectId())
+        self._write([("INSERT OR IGNORE INTO sessions (id, email, timestamp, doc) VALUES (?, ?, ?, ?)",
+                      (str(session["_id"]), session["email"], session.get("timestamp", 0),
+                       json_util.dumps(session)))],
+                    ("sessions", session) if sync else None)
+
+    # --- PROTOCOLS ---
+    def upsert_protocol(self, protocol: dict, sync: bool = True):
+        self._write([("INSERT OR REPLACE INTO protocols (patient, exercise, therapist, is_active, doc) "
+                      "VALUES (?, ?, ?, ?, ?)",
+                      (str(protocol["patient"]), protocol["exerciseName"], str(protocol.get("therapist")),
+                       int(bool(protocol.get("isActive"))), json_util.dumps(protocol)))],
+                    ("protocols", protocol) if sync else None)
+
+    def active_protocols(self, patient_id: ObjectId) -> List[dict]:
+        return self._all("SELECT doc FROM protocols WHERE patient = ? AND is_active = 1", (str(patient_id),))
+
+    def therapist_patient_ids(self, therapist_id: ObjectId) -> List[ObjectId]:
+        rows = self._conn.execute("SELECT DISTINCT patient FROM protocols WHERE therapist = ?", (str(therapist_id),))
+        return [ObjectId(row[0]) for row in rows]
+
+    # --- NOTIFICATIONS (read-only here, pulled from the central DB) ---
+    def latest_notifications(self, limit: int = 10) -> List[dict]:
+        return self._all("SELECT doc FROM notifications ORDER BY timestamp DESC LIMIT ?", (limit,))
+
+    def put_notification(self, notification: dict):
+        self._write([("INSERT OR REPLACE INTO notifications (id, timestamp, doc) VALUES (?, ?, ?)",
+                      (str(notification["_id"]), _sort_value(notification.get("timestamp")),
+                       json_util.dumps(notification)))])
+
+    # --- SYNC BOOKKEEPING ---
+    def outbox(self, limit: int) -> List[tuple]:
+        rows = self._conn.execute("SELECT seq, collection, doc FROM outbox ORDER BY seq LIMIT ?", (limit,))
+        return [(seq, collection, json_util.loads(doc)) for seq, collection, doc in rows]
+
+    def ack_outbox(self, last_seq: int):
+        self._write([("DELETE FROM outbox WHERE seq <= ?", (last_seq,))])
+
+    def pending_sync(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def watermark(self, collection: str):
+        row = self._conn.execute("SELECT watermark FROM sync_state WHERE collection = ?", (collection,)).fetchone()
+        return json_util.loads(row[0])["v"] if row else None
+
+    def set_watermark(self, collection: str, value):
+        self._write([("INSERT OR REPLACE INTO sync_state (collection, watermark) VALUES (?, ?)",
+                      (collection, json_util.dumps({"v": value})))])
+
+
+def _without_id(doc: dict) -> dict:
+    return {k: v for k, v in doc.items() if k != "_id"}
+
+
+def _replace_ids(doc: dict, remap: dict) -> dict:
+    """Top-level ObjectId references (patient, therapist, ...) swapped per remap"""
+    return {k: remap.get(v, v) if isinstance(v, ObjectId) else v for k, v in doc.items()}
+
+
+class StorageSync:
+    """
+    Background sync between a SQLiteStorage and the central MongoDB.
+    Push: outbox entries in order (idempotent upserts, safe to repeat after a crash).
+    Pull: central users / protocols / notifications changed since the last watermark.
+    A user signed up offline whose email already exists centrally is replaced by the central
+    account (central _id and password); protocols assigned on the kiosk follow the central _id.
+    on_pushed(collection, docs) runs for documents newly created centrally (e.g. session hooks).
+    get_central() returns the central Database; it is only called from the sync thread.
+    """
+
+    # collection -> (watermark field, local writer that does not queue the doc for push)
+    PULLED = {
+        "users": ("updatedAt", lambda local, doc: local.adopt_user(doc)),
+        "protocols": ("updatedAt", lambda local, doc: local.upsert_protocol(doc, sync=False)),
+        "notifications": ("timestamp", lambda local, doc: local.put_notification(doc)),
+    }
+
+    def __init__(self, local: SQLiteStorage, get_central: Callable, available: Callable[[], bool] = lambda: True,
+                 on_pushed: Optional[Callable[[str, List[dict]], None]] = None,
+                 interval: float = STORAGE_SYNC_INTERVAL, batch_size: int = STORAGE_SYNC_BATCH):
+        self.local = local
+        self.get_central = get_central
+        self.available = available
+        self.on_pushed = on_pushed
+        self.interval = interval
+        self.batch_size = batch_size
+        self.last_sync: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def push(self) -> int:
+        from pymongo import UpdateOne
+
+        pushed = 0
+        while True:
+            entries = self.local.outbox(self.batch_size)
+            if not entries:
+                return pushed
+            by_collection = {}
+            for _, collection, doc in entries:
+                by_collection.setdefault(collection, []).append(doc)
+            # Users first: reconciling an email conflict can change the _id later entries refer to
+            remap = {}
+            for collection in sorted(by_collection, key=lambda c: c != "users"):
+                docs = [_replace_ids(d, remap) for d in by_collection[collection]] if remap else by_collection[collection]
+                if collection == "protocols":
+                    ops = [UpdateOne({"patient": d["patient"], "exerciseName": d["exerciseName"]},
+                                     {"$set": _without_id(d)}, upsert=True) for d in docs]
+                elif collection == "users":
+                    # Never overwrite the central copy; a new user keeps the _id protocols refer to
+                    ops = [UpdateOne({"email": d["email"]}, {"$setOnInsert": d}, upsert=True) for d in docs]
+                else:
+                    # Sessions by client-side _id: pushing twice is a no-op
+                    ops = [UpdateOne({"_id": d["_id"]}, {"$setOnInsert": _without_id(d)}, upsert=True)
+                           for d in docs]
+                result = self.get_central()[collection].bulk_write(ops, ordered=True)
+                created = [docs[i] for i in result.upserted_ids]
+                if collection == "users":
+                    if created:
+                        # Server clock, so other kiosks' updatedAt watermarks cannot skip an old offline signup
+                        self.get_central()["users"].update_many({"_id": {"$in": [d["_id"] for d in created]}},
+                                                                {"$currentDate": {"updatedAt": True}})
+                    conflicts = [d for i, d in enumerate(docs) if i not in result.upserted_ids]
+                    remap.update(self._adopt_central_users(conflicts))
+                if created and self.on_pushed is not None:
+                    self.on_pushed(collection, created)
+            self.local.ack_outbox(entries[-1][0])
+            pushed += len(entries)
+
+    def _adopt_central_users(self, users: List[dict]) -> dict:
+        """Offline signups whose email was already taken centrally: {local _id: central _id}"""
+        remap = {}
+        if not users:
+            return remap
+        emails = [u["email"] for u in users]
+        for central in self.get_central()["users"].find({"email": {"$in": emails}}):
+            old_id = self.local.adopt_user(central)
+            if old_id is not None:
+                remap[old_id] = central["_id"]
+                print(f"⚠️ Storage sync: {central['email']} already exists centrally; kiosk account replaced")
+        return remap
+
+    def pull(self) -> int:
+        pulled = 0
+        for collection, (field, write) in self.PULLED.items():
+            mark = self.local.watermark(collection)
+            query = {field: {"$gt": mark}} if mark is not None else {}
+            for doc in self.get_central()[collection].find(query).sort(field, 1).batch_size(self.batch_size):
+                write(self.local, doc)
+                if doc.get(field) is not None:
+                    mark = doc[field]
+                pulled += 1
+            if mark is not None:
+                self.local.set_watermark(collection, mark)
+        return pulled
+
+    def sync_once(self):
+        pushed = self.push()
+        pulled = self.pull()
+        self.last_sync = time.time()
+        if pushed or pulled:
+            print(f"🔄 Storage sync: pushed {pushed}, pulled {pulled}")
+
+    # --- BACKGROUND SYNC ---
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.available():
+                try:
+                    self.sync_once()
+                except Exception as e:
+                    print(f"⚠️ Storage sync error: {e}")
+            self._stop.wait(self.interval)
+
+
+def open_storage(backend: str, path: str):
+    """Local store for STORAGE_BACKEND=sqlite, None for the default (central MongoDB) backend"""
+    if backend != "sqlite":
+        return None
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return SQLiteStorage(path)
@@ -0,0 +1,161 @@
+"""
+Offline trace replay - compares the hold-time and predictive (velocity-aware)
+rep detectors on recorded angle traces for rep-count parity and detection delay.
+
+Usage:
+    python trace_replay.py session_trace.json [more.json ...]
+    python trace_replay.py --synthetic 20
+    python trace_replay.py --borderline 50    # fast, noisy reps that barely reach the zone limits
+
+A trace file holds the SessionHistory series plus calibration thresholds:
+    {"time": [...], "right_angle": [...], "left_angle": [...],
+     "calibration": {"contracted_threshold": 50, "extended_threshold": 160}}
+Angles of 0 mean the joint was not visible on that frame.
+"""
+import argparse
+import json
+from typing import Dict, List
+
+import numpy as np
+
+from constants import (MIN_REP_DURATION, DEFAULT_CONTRACTED_THRESHOLD,
+                       DEFAULT_EXTENDED_THRESHOLD)
+from rep_engine import RepEngine, UP
+
+SIDES = ['RIGHT', 'LEFT']
+END_MARGIN = 0.5  # seconds
+
+
+def replay(times: np.ndarray, angles: np.ndarray, contracted: float, extended: float,
+           predictive: bool) -> Dict[str, List[float]]:
+    """Runs one engine over the trace; returns (event time, detection delay) of every counted rep per side"""
+    engine = RepEngine(SIDES, MIN_REP_DURATION, predictive=predictive)
+    engine.set_thresholds(contracted, extended)
+
+    # Frame where the angle first left the UP zone for the current rep (the physical event)
+    exit_time = np.full(len(SIDES), np.nan)
+    reps = {side: [] for side in SIDES}
+
+    for t, frame_angles in zip(times, angles):
+        visible = ~np.isnan(frame_angles)
+        was_up = engine.stage == UP
+        leaving = was_up & visible & (engine.target_stage(np.nan_to_num(frame_angles)) != UP)
+
+        exit_time = np.where(leaving & np.isnan(exit_time), t, exit_time)
+        exit_time = np.where(was_up & visible & ~leaving, np.nan, exit_time)
+
+        result = engine.step(frame_angles, t)
+        for i in np.flatnonzero(result.counted):
+            reps[SIDES[i]].append((float(exit_time[i]), float(t - exit_time[i])))
+        exit_time = np.where(engine.stage != UP, np.nan, exit_time)
+
+    return reps
+
+
+def compare(trace: dict) -> dict:
+    """Rep counts and mean detection delay (ms) for both detectors on one trace"""
+    times = np.asarray(trace['time'], dtype=np.float64)
+    angles = np.column_stack([trace['right_angle'], trace['left_angle']]).astype(np.float64)
+    angles[angles == 0] = np.nan
+
+    calibration = trace.get('calibration', {})
+    contracted = calibration.get('contracted_threshold', DEFAULT_CONTRACTED_THRESHOLD)
+    extended = calibration.get('extended_threshold', DEFAULT_EXTENDED_THRESHOLD)
+
+    # The hold-time detector can't confirm a rep in the last moments of a trace,
+    # so only reps whose movement started before this horizon are compared
+    horizon = times[-1] - END_MARGIN
+    baseline = replay(times, angles, contracted, extended, predictive=False)
+    predictive = replay(times, angles, contracted, extended, predictive=True)
+    baseline = {s: [d for e, d in baseline[s] if e <= horizon] for s in SIDES}
+    predictive = {s: [d for e, d in predictive[s] if e <= horizon] for s in SIDES}
+
+    report = {}
+    for side in SIDES:
+        report[side] = {
+            'baseline_reps': len(baseline[side]),
+            'predictive_reps': len(predictive[side]),
+            'parity': len(baseline[side]) == len(predictive[side]),
+            'baseline_delay_ms': round(float(np.mean(baseline[side])) * 1000, 1) if baseline[side] else None,
+            'predictive_delay_ms': round(float(np.mean(predictive[side])) * 1000, 1) if predictive[side] else None,
+        }
+    return report
+
+
+def synthetic_trace(seed: int, fps: float = 30, duration: float = 60) -> dict:
+    """Noisy curls with random tempo and pauses at the top, quantized like live angles"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(0, duration, 1 / fps)
+    period = rng.uniform(2.0, 4.0)
+    phase = 2 * np.pi * t / period
+    # Flattened peaks emulate holding the contraction for a moment
+    shape = np.clip(np.cos(phase) * 1.3, -1, 1)
+    right = 105 + 55 * shape + rng.normal(0, 2.5, len(t))
+    left = 105 + 55 * np.clip(np.cos(phase - 0.4) * 1.3, -1, 1) + rng.normal(0, 2.5, len(t))
+    return {
+        'time': t.tolist(),
+        'right_angle': np.clip(right, 1, 180).astype(int).tolist(),
+        'left_angle': np.clip(left, 1, 180).astype(int).tolist(),
+        'calibration': {'contracted_threshold': 50, 'extended_threshold': 160}
+    }
+
+
+def borderline_trace(seed: int, fps: float = 30, duration: float = 60) -> dict:
+    """
+    Where early commits can go wrong: fast reps (1.2-2.5 s) whose true range ends within a few
+    degrees of the zone limits (65 / 145 for this calibration), with 1.5-5 deg of frame noise,
+    so single noisy frames cross a limit the movement itself barely (or never) reaches
+    """
+    rng = np.random.default_rng(10_000 + seed)
+    t = np.arange(0, duration, 1 / fps)
+    period = rng.uniform(1.2, 2.5)
+    overshoot = rng.uniform(-3, 5)  # degrees past each limit at the true peak (negative: short)
+    low, high = 65 - overshoot, 145 + overshoot
+    sigma = rng.uniform(1.5, 5.0)
+    sides = []
+    for lag in (0.0, 0.4):
+        angle = (low + high) / 2 + (high - low) / 2 * np.cos(2 * np.pi * t / period - lag)
+        sides.append(np.clip(angle + rng.normal(0, sigma, len(t)), 1, 180).astype(int).tolist())
+    return {
+        'time': t.tolist(),
+        'right_angle': sides[0],
+        'left_angle': sides[1],
+        'calibration': {'contracted_threshold': 50, 'extended_threshold': 160}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare rep detectors on recorded traces")
+    parser.add_argument('traces', nargs='*', help="trace JSON files")
+    parser.add_argument('--synthetic', type=int, default=0, help="also replay N synthetic traces")
+    parser.add_argument('--borderline', type=int, default=0, help="also replay N fast, noisy, borderline traces")
+    parser.add_argument('--fps', type=float, default=30, help="frame rate of synthetic traces")
+    args = parser.parse_args()
+
+    traces = [(path, json.load(open(path))) for path in args.traces]
+    traces += [(f"synthetic-{i}", synthetic_trace(i, args.fps)) for i in range(args.synthetic)]
+    traces += [(f"borderline-{i}", borderline_trace(i, args.fps)) for i in range(args.borderline)]
+
+    mismatches = sides = 0
+    delays = {'baseline': [], 'predictive': []}
+    for name, trace in traces:
+        report = compare(trace)
+        for side, r in report.items():
+            sides += 1
+            mismatches += not r['parity']
+            if r['baseline_delay_ms'] is not None:
+                delays['baseline'].append(r['baseline_delay_ms'])
+            if r['predictive_delay_ms'] is not None:
+                delays['predictive'].append(r['predictive_delay_ms'])
+            print(f"{name:<16} {side:<5} reps {r['baseline_reps']:>3} -> {r['predictive_reps']:>3}  "
+                  f"delay {r['baseline_delay_ms']} ms -> {r['predictive_delay_ms']} ms")
+
+    if traces:
+        print(f"\nRep-count parity: {'OK' if not mismatches else f'MISMATCH on {mismatches} of {sides} sides'}")
+        if delays['baseline'] and delays['predictive']:
+            print(f"Mean detection delay: {np.mean(delays['baseline']):.1f} ms -> "
+                  f"{np.mean(delays['predictive']):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,13 +7,16 @@ import cv2
 import mediapipe as mp
 import numpy as np
 import time
-from typing import Tuple, Optional, Dict
+import threading
+from typing import Tuple, Optional, Dict, List
 from collections import deque
 
 from mediapipe.python.solutions.holistic import PoseLandmark as mp_pose_lm 
 from models import ArmMetrics, CalibrationData, SessionHistory, GhostPose, Landmark2D 
 from ai_engine import AIEngine
 from exercise_verifier import ExerciseVerifier
+from landmark_filter import LandmarkSmoother
+from session_analyzer import analyze_session
 
 # Initialize MediaPipe Drawing Utils
 mp_drawing = mp.solutions.drawing_utils
@@ -23,11 +26,13 @@ mp_holistic = mp.solutions.holistic
 class WorkoutSession:
     """Manages entire workout session state with optimized performance and clean visuals"""
     
-    def __init__(self, exercise_name: str = "Bicep Curl"):
+    def __init__(self, exercise_name: str = "Bicep Curl", resource_pool=None, user_email: Optional[str] = None,
+                 rep_event_sink=None):
         from constants import (WorkoutPhase, WORKOUT_COUNTDOWN_TIME,
-                               CALIBRATION_HOLD_TIME, SMOOTHING_WINDOW, 
-                               SAFETY_MARGIN, MIN_REP_DURATION, 
-                               EXERCISE_PRESETS) 
+                               CALIBRATION_HOLD_TIME, SAFETY_MARGIN,
+                               MIN_REP_DURATION, EXERCISE_PRESETS,
+                               LANDMARK_FILTER_MIN_CUTOFF, LANDMARK_FILTER_BETA,
+                               LANDMARK_FILTER_D_CUTOFF, LANDMARK_FILTER_RESET_GAP) 
         
         from angle_calculator import AngleCalculator
         from pose_processor import PoseProcessor
@@ -37,6 +42,7 @@ class WorkoutSession:
         # Load the configuration for the selected exercise
         self.exercise_config = EXERCISE_PRESETS.get(exercise_name, EXERCISE_PRESETS["Bicep Curl"])
         
+        self.user_email = user_email
         self.phase = WorkoutPhase.INACTIVE
         self.start_time = 0.0
         self.countdown_remaining = 0
@@ -55,8 +61,12 @@ class WorkoutSession:
         self.color_buffer = deque(maxlen=2)
         
         # Initialize internal components
-        angle_calc = AngleCalculator(SMOOTHING_WINDOW)
-        self.pose_processor = PoseProcessor(angle_calc, self.exercise_config)
+        # One filter pass over all landmarks per frame; every consumer reads its output
+        self.landmark_smoother = LandmarkSmoother(
+            LANDMARK_FILTER_MIN_CUTOFF, LANDMARK_FILTER_BETA,
+            LANDMARK_FILTER_D_CUTOFF, LANDMARK_FILTER_RESET_GAP
+        )
+        self.pose_processor = PoseProcessor(AngleCalculator(), self.exercise_config)
         self.verifier = ExerciseVerifier() # Initialize the Verifier
         
         self.calibration_data = CalibrationData()
@@ -70,8 +80,13 @@ class WorkoutSession:
         # RepCounter handles new accuracy and stabilization logic
         self.rep_counter = RepCounter(self.calibration_data, MIN_REP_DURATION)
         self.history = SessionHistory()
+
+        # Rep-level event log: handed to rep_event_sink(events) in batches (None = not persisted)
+        self.rep_event_sink = rep_event_sink
+        self.rep_event_buffer = []
         
-        # MediaPipe Settings
+        # MediaPipe Settings (camera + graph are borrowed from the pool when available)
+        self.resource_pool = resource_pool
         self.holistic_model = None
         self.cap = None
         self.min_detection_conf = 0.5 
@@ -84,8 +99,9 @@ class WorkoutSession:
         self.listening_mode = False 
         self.last_feedback_text = {'RIGHT': "", 'LEFT': ""}
         
-        # Wrong Exercise Detection State
-        self.wrong_exercise_counter = 0
+        # Wrong Exercise Detection State (seconds of sustained mismatch, not frames)
+        self.wrong_exercise_time = 0.0
+        self.last_workout_frame_time = None
         self.wrong_exercise_detected = False
         self.wrong_exercise_reason = ""
 
@@ -109,66 +125,156 @@ class WorkoutSession:
         self.ghost_pose = GhostPose(instruction="Initializing...", connections=self.ghost_connections)
         
         # Gesture Stabilization
-        self._frames_in_active = 0 
         self.gesture_active_until = 0.0 
         self.gesture_hold_duration = 2.0 
+
+        # Circuit Support: reports (and angle histories) of blocks finished via switch_exercise()
+        self.completed_blocks = []
+        self.completed_histories = []
+        
+        # Calibration Profiles: fresh calibrations to persist, keyed by exercise name
+        self.fresh_profiles = {}
+        self.profile_loaded = False
+        # Guards per-exercise state against switches from other threads mid-frame
+        self.state_lock = threading.RLock()
+        # Held for a whole frame (capture + inference); stop() takes it so the camera and
+        # model never go back to the pool while a frame is still using them
+        self.frame_lock = threading.Lock()
     
-    def start(self):
-        """Initializes the session components and starts the camera"""
+    def start(self, calibration_profile: Optional[dict] = None):
+        """
+        Initializes the session components and starts the camera.
+        With a saved calibration_profile the calibration phase is skipped (fast start).
+        """
         from constants import WorkoutPhase
         
+        self._reset_exercise_state()
+        self.completed_blocks = []
+        self.completed_histories = []
+        self.fresh_profiles = {}
+        self.gesture_active_until = 0.0
+
+        if self.resource_pool is not None:
+            # Warm resources: no camera probing or graph construction on start
+            self.cap = self.resource_pool.acquire_camera()
+            self.holistic_model = self.resource_pool.acquire_model(
+                self.min_detection_conf, self.min_tracking_conf
+            )
+        else:
+            self.cap = cv2.VideoCapture(0)
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+            self.cap.set(cv2.CAP_PROP_FPS, 30)
+
+            self.holistic_model = mp.solutions.holistic.Holistic(
+                min_detection_confidence=self.min_detection_conf,
+                min_tracking_confidence=self.min_tracking_conf,
+                model_complexity=0,
+                smooth_landmarks=True
+            )
+        
+        self._begin_calibration(calibration_profile)
+    
+    def _begin_calibration(self, calibration_profile: Optional[dict] = None):
+        """Runs calibration, or jumps straight to the countdown with a saved profile"""
+        from constants import WorkoutPhase
+
+        if calibration_profile:
+            self.calibration_manager.load_profile(calibration_profile)
+            self.profile_loaded = True
+            self.phase = WorkoutPhase.COUNTDOWN
+            self.start_time = time.time()
+        else:
+            self.calibration_manager.start()
+            self.profile_loaded = False
+            self.phase = WorkoutPhase.CALIBRATION
+
+    def _reset_exercise_state(self):
+        """Resets everything tied to the current exercise block (not the camera or pose graph)"""
         for arm in ['RIGHT', 'LEFT']:
             self.arm_metrics[arm] = ArmMetrics()
         
         self.history.reset()
-        self.pose_processor.angle_calculator.reset_buffers()
+        self.landmark_smoother.reset()
+        self.rep_counter.reset()
         self.landmark_buffer.clear()
         self.color_buffer.clear()
         
         self.ai_latched_state = {'RIGHT': False, 'LEFT': False}
         self.last_feedback_text = {'RIGHT': "", 'LEFT': ""}
         self.ghost_pose = GhostPose(instruction="Ready...", connections=self.ghost_connections) 
-        self._frames_in_active = 0 
-        self.gesture_active_until = 0.0
         
         # Reset verification state
-        self.wrong_exercise_counter = 0
+        self.wrong_exercise_time = 0.0
+        self.last_workout_frame_time = None
         self.wrong_exercise_detected = False
         self.wrong_exercise_reason = ""
 
-        self.cap = cv2.VideoCapture(0)
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        self.cap.set(cv2.CAP_PROP_FPS, 30)
-        
-        self.holistic_model = mp.solutions.holistic.Holistic(
-            min_detection_confidence=self.min_detection_conf,
-            min_tracking_confidence=self.min_tracking_conf,
-            model_complexity=0,
-            smooth_landmarks=True
-        )
-        
-        self.calibration_manager.start()
-        self.phase = WorkoutPhase.CALIBRATION
-    
+    def switch_exercise(self, exercise_name: str, calibration_profile: Optional[dict] = None) -> bool:
+        """
+        Swaps to another exercise inside the live session (circuit protocols).
+        Capture and inference keep running; only per-exercise state is reset and
+        the finished block is kept as its own sub-report.
+        """
+        from constants import WorkoutPhase, EXERCISE_PRESETS
+
+        new_config = EXERCISE_PRESETS.get(exercise_name)
+        if new_config is None:
+            return False
+
+        with self.state_lock:
+            if self.phase != WorkoutPhase.INACTIVE:
+                self.completed_blocks.append(self._build_block_report())
+                # Keep the finished block's series for persistence; start a fresh store
+                self.completed_histories.append((self.exercise_config.name, self.history))
+                self.history = SessionHistory()
+
+            self.exercise_config = new_config
+            self.pose_processor.config = new_config
+            self.calibration_manager.set_exercise(new_config)
+            self._reset_exercise_state()
+
+            # New joint => new range of motion, so recalibrate (unless a profile exists)
+            self._begin_calibration(calibration_profile)
+
+        print(f"🔁 Switched exercise to: {new_config.name}")
+        return True
+
     def stop(self):
-        """Release camera and model resources"""
+        """Persists buffered rep events, then releases camera and model resources (back to the pool when one is attached)"""
         from constants import WorkoutPhase
-        if self.cap is not None: self.cap.release()
-        if self.holistic_model is not None: self.holistic_model.close()
-        self.holistic_model = None
-        self.phase = WorkoutPhase.INACTIVE
+        self.flush_rep_events()
+        # Waits out a frame in flight (at most one)
+        with self.frame_lock:
+            if self.resource_pool is not None:
+                self.resource_pool.release_camera(self.cap)
+                self.resource_pool.release_model(
+                    self.holistic_model, self.min_detection_conf, self.min_tracking_conf
+                )
+            else:
+                if self.cap is not None: self.cap.release()
+                if self.holistic_model is not None: self.holistic_model.close()
+            self.cap = None
+            self.holistic_model = None
+            self.phase = WorkoutPhase.INACTIVE
 
     def process_frame(self) -> Tuple[Optional[np.ndarray], bool]:
         """Main processing loop optimized for clean visuals"""
-        from constants import WorkoutPhase
-        
+        with self.frame_lock:
+            return self._process_frame()
+
+    def _process_frame(self) -> Tuple[Optional[np.ndarray], bool]:
+        from constants import WorkoutPhase, ACTIVE_STABILIZATION_TIME
+
         if self.cap is None or not self.cap.isOpened(): 
             return None, False
         
         success, image = self.cap.read()
         if not success: return None, False
         
+        # Frame timestamp: every filter/debounce downstream runs on this clock
+        current_time = time.time()
+        
         image = cv2.flip(image, 1) # Mirror view for comfort
 
         image.flags.writeable = False
@@ -176,8 +282,9 @@ class WorkoutSession:
         results = self.holistic_model.process(image)
         image.flags.writeable = True
         image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-        
-        current_time = time.time()
+
+        # Smooth the whole pose once (vectorized One Euro) for all consumers below
+        landmarks = self.landmark_smoother.apply(results.pose_landmarks, current_time)
         
         # --- GESTURE DETECTION ---
         raw_gesture_detected = self.pose_processor.detect_v_sign(results)
@@ -187,36 +294,32 @@ class WorkoutSession:
         else:
             self.gesture_detected = (current_time < self.gesture_active_until)
 
-        # --- PHASE LOGIC ---
-        if self.phase == WorkoutPhase.CALIBRATION:
-            self._process_calibration(results, current_time)
-        elif self.phase == WorkoutPhase.COUNTDOWN:
-            self._process_countdown(current_time)
-        elif self.phase == WorkoutPhase.ACTIVE:
-            STABILIZATION_FRAMES = 5 
-            if self._frames_in_active < STABILIZATION_FRAMES:
-                self._frames_in_active += 1
-            else:
-                self._process_workout(results, current_time)
-
-        # --- CLEAN RENDERING ---
-        self._draw_overlay(image, results) 
+        with self.state_lock:
+            # --- PHASE LOGIC ---
+            if self.phase == WorkoutPhase.CALIBRATION:
+                self._process_calibration(landmarks, current_time)
+            elif self.phase == WorkoutPhase.COUNTDOWN:
+                self._process_countdown(current_time)
+            elif self.phase == WorkoutPhase.ACTIVE:
+                # Let the pose settle right after the countdown (time-based, FPS independent)
+                if (current_time - self.start_time) >= ACTIVE_STABILIZATION_TIME:
+                    self._process_workout(landmarks, current_time)
+
+            # --- CLEAN RENDERING ---
+            self._draw_overlay(image, results, landmarks) 
         
         return image, True
 
-    def _draw_overlay(self, image: np.ndarray, results=None):
+    def _draw_overlay(self, image: np.ndarray, results=None, landmarks=None):
         """Draws clean overlay, including the new red warning box for wrong exercises"""
         h, w, _ = image.shape
 
         # --- WRONG EXERCISE WARNING (VISUAL) ---
-        if self.wrong_exercise_detected and results and results.pose_landmarks:
-            landmarks = results.pose_landmarks.landmark
-            x_coords = [lm.x for lm in landmarks]
-            y_coords = [lm.y for lm in landmarks]
-            
-            # Calculate bounding box
-            x_min, x_max = int(min(x_coords) * w), int(max(x_coords) * w)
-            y_min, y_max = int(min(y_coords) * h), int(max(y_coords) * h)
+        if self.wrong_exercise_detected and landmarks is not None:
+            # Calculate bounding box (smoothed landmarks => steady box)
+            (x_lo, y_lo), (x_hi, y_hi) = landmarks.xy.min(axis=0), landmarks.xy.max(axis=0)
+            x_min, x_max = int(x_lo * w), int(x_hi * w)
+            y_min, y_max = int(y_lo * h), int(y_hi * h)
             
             # Add padding
             pad = 20
@@ -255,28 +358,31 @@ class WorkoutSession:
                     landmark_drawing_spec=mp_drawing_styles.get_default_pose_landmarks_style()
                 )
 
-    def _process_workout(self, results, current_time: float):
+    def _process_workout(self, landmarks, current_time: float):
         """Handles workout logic, accuracy, form feedback, and exercise verification"""
-        from constants import ArmStage 
+        from constants import ArmStage, WRONG_EXERCISE_TRIGGER_TIME, MAX_FRAME_GAP
         
-        if not results.pose_landmarks:
+        if landmarks is None:
             self.ghost_pose.instruction = "Please step into view"
             return
-        
-        landmarks = results.pose_landmarks.landmark
 
         # --- EXERCISE VERIFICATION ---
         # Check if user is doing the wrong exercise
         is_wrong, reason = self.verifier.check_mismatch(landmarks, self.exercise_config.name)
         
+        dt = 0.0
+        if self.last_workout_frame_time is not None:
+            dt = min(MAX_FRAME_GAP, max(0.0, current_time - self.last_workout_frame_time))
+        self.last_workout_frame_time = current_time
+
         if is_wrong:
-            self.wrong_exercise_counter += 1
+            self.wrong_exercise_time += dt
         else:
-            # Decay counter quickly if they correct themselves
-            self.wrong_exercise_counter = max(0, self.wrong_exercise_counter - 2)
+            # Decay twice as fast if they correct themselves
+            self.wrong_exercise_time = max(0.0, self.wrong_exercise_time - 2 * dt)
         
-        # Trigger warning faster: 10 frames (~0.3s)
-        if self.wrong_exercise_counter > 10:
+        # Trigger warning after ~0.3s of sustained mismatch, whatever the frame rate
+        if self.wrong_exercise_time > WRONG_EXERCISE_TRIGGER_TIME:
             self.wrong_exercise_detected = True
             self.wrong_exercise_reason = reason
         else:
@@ -299,16 +405,17 @@ class WorkoutSession:
         # --- NORMAL PROCESSING ---
         if (current_time - self.last_ai_check) > self.ai_interval:
             self.last_ai_check = current_time
-            self._update_ai_latch(results)
+            self._update_ai_latch(landmarks)
+
+        angles = self.pose_processor.get_both_arm_angles(landmarks)
 
-        angles = self.pose_processor.get_both_arm_angles(results)
+        # One vectorized state-machine step for both sides (accuracy updated per rep)
+        warnings = {arm: ('form_error',) if self.ai_latched_state[arm] else () for arm in ['RIGHT', 'LEFT']}
+        self.rep_counter.process_frame(angles, self.arm_metrics, current_time, warnings)
+        self._log_rep_events(self.rep_counter.drain_events())
         
         for arm in ['RIGHT', 'LEFT']:
             if angles[arm] is not None:
-                self.arm_metrics[arm].angle = angles[arm]
-                # RepCounter now updates accuracy internally per rep
-                self.rep_counter.process_rep(arm, angles[arm], self.arm_metrics[arm], current_time, self.history)
-                
                 # Dynamic Feedback Color Logic
                 if self.arm_metrics[arm].feedback:
                     self.arm_metrics[arm].feedback_color = "RED"
@@ -317,12 +424,24 @@ class WorkoutSession:
                 elif self.arm_metrics[arm].stage in [ArmStage.MOVING_UP.value, ArmStage.MOVING_DOWN.value]:
                     self.arm_metrics[arm].feedback_color = "YELLOW"
 
-        if results.pose_landmarks:
-             self._calculate_ideal_pose_realtime(results.pose_landmarks.landmark)
+        self._calculate_ideal_pose_realtime(landmarks)
 
-        self.history.time.append(round(current_time - self.start_time, 2))
-        self.history.right_angle.append(angles['RIGHT'] or 0)
-        self.history.left_angle.append(angles['LEFT'] or 0)
+        # --- PROFILE VALIDATION: recalibrate if ROM drifted since the profile was saved ---
+        if self.calibration_manager.validating:
+            rep_counts = {arm: self.arm_metrics[arm].rep_count for arm in ['RIGHT', 'LEFT']}
+            if self.calibration_manager.validate_frame(angles, rep_counts, current_time):
+                self._recalibrate()
+                return
+
+        self.history.append(self._session_time(current_time), angles['RIGHT'], angles['LEFT'])
+
+    def _session_time(self, current_time: float) -> float:
+        """Seconds since the block started; a backwards wall-clock step (NTP) rebases the clock, never rewinds it"""
+        t = current_time - self.start_time
+        if t < self.history.duration:
+            self.start_time -= self.history.duration - t
+            t = self.history.duration
+        return t
 
     def _calculate_ideal_pose_realtime(self, reference_landmarks) -> None:
         """Calculates Inverse Kinematics for the ghost skeleton"""
@@ -371,18 +490,44 @@ class WorkoutSession:
         self.ghost_pose.color = self._quick_color_smooth(metrics.feedback_color)
         self.ghost_pose.instruction = metrics.feedback.replace("AI: ", "") if metrics.feedback else "Maintain Form"
 
-    def _process_calibration(self, results, current_time: float):
+    def _process_calibration(self, landmarks, current_time: float):
         """Silenced word repetition calibration logic"""
         from constants import WorkoutPhase
-        complete = self.calibration_manager.process_frame(results, current_time)
+        complete = self.calibration_manager.process_frame(landmarks, current_time)
         if complete:
+            self.fresh_profiles[self.exercise_config.name] = self.calibration_data.to_profile()
             self.phase = WorkoutPhase.COUNTDOWN
             self.start_time = current_time
             
-        if results.pose_landmarks:
+        if landmarks is not None:
              self.ghost_pose.instruction = self.calibration_manager.data.message
              self.ghost_pose.color = "GRAY"
 
+    def _recalibrate(self):
+        """
+        Drops a drifted profile and runs the full calibration sequence.
+        Reps of the validation period were counted against the wrong range of motion, so the
+        block restarts from scratch: metrics, history (its clock restarts after calibration)
+        and the rep events held back while validating are discarded.
+        """
+        from constants import WorkoutPhase
+        block = len(self.completed_histories)
+        self.rep_event_buffer = [e for e in self.rep_event_buffer if e['block'] != block]
+        self._reset_exercise_state()
+        self.profile_loaded = False
+        self.calibration_manager.start()
+        self.calibration_manager.data.message = "Your range of motion changed. Let's recalibrate: fully EXTEND the joint."
+        self.phase = WorkoutPhase.CALIBRATION
+
+    def get_calibration_profiles(self) -> Dict[str, dict]:
+        """Calibrations completed during this session, keyed by exercise name"""
+        return dict(self.fresh_profiles)
+
+    def get_series_blocks(self) -> List[Tuple[str, SessionHistory]]:
+        """(exercise name, history) for every block of the session, in order"""
+        with self.state_lock:
+            return self.completed_histories + [(self.exercise_config.name, self.history)]
+
     def _process_countdown(self, current_time: float):
         """Phase transition countdown"""
         from constants import WorkoutPhase
@@ -390,18 +535,42 @@ class WorkoutSession:
         if elapsed >= self.countdown_time:
             self.phase = WorkoutPhase.ACTIVE
             self.start_time = current_time
+            if self.profile_loaded:
+                self.calibration_manager.start_validation(current_time)
         else:
             self.countdown_remaining = int(self.countdown_time - elapsed)
             self.ghost_pose.instruction = f"START IN {self.countdown_remaining}"
             self.ghost_pose.color = "YELLOW"
 
-    def _update_ai_latch(self, results):
+    def _log_rep_events(self, events: List[dict]):
+        """Adds completed reps to the series history and the buffered event log"""
+        from constants import REP_EVENT_BATCH_SIZE
+        for event in events:
+            session_time = event['timestamp'] - self.start_time
+            self.history.record_rep(session_time, 0 if event['side'] == 'RIGHT' else 1, event['accuracy'])
+            event['session_time'] = round(session_time, 3)
+            event['exercise'] = self.exercise_config.name
+            event['block'] = len(self.completed_histories)
+        self.rep_event_buffer.extend(events)
+        # Held back while a loaded profile is validated: a drift verdict discards them
+        if len(self.rep_event_buffer) >= REP_EVENT_BATCH_SIZE and not self.calibration_manager.validating:
+            self.flush_rep_events()
+
+    def flush_rep_events(self):
+        """Hands buffered rep events to the sink (stop() flushes the remainder)"""
+        events, self.rep_event_buffer = self.rep_event_buffer, []
+        if events and self.rep_event_sink is not None:
+            try:
+                self.rep_event_sink(events)
+            except Exception as e:
+                print(f"⚠️ Rep event sink error: {e}")
+
+    def _update_ai_latch(self, landmarks):
         """ML-based form quality prediction"""
         feature_indices = self.exercise_config.ai_features_landmarks
-        if not results.pose_landmarks: return
+        if landmarks is None: return
         try:
-            landmarks = results.pose_landmarks.landmark
-            features = [coord for idx in feature_indices for coord in (landmarks[idx].x, landmarks[idx].y)]
+            features = landmarks.xy[feature_indices].ravel().tolist()
             if len(features) == 16:
                 prediction = AIEngine.predict_form(features)
                 self.ai_latched_state['RIGHT'] = (prediction == 0)
@@ -432,10 +601,32 @@ class WorkoutSession:
         }
     
     def get_final_report(self) -> dict:
-        """Final summary report for session review"""
+        """Final summary report for session review (one sub-report per exercise block)"""
+        current = self._build_block_report()
+        if not self.completed_blocks:
+            return {**current, 'blocks': [current]}
+
+        blocks = self.completed_blocks + [current]
+        summary = {
+            arm: {
+                'total_reps': sum(b['summary'][arm]['total_reps'] for b in blocks),
+                'error_count': sum(b['summary'][arm]['error_count'] for b in blocks)
+            }
+            for arm in ['RIGHT', 'LEFT']
+        }
+        return {
+            'exercise_name': " → ".join(b['exercise_name'] for b in blocks),
+            'duration': round(sum(b['duration'] for b in blocks), 2),
+            'summary': summary,
+            'calibration': current['calibration'],
+            'blocks': blocks
+        }
+
+    def _build_block_report(self) -> dict:
+        """Report for the exercise block currently in progress"""
         return {
             'exercise_name': self.exercise_config.name, 
-            'duration': round(self.history.time[-1] if self.history.time else 0, 2),
+            'duration': round(self.history.duration, 2),
             'summary': {
                 'RIGHT': {'total_reps': self.arm_metrics['RIGHT'].rep_count, 'error_count': self.history.right_feedback_count},
                 'LEFT': {'total_reps': self.arm_metrics['LEFT'].rep_count, 'error_count': self.history.left_feedback_count}
@@ -443,7 +634,14 @@ class WorkoutSession:
             'calibration': {
                 'extended_threshold': self.calibration_manager.data.extended_threshold,
                 'contracted_threshold': self.calibration_manager.data.contracted_threshold
-            }
+            },
+            # Offline pass over the whole trace: per-rep ROM, tempo, peak velocity, L/R symmetry
+            'rep_analysis': analyze_session(
+                self.history.time, self.history.right_angle, self.history.left_angle,
+                self.calibration_manager.data.contracted_threshold,
+                self.calibration_manager.data.extended_threshold,
+                self.rep_counter.min_rep_duration
+            )
         }
 
     def get_cv_color(self, color_name: str) -> Tuple[int, int, int]:
@@ -0,0 +1,232 @@
+"""
+Write-behind persistence - queued inserts flushed in batches by a background thread
+Callers get the document _id immediately (assigned client-side); the writer groups
+queued documents per collection into insert_many calls. While MongoDB is unreachable
+batches are appended to a local NDJSON spill file and replayed once it is back.
+Client-side _ids make replay idempotent: a document already written is a duplicate key.
+Keyed upserts ($set) can be queued as well; replaying those is idempotent by nature.
+"""
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+from bson import ObjectId, json_util
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from constants import WRITE_BATCH_SIZE, WRITE_FLUSH_INTERVAL, WRITE_RETRY_INTERVAL, WRITE_QUEUE_MAX
+
+DUPLICATE_KEY = 11000
+UPSERT = "$upsert"  # marks a queued {"$upsert": filter, "$set": fields} entry (vs. a plain insert)
+
+
+class WriteBehindQueue:
+    """
+    Usage: queue.submit("sessions", doc) -> ObjectId; queue.add_hook("sessions", fn)
+    runs fn(docs) after those documents are stored (from the writer thread).
+    get_db() returns the Database and is only called from the writer thread, so
+    creating the client (DNS lookups for mongodb+srv) never happens at import.
+    """
+
+    def __init__(self, get_db: Callable, spill_path: str, batch_size: int = WRITE_BATCH_SIZE,
+                 flush_interval: float = WRITE_FLUSH_INTERVAL, retry_interval: float = WRITE_RETRY_INTERVAL,
+                 max_queued: int = WRITE_QUEUE_MAX, available: Optional[Callable[[], bool]] = None):
+        self.get_db = get_db
+        self.available = available  # external health signal: while False, batches go straight to disk
+        self.spill_path = spill_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize=max_queued)
+        self._hooks: Dict[str, List[Callable]] = defaultdict(list)
+        self._spill_lock = threading.Lock()
+        self._down_since: Optional[float] = None
+        self._last_attempt = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"written": 0, "spilled": 0, "replayed": 0, "dropped": 0}
+
+    # --- PRODUCER SIDE (request / socket handlers) ---
+    def submit(self, collection: str, doc: dict) -> ObjectId:
+        """Queues one insert; never blocks on the database"""
+        doc.setdefault("_id", ObjectId())
+        try:
+            self._queue.put_nowait((collection, doc))
+        except queue.Full:
+            # Writer is far behind (DB down for a long time): keep memory bounded
+            self._spill([(collection, doc)])
+        return doc["_id"]
+
+    def submit_many(self, collection: str, docs: List[dict]) -> List[ObjectId]:
+        return [self.submit(collection, doc) for doc in docs]
+
+    def submit_upsert(self, collection: str, key: dict, fields: dict):
+        """Queues update_one(key, {"$set": fields}, upsert=True); hooks do not run for upserts"""
+        entry = {UPSERT: key, "$set": fields}
+        try:
+            self._queue.put_nowait((collection, entry))
+        except queue.Full:
+            self._spill([(collection, entry)])
+
+    def add_hook(self, collection: str, fn: Callable[[List[dict]], None]):
+        self._hooks[collection].append(fn)
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def healthy(self) -> bool:
+        return self._down_since is None
+
+    # --- WRITER THREAD ---
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stops the writer after draining the queue (to MongoDB, or to the spill file)"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                if self._can_write():
+                    self._write(batch)
+                else:
+                    self._spill(batch)
+            if self._can_write():
+                # While down, a due replay doubles as the reconnect probe
+                self._replay()
+
+    def _next_batch(self) -> List[tuple]:
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _can_write(self) -> bool:
+        if self.available is not None and not self.available():
+            return False
+        return self._down_since is None or self._retry_due()
+
+    def _retry_due(self) -> bool:
+        return time.monotonic() - self._last_attempt >= self.retry_interval
+
+    def _insert(self, collection: str, docs: List[dict]) -> List[dict]:
+        """insert_many that tolerates duplicates; returns the documents actually inserted"""
+        try:
+            self.get_db()[collection].insert_many(docs, ordered=False)
+            return docs
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            failed = {err["index"] for err in errors}
+            rejected = [err for err in errors if err.get("code") != DUPLICATE_KEY]
+            if rejected:
+                # Not retryable (validation etc.); spilling would only fail again
+                self.stats["dropped"] += len(rejected)
+                print(f"⚠️ Write-behind: {len(rejected)} {collection} document(s) rejected: {rejected[0].get('errmsg')}")
+            return [doc for i, doc in enumerate(docs) if i not in failed]
+
+    def _upsert(self, collection: str, entries: List[dict]):
+        """Applies queued upserts in order; one that the server rejects is dropped, the rest still run"""
+        from pymongo import UpdateOne
+
+        ops = [UpdateOne(e[UPSERT], {"$set": e["$set"]}, upsert=True) for e in entries]
+        while ops:
+            try:
+                self.get_db()[collection].bulk_write(ops, ordered=True)
+                return
+            except BulkWriteError as e:
+                error = e.details["writeErrors"][0]
+                self.stats["dropped"] += 1
+                print(f"⚠️ Write-behind: {collection} upsert rejected: {error.get('errmsg')}")
+                ops = ops[error["index"] + 1:]
+
+    def _write(self, batch: List[tuple], spill: bool = True) -> bool:
+        """Inserts a batch grouped per collection; on a DB error the rest is spilled (or left to the caller)"""
+        grouped = defaultdict(list)
+        for collection, doc in batch:
+            grouped[collection].append(doc)
+
+        self._last_attempt = time.monotonic()
+        for position, (collection, docs) in enumerate(grouped.items()):
+            upserts = [doc for doc in docs if UPSERT in doc]
+            inserts = [doc for doc in docs if UPSERT not in doc]
+            try:
+                if upserts:
+                    self._upsert(collection, upserts)
+                inserted = self._insert(collection, inserts) if inserts else []
+            except PyMongoError as e:
+                if self._down_since is None:
+                    self._down_since = time.time()
+                    print(f"⚠️ Write-behind: database unavailable ({e}); spilling to {self.spill_path}")
+                if spill:
+                    remaining = list(grouped.items())[position:]
+                    self._spill([(c, d) for c, ds in remaining for d in ds])
+                return False
+            self.stats["written"] += len(inserted) + len(upserts)
+            self._run_hooks(collection, inserted)
+
+        if self._down_since is not None:
+            print(f"✅ Write-behind: database back after {time.time() - self._down_since:.0f}s")
+            self._down_since = None
+        return True
+
+    def _run_hooks(self, collection: str, docs: List[dict]):
+        if not docs:
+            return
+        for fn in self._hooks.get(collection, []):
+            try:
+                fn(docs)
+            except Exception as e:
+                print(f"⚠️ Write-behind hook error ({collection}): {e}")
+
+    # --- DISK SPILL ---
+    def _spill(self, batch: List[tuple]):
+        lines = "".join(json_util.dumps({"c": c, "d": d}) + "\n" for c, d in batch)
+        with self._spill_lock:
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+        self.stats["spilled"] += len(batch)
+
+    def _replay(self):
+        """Re-inserts spilled documents; the file is only removed once all of them are stored"""
+        replay_path = self.spill_path + ".replay"
+        with self._spill_lock:
+            if not os.path.exists(replay_path):
+                if not os.path.exists(self.spill_path):
+                    return
+                # New spills go to a fresh file while this one is replayed
+                os.replace(self.spill_path, replay_path)
+
+        batch = []
+        with open(replay_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json_util.loads(line)
+                except ValueError:
+                    continue  # torn last line from a crash mid-write
+                batch.append((entry["c"], entry["d"]))
+
+        for start in range(0, len(batch), self.batch_size):
+            if not self._write(batch[start:start + self.batch_size], spill=False):
+                return  # kept for the next attempt; already stored documents come back as duplicates
+        os.remove(replay_path)
+        self.stats["replayed"] += len(batch)
+        print(f"✅ Write-behind: replayed {len(batch)} spilled document(s)")